@@ -1,18 +1,12 @@
 import os
 import json
+import argparse
 import pandas as pd
 import logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
-)
-
 summary_folder = "summary"
 summary_json_file = os.path.join(summary_folder, "summary.json")
 output_json_file = os.path.join(summary_folder, "summary-analyze.json")
-cache_file = "/mnt/data/ollama_suggestion_cache.json"
-print(summary_json_file)
 
 
 # Load summaries from the summary JSON file
@@ -34,78 +28,147 @@ def load_summary(summary_json_file):
     return summaries
 
 
-# Load the severity data from the suggestion cache
-def load_suggestion_cache(cache_file):
-    if os.path.exists(cache_file):
-        with open(cache_file, "r") as file:
-            try:
-                suggestion_cache = json.load(file)
-            except json.JSONDecodeError:
-                logging.warning(
-                    "Failed to decode %s. Returning empty dictionary.", cache_file
-                )
-                suggestion_cache = {}
-    else:
-        suggestion_cache = {}
-    return suggestion_cache
+# Flatten summaries into long-form frames: one row per file, plus one row per
+# file and pillar, file and severity, and file and check title
+def build_trend_frames(summaries):
+    files = pd.DataFrame(
+        [
+            {
+                "filename": summary.get("filename"),
+                "timestamp": summary.get("timestamp"),
+                "total_findings": summary.get("total_findings", 0),
+                "failed_findings": summary.get("failed_findings", 0),
+            }
+            for summary in summaries
+        ]
+    )
+    # Timestamps look like "2024-07-08 09:00:00 PDT"; drop the zone abbreviation
+    files["timestamp"] = pd.to_datetime(
+        files["timestamp"].astype(str).str.rsplit(" ", n=1).str[0], errors="coerce"
+    )
 
+    pillars = pd.DataFrame(
+        [
+            (summary.get("filename"), pillar, count)
+            for summary in summaries
+            for pillar, count in summary.get("failed_pillar_counts", {}).items()
+        ],
+        columns=["filename", "pillar", "count"],
+    )
+    severities = pd.DataFrame(
+        [
+            (summary.get("filename"), severity, count)
+            for summary in summaries
+            for severity, count in summary.get("failed_severity_counts", {}).items()
+        ],
+        columns=["filename", "severity", "count"],
+    )
+    titles = pd.DataFrame(
+        [
+            (
+                summary.get("filename"),
+                title,
+                details.get("severity", "Unknown"),
+                details.get("count", 0),
+            )
+            for summary in summaries
+            for title, details in summary.get("failed_check_title_counts", {}).items()
+        ],
+        columns=["filename", "check_title", "severity", "count"],
+    )
+    return files, pillars, severities, titles
 
-# Analyze trends across multiple files and save results to a new JSON file
-def analyze_trends(summaries):
-    if not summaries:
-        logging.info("No summaries found to analyze.")
-        return
 
-    # Calculate total findings and failed findings across all files
-    total_findings = sum(summary.get("total_findings", 0) for summary in summaries)
-    total_failed_findings = sum(
-        summary.get("failed_findings", 0) for summary in summaries
-    )
+# Sum counts per key, largest first
+def total_counts(df, key):
+    return df.groupby(key)["count"].sum().sort_values(ascending=False)
 
-    # Initialize dictionaries to store combined counts
-    combined_pillar_counts = {}
-    combined_severity_counts = {}
-    severity_grouped_check_title_counts = {}
-
-    # Iterate through each summary and aggregate the counts
-    for summary in summaries:
-        # Aggregate pillar counts
-        pillar_counts = summary.get("failed_pillar_counts", {})
-        for pillar, count in pillar_counts.items():
-            combined_pillar_counts[pillar] = (
-                combined_pillar_counts.get(pillar, 0) + count
-            )
 
-        # Aggregate severity counts
-        severity_counts = summary.get("failed_severity_counts", {})
-        for severity, count in severity_counts.items():
-            combined_severity_counts[severity] = (
-                combined_severity_counts.get(severity, 0) + count
-            )
+# Sum check title counts grouped by severity, largest first within each severity
+def check_title_counts_by_severity(titles):
+    grouped = (
+        titles.groupby(["severity", "check_title"])["count"]
+        .sum()
+        .reset_index()
+        .sort_values("count", ascending=False, kind="stable")
+    )
+    return {
+        severity: dict(zip(group["check_title"], group["count"].tolist()))
+        for severity, group in grouped.groupby("severity", sort=False)
+    }
 
-        # Aggregate check title counts grouped by severity
-        check_title_counts = summary.get("failed_check_title_counts", {})
-        for title, details in check_title_counts.items():
-            count = details.get("count", 0)
-            severity = details.get("severity", "Unknown")
 
-            # Initialize the severity group if not already present
-            if severity not in severity_grouped_check_title_counts:
-                severity_grouped_check_title_counts[severity] = {}
+# Compare failed check title counts between the last window_days before as_of
+# and the window_days before that
+def analyze_time_window(files, titles, window_days, as_of=None):
+    if as_of is None:
+        as_of = files["timestamp"].max()
+    if pd.isna(as_of):
+        logging.info("No summary timestamps found; skipping time-windowed trends.")
+        return None
 
-            # Add or update the check title count under the appropriate severity
-            if title not in severity_grouped_check_title_counts[severity]:
-                severity_grouped_check_title_counts[severity][title] = 0
-            severity_grouped_check_title_counts[severity][title] += count
+    window = pd.Timedelta(days=window_days)
+    current_start = as_of - window
+    previous_start = current_start - window
 
-    # Convert aggregated data to pandas Series for better display
-    pillar_counts_series = pd.Series(combined_pillar_counts).sort_values(
-        ascending=False
+    period = pd.Series(None, index=files.index, dtype="object")
+    period[(files["timestamp"] > current_start) & (files["timestamp"] <= as_of)] = (
+        "current"
     )
-    severity_counts_series = pd.Series(combined_severity_counts).sort_values(
-        ascending=False
+    period[
+        (files["timestamp"] > previous_start) & (files["timestamp"] <= current_start)
+    ] = "previous"
+    file_periods = files.assign(period=period).dropna(subset=["period"])
+
+    windowed = titles.merge(file_periods[["filename", "period"]], on="filename")
+    changes = windowed.pivot_table(
+        index=["check_title", "severity"],
+        columns="period",
+        values="count",
+        aggfunc="sum",
+        fill_value=0,
+    ).reindex(columns=["current", "previous"], fill_value=0)
+    changes["change"] = changes["current"] - changes["previous"]
+    changes = changes[changes["change"] != 0].sort_values(
+        "change", key=lambda change: change.abs(), ascending=False
     )
 
+    failed_by_period = file_periods.groupby("period")["failed_findings"].sum()
+    return {
+        "as_of": str(as_of),
+        "window_days": window_days,
+        "current_files": int((file_periods["period"] == "current").sum()),
+        "previous_files": int((file_periods["period"] == "previous").sum()),
+        "current_failed_findings": int(failed_by_period.get("current", 0)),
+        "previous_failed_findings": int(failed_by_period.get("previous", 0)),
+        "check_title_changes": [
+            {
+                "check_title": title,
+                "severity": severity,
+                "current": int(row["current"]),
+                "previous": int(row["previous"]),
+                "change": int(row["change"]),
+            }
+            for (title, severity), row in changes.iterrows()
+        ],
+    }
+
+
+# Analyze trends across multiple files and save results to a new JSON file
+def analyze_trends(summaries, top=None, window_days=None, as_of=None):
+    if not summaries:
+        logging.info("No summaries found to analyze.")
+        return
+
+    files, pillars, severities, titles = build_trend_frames(summaries)
+
+    # Calculate total findings and failed findings across all files
+    total_findings = int(files["total_findings"].sum())
+    total_failed_findings = int(files["failed_findings"].sum())
+    pillar_counts_series = total_counts(pillars, "pillar")
+    severity_counts_series = total_counts(severities, "severity")
+    severity_grouped_check_title_counts = check_title_counts_by_severity(titles)
+
     # Print insights
     print("\nSummary Insights Across All Files:")
     print(f"Total Findings Analyzed: {total_findings}")
@@ -115,20 +178,43 @@ def analyze_trends(summaries):
     print("\nTotal Severity by Severity Type:")
     print(severity_counts_series.to_string())
     print("\nCheck Titles Grouped by Severity:")
-    for severity, titles in severity_grouped_check_title_counts.items():
+    for severity, title_counts in severity_grouped_check_title_counts.items():
         print(f"\nSeverity: {severity}")
-        for title, count in titles.items():
+        for title, count in title_counts.items():
             print(f"  {title}: {count}")
 
+    if top:
+        print(f"\nTop {top} Failed Check Titles:")
+        print(total_counts(titles, "check_title").head(top).to_string())
+
     # Create a summary dictionary to save as JSON
     summary_data = {
         "total_findings": total_findings,
         "total_failed_findings": total_failed_findings,
-        "pillar_counts": combined_pillar_counts,
-        "severity_counts": combined_severity_counts,
+        "pillar_counts": {k: int(v) for k, v in pillar_counts_series.items()},
+        "severity_counts": {k: int(v) for k, v in severity_counts_series.items()},
         "check_title_counts": severity_grouped_check_title_counts,
     }
 
+    if window_days:
+        window_trends = analyze_time_window(files, titles, window_days, as_of)
+        if window_trends is not None:
+            summary_data["window_trends"] = window_trends
+            print(
+                f"\nChanges in the {window_days} days up to {window_trends['as_of']} "
+                f"({window_trends['current_files']} files) vs the {window_days} days before "
+                f"({window_trends['previous_files']} files):"
+            )
+            print(
+                f"Failed findings: {window_trends['current_failed_findings']} "
+                f"(previously {window_trends['previous_failed_findings']})"
+            )
+            for change in window_trends["check_title_changes"][: top or 20]:
+                print(
+                    f"  {change['check_title']} [{change['severity']}]: "
+                    f"{change['previous']} -> {change['current']} ({change['change']:+d})"
+                )
+
     # Save the summary data to a new JSON file
     with open(output_json_file, "w") as outfile:
         json.dump(summary_data, outfile, indent=4)
@@ -136,16 +222,39 @@ def analyze_trends(summaries):
     print("\nSummary data saved to", output_json_file)
 
 
-# Main function to run the program
-def main():
+# Main function to run the program. argv defaults to the command line; the
+# subcommand CLI passes the arguments of the trends command.
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Analyze trends across the summaries of processed findings reports."
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        help="Print the N most frequently failed check titles.",
+    )
+    parser.add_argument(
+        "--window-days",
+        type=int,
+        help="Compare the last N days of summaries with the N days before them.",
+    )
+    parser.add_argument(
+        "--as-of",
+        type=pd.Timestamp,
+        help="End of the time window (YYYY-MM-DD). Defaults to the newest summary.",
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+
     # Load summaries from JSON file
     summaries = load_summary(summary_json_file)
 
-    # Load suggestion cache
-    suggestion_cache = load_suggestion_cache(cache_file)
-
     # Analyze trends across summaries and save the results
-    analyze_trends(summaries)
+    analyze_trends(
+        summaries, top=args.top, window_days=args.window_days, as_of=args.as_of
+    )
 
 
 if __name__ == "__main__":
@@ -1,48 +1,191 @@
 import os
-import pandas as pd
-import requests
 import json
+import hashlib
 import argparse
 import uuid
-from datetime import datetime
-import pytz
+import time
+import signal
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
 import logging
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+from ollama_client import (
+    DEFAULT_MODEL,
+    OllamaClient,
+    OllamaError,
+    OllamaPool,
+    OllamaTruncatedError,
+    parse_endpoint_spec,
+    summarize_generation_stats,
+)
+from summary_store import open_summary_store, export_summaries
+from similarity import build_similarity_index
+from cache_store import DEFAULT_CACHE_FILES, open_cache_store, migrate_json_to_sqlite
+from metrics import metrics, prompt_logger, enable_prompt_log
+from checkpoint import CheckpointStore, open_checkpoint_store
+from findings_index import FindingsIndex, open_findings_index
+from output_writer import (
+    CHECK_ID_COLUMN,
+    OUTPUT_EXTENSIONS,
+    SUGGESTION_COLUMN,
+    open_output_writer,
+    write_suggestions_table,
 )
 
-cache_file = "ollama_suggestion_cache.json"
+# pandas and pytz are imported by the functions that use them, so commands that
+# only touch the cache start without loading them
+
+
+# Configure logging for the command line and worker processes
+def configure_logging():
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+
+
 summary_folder = "summary"
 input_folder = "input"
 output_folder = "output"
 
+# Columns every Montycloud findings report must provide
+REQUIRED_COLUMNS = [
+    "Serial number",
+    "Pillar",
+    "Severity",
+    "Status",
+    "Resource ID",
+    "Resource Name",
+    "Resource Type",
+    "Question",
+    "Check Title",
+    "Check Description",
+    "Account Name",
+    "Account ID",
+    "Region",
+]
+
+# Low-cardinality columns loaded as categoricals, so each distinct value is
+# stored once per chunk instead of once per row
+CATEGORICAL_COLUMNS = [
+    "Pillar",
+    "Severity",
+    "Status",
+    "Resource Type",
+    "Region",
+    "Account ID",
+]
+FINDINGS_DTYPES = {column: "category" for column in CATEGORICAL_COLUMNS}
+
+# Summary counters of failed findings and the column each one counts
+SUMMARY_COUNT_COLUMNS = {
+    "pillar": "Pillar",
+    "severity": "Severity",
+    "check_title": "Check Title",
+    "account": "Account ID",
+    "region": "Region",
+}
+
+# Columns used to prompt Ollama and stored in each cache entry
+CACHE_ENTRY_COLUMNS = [
+    "Pillar",
+    "Question",
+    "Severity",
+    "Status",
+    "Resource Type",
+    "Check Title",
+    "Check Description",
+]
+
+# Placeholder written to the output when no suggestion could be generated
+SUGGESTION_UNAVAILABLE = "Suggestion unavailable (Ollama request failed)."
+
+# Placeholder written to the output for suggestions deferred by the time budget
+SUGGESTION_DEFERRED = "Suggestion deferred (time budget exhausted)."
+
+# Longest delay between watch mode passes that retry missing suggestions
+MAX_RETRY_INTERVAL = 24 * 3600
+
+# Order in which uncached findings are generated, most severe first. Other
+# severities come last.
+SEVERITY_PRIORITY = {"critical": 0, "high": 1, "medium": 2, "low": 3}
+
+# Version of the prompt templates. Bump it whenever a prompt changes, so cached
+# suggestions generated from the old prompt are regenerated.
+PROMPT_VERSION = 1
+
+# Fixed instructions sent as the system prompt, so every request starts with the
+# same prefix and Ollama can reuse its evaluation across requests
+SYSTEM_PROMPT = "Analyze the AWS Well-Architected Review findings you are given and suggest AWS solutions that can be implemented to directly address the issue described."
+
+# Layout of the prompt, recorded on new cache entries. Entries without it were
+# generated with the fixed instructions in the user prompt: they are still
+# served, but --stale selects them so they can be regenerated on demand.
+PROMPT_LAYOUT = "system"
+
+# System prompt of batch requests, which also fixes the response format
+BATCH_SYSTEM_PROMPT = (
+    SYSTEM_PROMPT
+    + ' Respond only with a JSON object of the form {"suggestions": [{"check_id": "<Check ID>", "suggestion": "<suggestion>"}]} with exactly one entry per finding. Each suggestion may use markdown.'
+)
+
+# Columns of a finding that go into the prompt, hashed to detect changed inputs
+PROMPT_COLUMNS = [
+    "Pillar",
+    "Question",
+    "Severity",
+    "Check Title",
+    "Check Description",
+    "Resource Type",
+]
+
+# Shared Ollama client, configured from the command line or created on first use
+ollama_client = None
 
-# Load cache from a JSON file
-def load_cache(cache_file):
-    logging.debug("Loading cache from %s", cache_file)
-    if os.path.exists(cache_file):
-        with open(cache_file, "r") as file:
-            return json.load(file)
-    else:
-        return {}
 
+# Index of cached checks used to reuse near-duplicate suggestions, if enabled
+similarity_index = None
 
-# Save the cache to a JSON file
-def save_cache(cache, cache_file):
-    logging.debug("Saving cache to %s", cache_file)
-    with open(cache_file, "w") as file:
-        json.dump(cache, file, indent=4)
+# Number of uncached findings packed into one prompt, and the column that
+# findings in the same batch must share
+batch_size = 1
+batch_group_by = "Pillar"
 
+# time.monotonic() deadline after which no new Ollama requests are issued, and
+# the check titles deferred because of it
+deadline = None
+deferred_titles = set()
 
-# Analyze each finding using Ollama, with caching based on check ID
+
+# Return True once the time budget of the run is used up
+def time_budget_exhausted():
+    return deadline is not None and time.monotonic() >= deadline
+
+
+# Return the shared Ollama client, creating one with default settings if needed
+def get_ollama_client():
+    global ollama_client
+    if ollama_client is None:
+        ollama_client = OllamaClient()
+    return ollama_client
+
+
+# Load the suggestion cache using the given backend (json or sqlite)
+def load_cache(cache_file, backend="json"):
+    return open_cache_store(cache_file, backend)
+
+
+# Persist any cache changes that are not yet on disk
+def save_cache(cache):
+    cache.save()
+
+
+# Analyze each finding using Ollama, with caching based on check ID.
+# Returns None when Ollama fails or the generation is cut off by --max-tokens or
+# --max-duration, so neither is ever cached.
 def analyze_finding_with_ollama(
     cache_entry, check_id, refresh=False, additional_info=None
 ):
-    # Use the host.docker.internal address for dev containers
-    ollama_host = os.getenv("OLLAMA_HOST", "http://host.docker.internal:11434/api")
-
     # Dynamic prompt - add a refresh note if we're refreshing
     refresh_note = ""
     if refresh:
@@ -53,10 +196,9 @@ def analyze_finding_with_ollama(
         f" Additional information: {additional_info}" if additional_info else ""
     )
 
-    # Compose the analysis prompt for each finding
+    # Compose the analysis prompt for each finding; the instructions are in the
+    # system prompt
     analysis_prompt = f"""
-    Analyze the following AWS Well-Architected Review finding and suggest AWS solutions that can be implemented to directly address the issue described:
-
     Pillar: {cache_entry['Pillar']}
     Question: {cache_entry['Question']}
     Severity: {cache_entry['Severity']}
@@ -68,149 +210,977 @@ def analyze_finding_with_ollama(
     {additional_info_note}
     """
 
+    logging.debug("Sending prompt to Ollama for Check ID: %s", check_id)
+    prompt_logger.debug(f"Prompt for Check ID: {check_id}\n{analysis_prompt}")
+
+    # Interact with the local Ollama instance
+    try:
+        with metrics.timer("ollama_call"):
+            suggestion = get_ollama_client().generate(
+                analysis_prompt, label=check_id, system=SYSTEM_PROMPT
+            )
+    except OllamaTruncatedError as e:
+        logging.warning(
+            "Discarding the cut off suggestion for Check ID %s: %s", check_id, e
+        )
+        metrics.increment("suggestions_truncated")
+        return None
+    except OllamaError as e:
+        logging.error("Ollama request failed for Check ID %s: %s", check_id, e)
+        metrics.increment("ollama_failures")
+        return None
+
+    logging.debug("New suggestion for Check Title '%s'", cache_entry["Check Title"])
+    prompt_logger.debug(
+        f"Suggestion for Check Title '{cache_entry['Check Title']}':\n{suggestion}"
+    )
+    return suggestion
+
+
+# Analyze several findings with a single Ollama prompt that asks for a JSON
+# object with one suggestion per check ID. Returns a dict of check ID to
+# suggestion for every finding whose suggestion came back valid.
+def analyze_findings_batch_with_ollama(batch):
+    findings = "\n".join(f"""
+    Check ID: {check_id}
+    Pillar: {row['Pillar']}
+    Question: {row['Question']}
+    Severity: {row['Severity']}
+    Check Title: {row['Check Title']}
+    Check Description: {row['Check Description']}
+    Resource Type: {row['Resource Type']}""" for row, check_id in batch)
+    analysis_prompt = findings
+
+    check_ids = [str(check_id) for _, check_id in batch]
+    logging.debug("Sending a batch prompt to Ollama for Check IDs: %s", check_ids)
+    prompt_logger.debug(
+        f"Batch prompt for Check IDs: {', '.join(check_ids)}\n{analysis_prompt}"
+    )
+    try:
+        with metrics.timer("ollama_call"):
+            response = get_ollama_client().generate(
+                analysis_prompt,
+                label=",".join(check_ids),
+                response_format="json",
+                system=BATCH_SYSTEM_PROMPT,
+            )
+    except OllamaError as e:
+        logging.error("Ollama batch request failed for Check IDs %s: %s", check_ids, e)
+        metrics.increment("ollama_failures")
+        return {}
+    prompt_logger.debug(
+        f"Batch response for Check IDs: {', '.join(check_ids)}\n{response}"
+    )
+    return parse_batch_response(response, check_ids)
+
+
+# Split a batch response into per-check suggestions, ignoring anything that is
+# not a non-empty suggestion for one of the requested check IDs
+def parse_batch_response(response, check_ids):
+    try:
+        parsed = json.loads(response)
+    except json.JSONDecodeError:
+        logging.warning("Batch response is not valid JSON: %s", response[:200])
+        return {}
+
+    items = parsed.get("suggestions") if isinstance(parsed, dict) else parsed
+    if not isinstance(items, list):
+        logging.warning("Batch response has no suggestions list: %s", response[:200])
+        return {}
+
+    suggestions = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        check_id = str(item.get("check_id", "")).strip()
+        suggestion = item.get("suggestion")
+        if check_id in check_ids and isinstance(suggestion, str) and suggestion.strip():
+            suggestions[check_id] = suggestion.strip()
+    return suggestions
+
+
+# Generate suggestions for a batch of findings. Batches of one use the regular
+# single-finding prompt; larger batches share one prompt and fall back to
+# single prompts for any finding missing from the reply. Every suggestion comes
+# with the model of the host that generated it.
+def generate_batch_suggestions(batch):
+    if len(batch) == 1:
+        row, check_id = batch[0]
+        suggestion = analyze_finding_with_ollama(row, check_id)
+        return [(row, check_id, suggestion, get_ollama_client().last_model)]
+
+    suggestions = analyze_findings_batch_with_ollama(batch)
+    batch_model = get_ollama_client().last_model
+    results = []
+    for row, check_id in batch:
+        suggestion = suggestions.get(str(check_id))
+        model = batch_model
+        if suggestion is None:
+            logging.info(
+                "No valid batch suggestion for Check ID %s, falling back to a single prompt",
+                check_id,
+            )
+            metrics.increment("batch_fallbacks")
+            suggestion = analyze_finding_with_ollama(row, check_id)
+            model = get_ollama_client().last_model
+        results.append((row, check_id, suggestion, model))
+    return results
+
+
+# Split pending findings into batches of findings that share the grouping
+# column, keeping the batches in the priority order of their first finding
+def make_batches(pending):
+    if batch_size <= 1:
+        return [[item] for item in pending]
+
+    groups = {}
+    for position, (row, check_id) in enumerate(pending):
+        groups.setdefault(row[batch_group_by], []).append((position, row, check_id))
+    batches = [
+        group[start : start + batch_size]
+        for group in groups.values()
+        for start in range(0, len(group), batch_size)
+    ]
+    batches.sort(key=lambda batch: batch[0][0])
+    return [[(row, check_id) for _, row, check_id in batch] for batch in batches]
+
+
+# Generate a batch unless the time budget is used up, in which case its findings
+# are deferred to a later run
+def generate_batch_within_budget(batch):
+    if time_budget_exhausted():
+        for row, _ in batch:
+            deferred_titles.add(row["Check Title"])
+        metrics.increment("suggestions_deferred", len(batch))
+        return []
+    return generate_batch_suggestions(batch)
+
+
+# Count the failed findings of each check title
+def failed_counts_by_title(df):
+    failed_df = df[df["Status"].str.lower() == "failed"]
+    return failed_df["Check Title"].value_counts()
+
+
+# Order pending findings by severity, then by how many findings of the check
+# failed, then by first appearance
+def prioritize_pending(pending_df, failed_counts):
+    import pandas as pd
+
+    order = pd.DataFrame(
+        {
+            "severity": pending_df["Severity"]
+            .str.lower()
+            .map(SEVERITY_PRIORITY)
+            .fillna(len(SEVERITY_PRIORITY))
+            .to_numpy(),
+            "failed": pending_df["Check Title"].map(failed_counts).fillna(0).to_numpy(),
+            "position": range(len(pending_df)),
+        }
+    ).sort_values(["severity", "failed", "position"], ascending=[True, False, True])
+    return pending_df.iloc[order["position"].to_numpy()]
+
+
+# Hash the prompt inputs of a finding or cache entry
+def prompt_input_hash(row):
+    text = "\n".join(str(row[column]) for column in PROMPT_COLUMNS)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# Record how a suggestion was generated: model, prompt version and layout, prompt
+# inputs and time
+def generation_metadata(row, model):
+    return {
+        "model": model,
+        "prompt_version": PROMPT_VERSION,
+        "prompt_layout": PROMPT_LAYOUT,
+        "input_hash": prompt_input_hash(row),
+        "created_at": datetime.now().isoformat(),
+    }
+
+
+# Return True if a cache entry was generated by an active model (any host's
+# model when several hosts are pooled) and the active prompt version, and has
+# not been invalidated. Given the finding, its prompt inputs
+# must also be unchanged. Entries written before these fields were recorded
+# count as generated by the default model with the first prompt version.
+def is_current_entry(entry, row=None):
+    if entry is None or "invalidated_at" in entry:
+        return False
+    if entry.get("model", DEFAULT_MODEL) not in get_ollama_client().models:
+        return False
+    if entry.get("prompt_version", 1) != PROMPT_VERSION:
+        return False
+    if row is not None and "input_hash" in entry:
+        return entry["input_hash"] == prompt_input_hash(row)
+    return True
+
+
+# Keep the check ID of a stale entry that is regenerated, or reserve a new one
+def check_id_for(cache, title):
+    entry = cache.get(title)
+    return entry["check_id"] if entry is not None else cache.allocate_check_id()
+
+
+# Build the cache entry stored for a finding and the suggestion a model generated
+def build_cache_entry(row, check_id, suggestion, model):
+    return {
+        "check_id": str(check_id),
+        "Pillar": row["Pillar"],
+        "Question": row["Question"],
+        "Severity": row["Severity"],
+        "Status": row["Status"],
+        "Resource Type": row["Resource Type"],
+        "Check Title": row["Check Title"],
+        "Check Description": row["Check Description"],
+        "suggestion": suggestion,
+        **generation_metadata(row, model),
+    }
+
+
+# Reuse the suggestion of a near-duplicate cached check for every pending title
+# that has one, and return the rows that still need a new suggestion. Titles
+# that already have a cache entry are pending because it is stale or their
+# inputs changed, so they are always regenerated rather than matched, least of
+# all against their own old suggestion.
+def reuse_similar_suggestions(cache, pending_df):
+    reused = []
+    for index, row in pending_df.iterrows():
+        if row["Check Title"] in cache:
+            continue
+        match = similarity_index.find(row["Check Title"], row["Check Description"])
+        if match is None or match[0] == row["Check Title"]:
+            continue
+        matched_title, score = match
+        matched_entry = cache[matched_title]
+        entry = build_cache_entry(
+            row,
+            check_id_for(cache, row["Check Title"]),
+            matched_entry["suggestion"],
+            matched_entry.get("model", DEFAULT_MODEL),
+        )
+        entry["reused_from"] = matched_entry["check_id"]
+        cache[row["Check Title"]] = entry
+        similarity_index.add(row["Check Title"], row["Check Description"])
+        reused.append(index)
+        metrics.increment("suggestions_reused")
+        logging.info(
+            "Reusing suggestion of '%s' (Check ID: %s, similarity %.2f) for '%s'",
+            matched_title,
+            matched_entry["check_id"],
+            score,
+            row["Check Title"],
+        )
+    return pending_df.drop(index=reused)
+
+
+# Generate suggestions for the distinct uncached check titles of a file using a
+# bounded pool of workers. Check IDs are assigned in order of first appearance
+# before dispatch, so they do not depend on the order in which Ollama answers.
+# Findings are dispatched most severe and most often failed first, so a run cut
+# short by its time budget has spent it on the most valuable suggestions.
+def generate_missing_suggestions(
+    cache, df, concurrency=1, save_interval=10, failed_counts=None
+):
+    # Work on the first row of each distinct check title only
+    with metrics.timer("cache_lookup"):
+        unique_df = df.dropna(subset=["Check Title"]).drop_duplicates(
+            subset="Check Title"
+        )
+        pending_df = unique_df[
+            [
+                not is_current_entry(cache.get(row["Check Title"]), row)
+                for _, row in unique_df.iterrows()
+            ]
+        ]
+    metrics.increment("cache_hits", len(unique_df) - len(pending_df))
+    metrics.increment("cache_misses", len(pending_df))
     logging.info(
-        f"Sending the following prompt to Ollama for Check ID: {check_id}\n{analysis_prompt}"
+        "%d distinct check titles: %d cached, %d to generate",
+        len(unique_df),
+        len(unique_df) - len(pending_df),
+        len(pending_df),
     )
+    if similarity_index is not None:
+        pending_df = reuse_similar_suggestions(cache, pending_df)
+    if pending_df.empty:
+        return
 
-    # Interact with the local Ollama instance
-    url = f"{ollama_host}/generate"
-    headers = {"Content-Type": "application/json"}
-    payload = {
-        "model": "gemma2:2b",  # Adjust this to the model you're using locally
-        "prompt": analysis_prompt,
-        "stream": False,  # Ensure streaming is disabled
+    check_ids = {
+        row["Check Title"]: check_id_for(cache, row["Check Title"])
+        for _, row in pending_df.iterrows()
     }
+    if failed_counts is None:
+        failed_counts = failed_counts_by_title(df)
+    pending = [
+        (row, check_ids[row["Check Title"]])
+        for _, row in prioritize_pending(pending_df, failed_counts).iterrows()
+    ]
 
-    logging.debug("Sending POST request to %s with payload: %s", url, payload)
-    response = requests.post(url, headers=headers, data=json.dumps(payload))
+    logging.info(
+        "Generating %d new suggestions with concurrency %d",
+        len(pending),
+        concurrency,
+    )
 
-    if response.headers.get("Content-Type", "").startswith("application/json"):
-        try:
-            response_json = response.json()
-            if "response" in response_json:
-                suggestion = response_json["response"].strip()
-                logging.info(
-                    f"New suggestion for Check Title '{cache_entry['Check Title']}': {suggestion}"
+    new_suggestions_count = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [
+            executor.submit(generate_batch_within_budget, batch)
+            for batch in make_batches(pending)
+        ]
+        for future in as_completed(futures):
+            for row, check_id, suggestion, model in future.result():
+                if suggestion is None:
+                    # Leave the title uncached so the next run retries it
+                    metrics.increment("suggestions_failed")
+                    continue
+                cache[row["Check Title"]] = build_cache_entry(
+                    row, check_id, suggestion, model
                 )
-                return suggestion
-            else:
-                logging.warning(
-                    "No suggestion provided in response for Check ID: %s", check_id
+                metrics.increment("suggestions_generated")
+                if similarity_index is not None:
+                    similarity_index.add(row["Check Title"], row["Check Description"])
+                new_suggestions_count += 1
+
+            # Save the cache periodically so finished work survives a crash
+            if new_suggestions_count >= save_interval:
+                save_cache(cache)
+                logging.info(
+                    f"Cache saved after {new_suggestions_count} new suggestions."
                 )
-                return "No suggestion provided."
-        except json.JSONDecodeError:
-            logging.error("Failed to parse JSON. Response was: %s", response.text)
-            return f"Failed to parse JSON. Response was: {response.text}"
-    else:
-        logging.error("Unexpected response format for Check ID: %s", check_id)
-        return "Unexpected response format."
+                new_suggestions_count = 0
 
+    if time_budget_exhausted():
+        logging.warning(
+            "Time budget exhausted, %d suggestions deferred so far",
+            len(deferred_titles),
+        )
 
-# Generate trends summary per analyzed file
-def generate_summary(df, filename):
-    logging.debug("Generating summary for file: %s", filename)
-    pst = pytz.timezone("America/Los_Angeles")
-    timestamp = datetime.now(pst).strftime("%Y-%m-%d %H:%M:%S %Z")
 
+# Resolve the suggestion for every distinct check title against a snapshot of
+# the current cache entries (see current_cache_snapshot), which already holds
+# the placeholders of deferred titles
+def resolve_suggestions(cache_snapshot, check_titles):
+    suggestions = {}
+    for title in check_titles.dropna().unique():
+        entry = cache_snapshot.get(title)
+        if entry is not None:
+            suggestions[title] = entry["suggestion"]
+        else:
+            suggestions[title] = SUGGESTION_UNAVAILABLE
+    return suggestions
+
+
+# Return the check ID cached for every check title, or None for titles that were
+# never cached
+def resolve_check_ids(cache, titles):
+    check_ids = {}
+    for title in titles:
+        entry = cache.get(title)
+        check_ids[title] = entry.get("check_id") if entry is not None else None
+    return check_ids
+
+
+# Start empty summary counters that can be updated one chunk at a time
+def new_summary_counts():
+    return {
+        "total_findings": 0,
+        "failed_findings": 0,
+        "pillar": Counter(),
+        "severity": Counter(),
+        "check_title": Counter(),
+        "account": Counter(),
+        "region": Counter(),
+        "check_title_severity": {},
+    }
+
+
+# Add the findings of a DataFrame (or a chunk of one) to the summary counters
+def update_summary_counts(counts, df):
     # Filter for failed checks only
     failed_checks_df = df[df["Status"].str.lower() == "failed"]
 
-    # Group check titles by severity
-    check_titles_with_severity = (
-        failed_checks_df.groupby("Check Title")["Severity"].first().to_dict()
+    counts["total_findings"] += len(df)
+    counts["failed_findings"] += len(failed_checks_df)
+
+    # Count the failed findings of every combination of the summary columns in a
+    # single grouped pass, in order of first appearance. Each counter is then a
+    # sum over these few groups rather than another pass over the rows.
+    groups = (
+        failed_checks_df.groupby(
+            list(SUMMARY_COUNT_COLUMNS.values()),
+            sort=False,
+            observed=True,
+            dropna=False,
+        )
+        .size()
+        .reset_index(name="count")
     )
+    for key, column in SUMMARY_COUNT_COLUMNS.items():
+        column_counts = groups.groupby(column, sort=False, observed=True)["count"].sum()
+        counts[key].update(column_counts[column_counts > 0].to_dict())
+
+    # Keep the severity of the first failed row seen for each check title
+    check_titles_with_severity = groups.dropna(
+        subset=["Check Title", "Severity"]
+    ).drop_duplicates(subset="Check Title")
+    for title, severity in zip(
+        check_titles_with_severity["Check Title"],
+        check_titles_with_severity["Severity"],
+    ):
+        counts["check_title_severity"].setdefault(title, severity)
+
+
+# Build the trends summary for a file from its accumulated counters
+def build_summary(counts, filename):
+    import pytz
+
+    logging.debug("Generating summary for file: %s", filename)
+    pst = pytz.timezone("America/Los_Angeles")
+    timestamp = datetime.now(pst).strftime("%Y-%m-%d %H:%M:%S %Z")
 
     summary = {
         "filename": filename,
-        "total_findings": len(df),
-        "failed_findings": len(failed_checks_df),  # Count of failed findings
-        "failed_pillar_counts": failed_checks_df["Pillar"].value_counts().to_dict(),
-        "failed_severity_counts": failed_checks_df["Severity"].value_counts().to_dict(),
+        "total_findings": counts["total_findings"],
+        "failed_findings": counts["failed_findings"],  # Count of failed findings
+        "failed_pillar_counts": dict(counts["pillar"].most_common()),
+        "failed_severity_counts": dict(counts["severity"].most_common()),
         "failed_check_title_counts": {
             title: {
                 "count": count,
-                "severity": check_titles_with_severity.get(title, "Unknown"),
+                "severity": counts["check_title_severity"].get(title, "Unknown"),
             }
-            for title, count in failed_checks_df["Check Title"].value_counts().items()
+            for title, count in counts["check_title"].most_common()
         },
+        "failed_account_counts": dict(counts["account"].most_common()),
+        "failed_region_counts": dict(counts["region"].most_common()),
         "timestamp": timestamp,  # Add the timestamp here
     }
     logging.debug("Summary generated: %s", summary)
     return summary
 
 
-# Save the summary to a JSON file
-def save_summary_to_json(summary, summary_json_path):
-    logging.debug("Saving summary to JSON file: %s", summary_json_path)
-    # Check if the file exists and load it, ensuring it's a list
-    if os.path.exists(summary_json_path):
-        with open(summary_json_path, "r") as file:
-            try:
-                existing_summary = json.load(file)
-                # Ensure it's a list, otherwise reset it to an empty list
-                if not isinstance(existing_summary, list):
+# Regenerate the suggestions of the given check IDs in place with the active
+# model and prompt version, keeping their check IDs. Entries whose regeneration
+# fails keep their previous suggestion.
+def update_cache_for_check_ids(update_check_ids, cache, additional_info=None):
+    titles_by_check_id = {
+        str(entry["check_id"]): title for title, entry in cache.items()
+    }
+    for check_id in map(str, update_check_ids):
+        title = titles_by_check_id.get(check_id)
+        if title is None:
+            logging.warning("Check ID %s not found in the cache. Skipping.", check_id)
+            continue
+
+        entry = cache[title]
+        suggestion = analyze_finding_with_ollama(
+            entry, check_id, refresh=True, additional_info=additional_info
+        )
+        if suggestion is None:
+            logging.warning("Keeping the previous suggestion for Check ID %s", check_id)
+            continue
+        entry["suggestion"] = suggestion
+        entry.update(generation_metadata(entry, get_ollama_client().last_model))
+        entry.pop("invalidated_at", None)
+        cache[title] = entry
+        logging.info("Updated suggestion for Check ID %s", check_id)
+    return cache
+
+
+# Return the check IDs of the cache entries that match every given filter: the
+# pillar and severity of the check, the model that generated it, a minimum age
+# in days, or only entries that are not current for the active model and prompt
+# or were generated with an older prompt layout
+def select_cache_entries(
+    cache,
+    pillars=None,
+    severities=None,
+    models=None,
+    older_than_days=None,
+    stale_only=False,
+):
+    pillars = pillars and {pillar.casefold() for pillar in pillars}
+    severities = severities and {severity.casefold() for severity in severities}
+    cutoff = (
+        None
+        if older_than_days is None
+        else datetime.now() - timedelta(days=older_than_days)
+    )
+
+    check_ids = []
+    for entry in cache.values():
+        if pillars and str(entry.get("Pillar")).casefold() not in pillars:
+            continue
+        if severities and str(entry.get("Severity")).casefold() not in severities:
+            continue
+        if models and entry.get("model", DEFAULT_MODEL) not in models:
+            continue
+        # Entries without a creation time predate it being recorded, so they
+        # count as older than any cutoff
+        if (
+            cutoff is not None
+            and "created_at" in entry
+            and datetime.fromisoformat(entry["created_at"]) > cutoff
+        ):
+            continue
+        if (
+            stale_only
+            and is_current_entry(entry)
+            and entry.get("prompt_layout") == PROMPT_LAYOUT
+        ):
+            continue
+        check_ids.append(str(entry["check_id"]))
+    return check_ids
+
+
+# Mark the given check IDs stale, so they are regenerated with the active model
+# the next time their check title is processed
+def invalidate_cache_entries(check_ids, cache):
+    titles_by_check_id = {
+        str(entry["check_id"]): title for title, entry in cache.items()
+    }
+    invalidated_at = datetime.now().isoformat()
+    for check_id in map(str, check_ids):
+        title = titles_by_check_id.get(check_id)
+        if title is None:
+            logging.warning("Check ID %s not found in the cache. Skipping.", check_id)
+            continue
+        entry = cache[title]
+        entry["invalidated_at"] = invalidated_at
+        cache[title] = entry
+    logging.info("Invalidated %d cache entries", len(check_ids))
+    return cache
+
+
+# Generate trends summary per analyzed file
+def generate_summary(df, filename):
+    counts = new_summary_counts()
+    update_summary_counts(counts, df)
+    return build_summary(counts, filename)
+
+
+# Load a findings CSV whole or in chunks, timing how long each piece takes to parse
+def read_findings(input_path, chunk_size=None):
+    import pandas as pd
+
+    logging.debug("Loading CSV data from %s", input_path)
+    with metrics.timer("csv_load"):
+        # The header is in row 9 (index 8)
+        if chunk_size:
+            chunks = iter(
+                pd.read_csv(
+                    input_path,
+                    header=8,
+                    dtype=FINDINGS_DTYPES,
+                    chunksize=chunk_size,
+                )
+            )
+        else:
+            chunks = iter([pd.read_csv(input_path, header=8, dtype=FINDINGS_DTYPES)])
+        df = next(chunks, None)
+    while df is not None:
+        yield df
+        with metrics.timer("csv_load"):
+            df = next(chunks, None)
+
+
+# Process a single findings CSV: attach suggestions, write the output and return
+# its summary. With a chunk size the report is streamed through in pieces, so
+# memory stays bounded by the chunk rather than by the whole export. The
+# suggestions of the run are generated beforehand, and the file is written from
+# a snapshot of the current cache entries, so Ollama is never called here.
+# With a checkpoint store, progress is recorded after every chunk and a file
+# that was interrupted part way continues after the last recorded chunk.
+# The parquet and arrow output formats store a "Check ID" per finding instead of
+# the suggestion text, and each suggestion once in a "_suggestions" table next to
+# it. With failed_only, only failed findings are written, while the summary
+# still counts every finding. With a findings index, the failed findings of
+# every chunk are added to it.
+def process_file(
+    cache_snapshot,
+    input_path,
+    filename,
+    output_folder,
+    chunk_size=None,
+    checkpoint=None,
+    input_hash=None,
+    output_format="csv",
+    failed_only=False,
+    findings_index=None,
+):
+    extension = OUTPUT_EXTENSIONS[output_format]
+    resume_from = checkpoint.resumable(filename, input_hash) if checkpoint else None
+    # Only CSV outputs can be truncated and appended to
+    if resume_from and (
+        output_format != "csv" or not resume_from["output_path"].endswith(extension)
+    ):
+        resume_from = None
+    if resume_from:
+        output_path = resume_from["output_path"]
+        counts = resume_from["counts"]
+        skip_rows = resume_from["rows_processed"]
+        missing_suggestions = resume_from["missing_suggestions"]
+        # Drop any rows written after the last checkpoint
+        with open(output_path, "r+b") as file:
+            file.truncate(resume_from["output_bytes"])
+        logging.info("Resuming %s after %d rows", input_path, skip_rows)
+        metrics.increment("files_resumed")
+    else:
+        # Replace an output an earlier run wrote with placeholders, or name a
+        # new one after the current timestamp
+        output_path = (
+            checkpoint.placeholder_output_path(filename) if checkpoint else None
+        )
+        if output_path is None or not output_path.endswith(extension):
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output_filename = f"{filename.split('.')[0]}_{timestamp}_output{extension}"
+            output_path = os.path.join(output_folder, output_filename)
+        counts = new_summary_counts()
+        skip_rows = 0
+        missing_suggestions = 0
+        if checkpoint:
+            checkpoint.start(filename, input_path, input_hash, output_path)
+        if findings_index is not None:
+            findings_index.clear_file(filename)
+
+    writer = open_output_writer(output_path, output_format, append=bool(resume_from))
+    suggestions = {}
+    try:
+        for chunk_index, df in enumerate(read_findings(input_path, chunk_size)):
+            # Check if all required columns are present
+            if chunk_index == 0:
+                with metrics.timer("column_validation"):
+                    missing_cols = [
+                        col for col in REQUIRED_COLUMNS if col not in df.columns
+                    ]
+                if missing_cols:
                     logging.warning(
-                        f"Warning: {summary_json_path} does not contain a list. Resetting it."
+                        f"Missing required columns {missing_cols} in file {input_path}. Skipping file."
                     )
-                    existing_summary = []
-            except json.JSONDecodeError:
-                logging.warning("Failed to decode %s. Resetting it.", summary_json_path)
-                existing_summary = []
-    else:
-        existing_summary = []
+                    metrics.increment("files_skipped")
+                    return None
 
-    # Check if an entry for the filename already exists
-    file_exists = False
-    for entry in existing_summary:
-        if entry["filename"] == summary["filename"]:
-            # Update the existing entry
-            entry.update(summary)
-            file_exists = True
-            break
+            # Skip the rows that were already written before the run was interrupted
+            if skip_rows:
+                skipped = min(skip_rows, len(df))
+                df = df.iloc[skipped:].copy()
+                skip_rows -= skipped
+                if df.empty:
+                    continue
 
-    if not file_exists:
-        # Add the new summary if the file wasn't found in existing entries
-        existing_summary.append(summary)
+            # Attach every suggestion with a single vectorized lookup
+            output_df = df
+            if failed_only:
+                output_df = df[df["Status"].str.lower() == "failed"].copy()
+            with metrics.timer("cache_lookup"):
+                suggestion_map = resolve_suggestions(
+                    cache_snapshot, output_df["Check Title"]
+                )
+                if output_format == "csv":
+                    output_df[SUGGESTION_COLUMN] = output_df["Check Title"].map(
+                        suggestion_map
+                    )
+                else:
+                    output_df[CHECK_ID_COLUMN] = output_df["Check Title"].map(
+                        resolve_check_ids(cache_snapshot, suggestion_map)
+                    )
+                    suggestions.update(suggestion_map)
+            missing_suggestions += (
+                output_df["Check Title"]
+                .map(suggestion_map)
+                .isin([SUGGESTION_UNAVAILABLE, SUGGESTION_DEFERRED])
+                .sum()
+            )
 
-    # Save the updated summary back to the JSON file
-    with open(summary_json_path, "w") as file:
-        json.dump(existing_summary, file, indent=4)
+            # Write the findings, appending every chunk after the first
+            with metrics.timer("output_write"):
+                writer.write(output_df)
+            if findings_index is not None:
+                with metrics.timer("findings_index"):
+                    index_failed_findings(
+                        findings_index,
+                        filename,
+                        df,
+                        counts["total_findings"],
+                        cache_snapshot,
+                    )
+            with metrics.timer("summary_generation"):
+                update_summary_counts(counts, df)
+            metrics.increment("rows_processed", len(df))
+            if checkpoint:
+                checkpoint.update_progress(
+                    filename,
+                    counts["total_findings"],
+                    os.path.getsize(output_path) if output_format == "csv" else 0,
+                    counts,
+                    int(missing_suggestions),
+                )
+            if chunk_size:
+                logging.info(
+                    "Processed %d rows of %s", counts["total_findings"], input_path
+                )
+    finally:
+        writer.close()
 
-    logging.info(
-        "Summary saved or updated for %s in %s", summary["filename"], summary_json_path
+    if output_format != "csv":
+        base_path = os.path.splitext(output_path)[0].removesuffix("_output")
+        suggestions_path = f"{base_path}_suggestions{extension}"
+        write_suggestions_table(
+            suggestions_path,
+            suggestions,
+            resolve_check_ids(cache_snapshot, suggestions),
+            output_format,
+        )
+    logging.info(f"Output file saved with suggestions at {output_path}")
+    metrics.increment("files_processed")
+
+    # Generate the summary for the file (without suggestions)
+    with metrics.timer("summary_generation"):
+        return build_summary(counts, filename)
+
+
+# Return the values of a column as strings, with None for missing values
+def column_strings(df, column):
+    present = df[column].notna().tolist()
+    strings = df[column].astype(str).tolist()
+    return [
+        string if is_present else None for string, is_present in zip(strings, present)
+    ]
+
+
+# Add the failed findings of a chunk to the findings index. Rows are numbered
+# from first_row, the position of the chunk in its file, so a chunk processed
+# again after an interrupted run replaces the rows it added before.
+def index_failed_findings(findings_index, filename, df, first_row, cache):
+    failed = (df["Status"].str.lower() == "failed").tolist()
+    failed_df = df[failed]
+    titles = column_strings(failed_df, "Check Title")
+    row_numbers = [first_row + i for i, is_failed in enumerate(failed) if is_failed]
+    findings = list(
+        zip(
+            row_numbers,
+            titles,
+            column_strings(failed_df, "Account ID"),
+            column_strings(failed_df, "Region"),
+            column_strings(failed_df, "Resource ID"),
+            column_strings(failed_df, "Resource Type"),
+        )
     )
 
+    check_ids = resolve_check_ids(cache, {title for title in titles if title})
+    checks = {}
+    for title, pillar, severity in zip(
+        titles,
+        column_strings(failed_df, "Pillar"),
+        column_strings(failed_df, "Severity"),
+    ):
+        if title is not None and title not in checks:
+            checks[title] = (title, check_ids[title], pillar, severity)
+    findings_index.add_findings(filename, findings, list(checks.values()))
 
-# Save the summary to a CSV file using pd.concat
-def save_summary_to_csv(summary, summary_file):
-    logging.debug("Saving summary to CSV file: %s", summary_file)
-    new_summary_df = pd.DataFrame([summary])
 
-    if not os.path.exists(summary_file):
-        new_summary_df.to_csv(summary_file, index=False)
-    else:
-        existing_summary = pd.read_csv(summary_file)
+# Read the first row of every distinct check title in a file, loading only the
+# columns needed to prompt Ollama and build cache entries, together with the
+# number of failed findings of each check title. With failed_only, only the
+# check titles of failed findings are collected.
+def collect_check_titles(input_path, chunk_size=None, failed_only=False):
+    import pandas as pd
+
+    df = pd.read_csv(
+        input_path,
+        header=8,
+        usecols=lambda col: col in CACHE_ENTRY_COLUMNS,
+        dtype=FINDINGS_DTYPES,
+        chunksize=chunk_size,
+    )
+    chunks = df if chunk_size else [df]
+    unique_chunks = []
+    failed_counts = []
+    for chunk in chunks:
+        if not all(col in chunk.columns for col in CACHE_ENTRY_COLUMNS):
+            return None
+        if failed_only:
+            chunk = chunk[chunk["Status"].str.lower() == "failed"]
+        unique_chunks.append(
+            chunk.dropna(subset=["Check Title"]).drop_duplicates(subset="Check Title")
+        )
+        failed_counts.append(failed_counts_by_title(chunk))
+    if not unique_chunks:
+        return None
+    unique_df = pd.concat(unique_chunks).drop_duplicates(subset="Check Title")
+    return unique_df, pd.concat(failed_counts).groupby(level=0).sum()
+
+
+# Generate the missing suggestions of the check titles collected from every
+# input file with a single prioritized call, so the most severe findings of the
+# whole run are generated first, whichever file or chunk they are in
+def generate_collected_suggestions(cache, collected, concurrency, save_interval):
+    import pandas as pd
+
+    if not collected:
+        return
+    generate_missing_suggestions(
+        cache,
+        pd.concat([unique_df for unique_df, _ in collected]),
+        concurrency,
+        save_interval,
+        failed_counts=pd.concat([counts for _, counts in collected])
+        .groupby(level=0)
+        .sum(),
+    )
+    save_cache(cache)
+
+
+# Return the check ID and suggestion of every current cache entry, with the
+# deferred placeholder for titles deferred by the time budget. Files are
+# processed against it once the suggestions of the run have been generated.
+def current_cache_snapshot(cache):
+    cache_snapshot = {
+        title: {"check_id": entry.get("check_id"), "suggestion": entry["suggestion"]}
+        for title, entry in cache.items()
+        if is_current_entry(entry)
+    }
+    for title in deferred_titles:
+        cache_snapshot.setdefault(title, {"suggestion": SUGGESTION_DEFERRED})
+    return cache_snapshot
+
+
+# Cached entries shared with worker processes, set once per worker
+worker_cache = None
+
+
+# Initialize a worker process with a read-only snapshot of the cache
+def init_worker(cache_snapshot):
+    global worker_cache
+    configure_logging()
+    worker_cache = cache_snapshot
 
-        # Check if an entry for the filename already exists in the CSV
-        if summary["filename"] not in existing_summary["filename"].values:
-            combined_summary = pd.concat(
-                [existing_summary, new_summary_df], ignore_index=True
-            )
-            combined_summary.to_csv(summary_file, index=False)
-            logging.info("Added summary for file %s", summary["filename"])
-        else:
-            # Update the existing entry in the DataFrame
-            existing_summary.loc[
-                existing_summary["filename"] == summary["filename"],
-                new_summary_df.columns,
-            ] = new_summary_df.values[0]
-            existing_summary.to_csv(summary_file, index=False)
-            logging.info("Updated summary for file %s", summary["filename"])
 
+# Process one file in a worker process using only cached suggestions. Returns
+# the summary and the worker's metrics for the file, for the parent to merge.
+def process_file_in_worker(
+    input_path,
+    filename,
+    output_folder,
+    chunk_size,
+    checkpoint_path,
+    input_hash,
+    output_format="csv",
+    failed_only=False,
+    findings_index_path=None,
+):
+    logging.info("Processing file: %s", input_path)
+    metrics.reset()
+    checkpoint = CheckpointStore(checkpoint_path)
+    findings_index = FindingsIndex(findings_index_path) if findings_index_path else None
+    try:
+        summary = process_file(
+            worker_cache,
+            input_path,
+            filename,
+            output_folder,
+            chunk_size=chunk_size,
+            checkpoint=checkpoint,
+            input_hash=input_hash,
+            output_format=output_format,
+            failed_only=failed_only,
+            findings_index=findings_index,
+        )
+    finally:
+        checkpoint.close()
+        if findings_index is not None:
+            findings_index.close()
+    return summary, metrics.snapshot()
+
+
+# Process input files across a pool of worker processes. Cache misses are
+# collected from every file and generated once in this process, so no two
+# workers ever ask Ollama for the same check title; the workers then only read
+# the cache, and their summaries are saved here by a single writer.
+def process_files_in_parallel(
+    cache,
+    input_files,
+    output_folder,
+    summary_store,
+    checkpoint,
+    input_hashes,
+    jobs,
+    save_interval=10,
+    concurrency=1,
+    chunk_size=None,
+    output_format="csv",
+    failed_only=False,
+    findings_index=None,
+):
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(
+                collect_check_titles, input_path, chunk_size, failed_only
+            ): input_path
+            for _, input_path in input_files
+        }
+        collected = []
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                logging.error(f"Error reading file {futures[future]}: {e}")
+                continue
+            if result is not None:
+                collected.append(result)
+    generate_collected_suggestions(cache, collected, concurrency, save_interval)
 
-# Process all CSV files in the input folder and generate suggestions and summaries
+    cache_snapshot = current_cache_snapshot(cache)
+    with ProcessPoolExecutor(
+        max_workers=jobs, initializer=init_worker, initargs=(cache_snapshot,)
+    ) as executor:
+        futures = {
+            executor.submit(
+                process_file_in_worker,
+                input_path,
+                filename,
+                output_folder,
+                chunk_size,
+                checkpoint.path,
+                input_hashes[filename],
+                output_format,
+                failed_only,
+                findings_index.path if findings_index is not None else None,
+            ): (filename, input_path)
+            for filename, input_path in input_files
+        }
+        for future in as_completed(futures):
+            filename, input_path = futures[future]
+            try:
+                summary, worker_metrics = future.result()
+            except Exception as e:
+                logging.error(f"Error processing file {input_path}: {e}")
+                metrics.increment("files_failed")
+                continue
+            metrics.merge(worker_metrics)
+            if summary is not None:
+                with metrics.timer("summary_save"):
+                    summary_store.upsert(summary)
+                checkpoint.complete(filename)
+
+
+# Process all CSV files in the input folder and generate suggestions and summaries.
+# Files completed by an earlier run whose content has not changed are skipped,
+# and files an earlier run was interrupted on are resumed, unless resume=False.
 def process_input_files(
-    cache, input_folder, output_folder, summary_folder, save_interval=10
+    cache,
+    input_folder,
+    output_folder,
+    summary_folder,
+    save_interval=10,
+    concurrency=1,
+    chunk_size=None,
+    jobs=1,
+    resume=True,
+    output_format="csv",
+    failed_only=False,
 ):
     logging.debug("Processing input files in folder: %s", input_folder)
     if not os.path.exists(output_folder):
@@ -221,10 +1191,9 @@ def process_input_files(
         os.makedirs(summary_folder)
         logging.debug("Created summary folder: %s", summary_folder)
 
-    next_check_id = len(cache) + 1  # Start from the next available check ID
-
     # Track processed files to avoid duplicates
     processed_files = set()
+    input_files = []
 
     with os.scandir(input_folder) as entries:
         for entry in entries:
@@ -233,114 +1202,329 @@ def process_input_files(
                 and entry.name.endswith(".csv")
                 and entry.name not in processed_files
             ):
-                input_path = entry.path
-                logging.info("Processing file: %s", input_path)
-
                 # Mark the file as processed
                 processed_files.add(entry.name)
+                input_files.append((entry.name, entry.path))
 
-                # Load the CSV data, specifying that the header is in row 9 (index 8)
-                logging.debug("Loading CSV data from %s", input_path)
-                try:
-                    df = pd.read_csv(input_path, header=8)
-
-                    required_columns = [
-                        "Serial number",
-                        "Pillar",
-                        "Severity",
-                        "Status",
-                        "Resource ID",
-                        "Resource Name",
-                        "Resource Type",
-                        "Question",
-                        "Check Title",
-                        "Check Description",
-                        "Account Name",
-                        "Account ID",
-                        "Region",
-                    ]
+    checkpoint = open_checkpoint_store(summary_folder)
+    if not resume:
+        checkpoint.clear()
 
-                    # Check if all required columns are present
-                    if not all(col in df.columns for col in required_columns):
-                        missing_cols = [
-                            col for col in required_columns if col not in df.columns
-                        ]
-                        logging.warning(
-                            f"Missing required columns {missing_cols} in file {input_path}. Skipping file."
-                        )
-                        continue
-
-                    # Track the number of new suggestions generated
-                    new_suggestions_count = 0
-
-                    # Process each finding in the CSV
-                    suggestions = []
-                    for index, row in df.iterrows():
-                        check_title = row["Check Title"]
-
-                        # Check if suggestion exists in cache
-                        if check_title in cache:
-                            suggestions.append(cache[check_title]["suggestion"])
-                            logging.info(
-                                f"Using cached suggestion for '{check_title}' (Check ID: {cache[check_title]['check_id']})"
-                            )
-                        else:
-                            # Analyze and store in cache
-                            suggestion = analyze_finding_with_ollama(row, next_check_id)
-                            suggestions.append(suggestion)
-                            cache[check_title] = {
-                                "check_id": str(next_check_id),
-                                "Pillar": row["Pillar"],
-                                "Question": row["Question"],
-                                "Severity": row["Severity"],
-                                "Status": row["Status"],
-                                "Resource Type": row["Resource Type"],
-                                "Check Title": check_title,
-                                "Check Description": row["Check Description"],
-                                "suggestion": suggestion,
-                            }
-                            next_check_id += 1  # Increment check ID
-                            new_suggestions_count += (
-                                1  # Increment new suggestions counter
-                            )
-
-                        # Save the cache and log message after every 10 new suggestions
-                        if new_suggestions_count >= 10:
-                            save_cache(cache, cache_file)
-                            logging.info(
-                                f"Cache saved after {new_suggestions_count} new suggestions (total findings processed: {index + 1})."
-                            )
-                            new_suggestions_count = 0  # Reset the counter
-
-                    # Get the current timestamp to append to the output file name
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-
-                    # Save the new CSV with suggestions
-                    output_filename = (
-                        f"{entry.name.split('.')[0]}_{timestamp}_output.csv"
-                    )
-                    output_path = os.path.join(output_folder, output_filename)
-                    df["Elastic Engineering Suggestions"] = suggestions
-                    df.to_csv(output_path, index=False, encoding="utf-8-sig")
-                    logging.info(f"CSV file saved with suggestions at {output_path}")
+    # Skip files that were completed before and have not changed since, and
+    # files with the same content as a file that was already processed
+    input_hashes = {}
+    pending_files = []
+    pending_hashes = set()
+    duplicate_files = []
+    for filename, input_path in input_files:
+        input_hash = checkpoint.fingerprint(filename, input_path)
+        input_hashes[filename] = input_hash
+        if checkpoint.is_completed(filename, input_hash):
+            logging.info("Skipping %s, already processed and unchanged", input_path)
+            metrics.increment("files_unchanged")
+        elif alias_duplicate(checkpoint, filename, input_path, input_hash):
+            continue
+        elif input_hash in pending_hashes:
+            # Wait for the first file with this content to be processed
+            duplicate_files.append((filename, input_path))
+        else:
+            pending_hashes.add(input_hash)
+            pending_files.append((filename, input_path))
 
-                    # Generate and save summary for the file (without suggestions)
-                    summary = generate_summary(df, entry.name)
+    # Upsert summaries as files finish and export summary.json/summary.csv once
+    summary_store = open_summary_store(summary_folder)
+    findings_index = open_findings_index(summary_folder)
+    try:
+        if jobs > 1:
+            process_files_in_parallel(
+                cache,
+                pending_files,
+                output_folder,
+                summary_store,
+                checkpoint,
+                input_hashes,
+                jobs,
+                save_interval=save_interval,
+                concurrency=concurrency,
+                chunk_size=chunk_size,
+                output_format=output_format,
+                failed_only=failed_only,
+                findings_index=findings_index,
+            )
+        else:
+            process_files_serially(
+                cache,
+                pending_files,
+                output_folder,
+                summary_store,
+                checkpoint,
+                input_hashes,
+                save_interval=save_interval,
+                concurrency=concurrency,
+                chunk_size=chunk_size,
+                output_format=output_format,
+                failed_only=failed_only,
+                findings_index=findings_index,
+            )
+        for filename, input_path in duplicate_files:
+            if not alias_duplicate(
+                checkpoint, filename, input_path, input_hashes[filename]
+            ):
+                logging.warning(
+                    "Skipping %s, the file with the same content was not processed",
+                    input_path,
+                )
+        with metrics.timer("summary_export"):
+            export_summaries(summary_store, summary_folder)
+    finally:
+        summary_store.close()
+        findings_index.close()
+        checkpoint.close()
 
-                    # Save summary as both JSON and CSV
-                    save_summary_to_json(
-                        summary, os.path.join(summary_folder, "summary.json")
-                    )
-                    save_summary_to_csv(
-                        summary, os.path.join(summary_folder, "summary.csv")
-                    )
 
-                except Exception as e:
-                    logging.error(f"Error processing file {input_path}: {e}")
+# Record a file as an alias of a completed file with the same content, so its
+# output and summary are reused instead of processing it again. Returns False
+# if no file with this content has been completed.
+def alias_duplicate(checkpoint, filename, input_path, input_hash):
+    original = checkpoint.find_completed(input_hash)
+    if original is None:
+        return False
+    checkpoint.alias(filename, input_path, original)
+    logging.info(
+        "Skipping %s, same content as %s (output %s)",
+        input_path,
+        original["filename"],
+        original["output_path"],
+    )
+    metrics.increment("files_aliased")
+    return True
+
+
+# Process input files one after another in this process. The check titles of
+# every file are collected first and generated with one prioritized call, as in
+# the parallel path, then each file is written from the resulting cache entries.
+def process_files_serially(
+    cache,
+    input_files,
+    output_folder,
+    summary_store,
+    checkpoint,
+    input_hashes,
+    save_interval=10,
+    concurrency=1,
+    chunk_size=None,
+    output_format="csv",
+    failed_only=False,
+    findings_index=None,
+):
+    collected = []
+    for _, input_path in input_files:
+        try:
+            result = collect_check_titles(input_path, chunk_size, failed_only)
+        except Exception as e:
+            logging.error(f"Error reading file {input_path}: {e}")
+            continue
+        if result is not None:
+            collected.append(result)
+    generate_collected_suggestions(cache, collected, concurrency, save_interval)
+
+    cache_snapshot = current_cache_snapshot(cache)
+    for filename, input_path in input_files:
+        logging.info("Processing file: %s", input_path)
+        try:
+            summary = process_file(
+                cache_snapshot,
+                input_path,
+                filename,
+                output_folder,
+                chunk_size=chunk_size,
+                checkpoint=checkpoint,
+                input_hash=input_hashes[filename],
+                output_format=output_format,
+                failed_only=failed_only,
+                findings_index=findings_index,
+            )
+            if summary is not None:
+                with metrics.timer("summary_save"):
+                    summary_store.upsert(summary)
+                checkpoint.complete(filename)
+        except Exception as e:
+            logging.error(f"Error processing file {input_path}: {e}")
+            metrics.increment("files_failed")
+
+
+# Write the run report next to the output files, and optionally the metrics in
+# the Prometheus text format
+def write_run_report(output_folder, prometheus_file=None):
+    os.makedirs(output_folder, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    report_path = os.path.join(output_folder, f"run_report_{timestamp}.json")
+    client = get_ollama_client()
+    extra = {"generation": summarize_generation_stats(client.generation_stats)}
+    if isinstance(client, OllamaPool):
+        extra["hosts"] = client.host_stats()
+    report = metrics.write_json(report_path, extra)
+    if prometheus_file:
+        metrics.write_prometheus(prometheus_file)
+    return report
+
+
+# Return the size and modification time of every CSV file in the input folder
+def scan_input_folder(input_folder):
+    snapshot = {}
+    with os.scandir(input_folder) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith(".csv"):
+                stat = entry.stat()
+                snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+# Process the input folder once in watch mode, with fresh metrics, generation
+# stats and time budget, then save the cache and write the run report of the
+# pass. Errors are logged so the daemon keeps running. Returns the number of
+# suggestions the pass generated or reused.
+def run_watch_pass(
+    cache,
+    input_folder,
+    output_folder,
+    summary_folder,
+    time_budget=None,
+    prometheus_file=None,
+    **process_options,
+):
+    global deadline
+    metrics.reset()
+    get_ollama_client().reset_stats()
+    deferred_titles.clear()
+    if time_budget is not None:
+        deadline = time.monotonic() + time_budget
+    # Pick up entries that cli.py refresh, --regenerate or --invalidate saved
+    # to a JSON cache file since the last pass
+    cache.reload()
+    try:
+        process_input_files(
+            cache, input_folder, output_folder, summary_folder, **process_options
+        )
+    except Exception as e:
+        logging.error(f"Error processing input folder {input_folder}: {e}")
+    save_cache(cache)
+    report = write_run_report(output_folder, prometheus_file)
+    counters = report["counters"]
+    return counters.get("suggestions_generated", 0) + counters.get(
+        "suggestions_reused", 0
+    )
+
+
+# Return the files of the input folder that an earlier pass wrote with
+# placeholders, because Ollama failed or the time budget deferred them
+def files_to_retry(summary_folder, filenames):
+    if not os.path.isdir(summary_folder):
+        return []
+    checkpoint = open_checkpoint_store(summary_folder)
+    try:
+        return [
+            name for name in checkpoint.files_missing_suggestions() if name in filenames
+        ]
+    finally:
+        checkpoint.close()
+
 
+# Keep processing the input folder as CSV files are added or changed, with the
+# cache and Ollama client kept warm between passes. The folder is polled every
+# poll_interval seconds, and a pass starts once new or changed files have been
+# left alone for debounce seconds, so files still being copied are not picked
+# up half written. Files that did not change are skipped by the checkpoint
+# manifest as usual, except files with placeholders for failed or deferred
+# suggestions, which start a pass of their own retry_interval seconds after the
+# last pass. Each retry that generates nothing doubles that delay, up to
+# MAX_RETRY_INTERVAL. Stops after the current pass once stop_event is set.
+def watch_input_folder(
+    cache,
+    input_folder,
+    output_folder,
+    summary_folder,
+    stop_event,
+    poll_interval=5.0,
+    debounce=2.0,
+    retry_interval=300.0,
+    **pass_options,
+):
+    os.makedirs(input_folder, exist_ok=True)
+    logging.info(
+        "Watching %s for new or changed CSV files every %.1f seconds",
+        input_folder,
+        poll_interval,
+    )
+    processed = {}
+    last_seen = None
+    changed_at = time.monotonic()
+    last_pass_at = time.monotonic()
+    retry_delay = retry_interval
+    while not stop_event.is_set():
+        current = scan_input_folder(input_folder)
+        if current != last_seen:
+            last_seen = current
+            changed_at = time.monotonic()
+        pending = [
+            name for name, stat in current.items() if processed.get(name) != stat
+        ]
+        retry = (
+            []
+            if pending or time.monotonic() - last_pass_at < retry_delay
+            else files_to_retry(summary_folder, current)
+        )
+        if (pending and time.monotonic() - changed_at >= debounce) or retry:
+            if pending:
+                logging.info("Processing %d new or changed files", len(pending))
+            else:
+                logging.info("Retrying the missing suggestions of %d files", len(retry))
+            generated = run_watch_pass(
+                cache, input_folder, output_folder, summary_folder, **pass_options
+            )
+            if pending or generated:
+                retry_delay = retry_interval
+            else:
+                retry_delay = min(retry_delay * 2, MAX_RETRY_INTERVAL)
+                logging.info(
+                    "Retry generated no suggestions, next retry in %.0f seconds",
+                    retry_delay,
+                )
+            processed = current
+            last_pass_at = time.monotonic()
+            # --no-resume only applies to the first pass
+            pass_options["resume"] = True
+        stop_event.wait(poll_interval)
+    logging.info("Stopped watching %s", input_folder)
+
+
+# Set stop_event on SIGINT or SIGTERM, so watch mode stops after the current
+# pass. A second signal interrupts right away.
+def install_stop_handlers(stop_event):
+    def handle_stop_signal(signum, frame):
+        if stop_event.is_set():
+            raise KeyboardInterrupt
+        logging.info("Received signal %d, stopping after the current pass", signum)
+        stop_event.set()
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, handle_stop_signal)
 
-# Main function to run the program
-def main():
+
+# Ollama takes keep_alive as a duration such as "30m" or as a number of seconds,
+# where a negative number keeps the model loaded indefinitely
+def parse_keep_alive(value):
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+# Main function to run the program. argv defaults to the command line; the
+# subcommand CLI passes the arguments of the process and refresh commands.
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description="Process CSV files and update suggestions in cache."
     )
@@ -355,6 +1539,60 @@ def main():
         type=str,
         help="Additional information to append to the prompt when updating suggestions.",
     )
+    parser.add_argument(
+        "--model",
+        default=DEFAULT_MODEL,
+        help="Ollama model used to generate suggestions. Cached suggestions of other models are regenerated when their check titles are processed.",
+    )
+    parser.add_argument(
+        "--ollama-host",
+        action="append",
+        metavar="HOST[,model=MODEL][,concurrency=N]",
+        help="Ollama endpoint to balance requests across. Repeat for several hosts; defaults to OLLAMA_HOST.",
+    )
+    parser.add_argument(
+        "--eject-after",
+        type=int,
+        default=3,
+        help="Eject an Ollama host after this many consecutive failed requests.",
+    )
+    parser.add_argument(
+        "--health-check-interval",
+        type=float,
+        default=30.0,
+        help="Seconds between health checks that re-admit ejected Ollama hosts.",
+    )
+    parser.add_argument(
+        "--invalidate",
+        action="store_true",
+        help="Mark the cache entries selected by the filters below stale and exit. They are regenerated the next time they are processed.",
+    )
+    parser.add_argument(
+        "--regenerate",
+        action="store_true",
+        help="Regenerate the cache entries selected by the filters below now and exit.",
+    )
+    parser.add_argument(
+        "--pillar", nargs="+", help="Select cache entries of these pillars."
+    )
+    parser.add_argument(
+        "--severity", nargs="+", help="Select cache entries of these severities."
+    )
+    parser.add_argument(
+        "--generated-by",
+        nargs="+",
+        help="Select cache entries generated by these models.",
+    )
+    parser.add_argument(
+        "--older-than",
+        type=float,
+        help="Select cache entries generated more than this many days ago.",
+    )
+    parser.add_argument(
+        "--stale",
+        action="store_true",
+        help="Select cache entries of another model, prompt version or prompt layout.",
+    )
     parser.add_argument(
         "--input-folder", default="input", help="Folder containing input CSV files."
     )
@@ -366,13 +1604,292 @@ def main():
         default="summary",
         help="Folder to save summary files (JSON and CSV).",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        help="Number of concurrent Ollama requests used for uncached check titles. Defaults to 1, or with --ollama-host to the total concurrency of the hosts.",
+    )
+    parser.add_argument(
+        "--export-summaries",
+        action="store_true",
+        help="Export summary.json and summary.csv from the summary store and exit.",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes used to process input files in parallel.",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        help="Stream each input CSV in chunks of this many rows instead of loading it whole.",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=sorted(OUTPUT_EXTENSIONS),
+        default="csv",
+        help="Format of the output files. parquet and arrow store each suggestion once in a separate table referenced by check ID, and need pyarrow.",
+    )
+    parser.add_argument(
+        "--failed-only",
+        action="store_true",
+        help="Only write failed findings to the output files. Summaries still count every finding.",
+    )
+    parser.add_argument(
+        "--connect-timeout",
+        type=float,
+        default=5.0,
+        help="Seconds to wait for a connection to Ollama.",
+    )
+    parser.add_argument(
+        "--read-timeout",
+        type=float,
+        default=300.0,
+        help="Seconds to wait for Ollama to answer a single request.",
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=3,
+        help="Number of retries for failed Ollama requests.",
+    )
+    parser.add_argument(
+        "--retry-backoff",
+        type=float,
+        default=1.0,
+        help="Base delay in seconds for exponential backoff between retries.",
+    )
+    parser.add_argument(
+        "--keep-alive",
+        help="How long Ollama keeps the model loaded after each request, e.g. 30m, 1h or -1 for as long as it runs. Defaults to the server's setting (5m).",
+    )
+    parser.add_argument(
+        "--no-warm-up",
+        action="store_true",
+        help="Do not load the model on the Ollama hosts at startup.",
+    )
+    parser.add_argument(
+        "--num-ctx",
+        type=int,
+        help="Context window of the model in tokens (Ollama's num_ctx option).",
+    )
+    parser.add_argument(
+        "--num-predict",
+        type=int,
+        help="Maximum number of tokens Ollama generates per suggestion (num_predict).",
+    )
+    parser.add_argument(
+        "--temperature",
+        type=float,
+        help="Sampling temperature of the model.",
+    )
+    parser.add_argument(
+        "--time-budget",
+        type=float,
+        help="Stop issuing new Ollama requests after this many seconds. Findings not generated by then get a placeholder and are generated by a later run.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="Number of uncached findings to analyze with a single prompt.",
+    )
+    parser.add_argument(
+        "--batch-group-by",
+        choices=["Pillar", "Resource Type"],
+        default="Pillar",
+        help="Only batch findings that share this column.",
+    )
+    parser.add_argument(
+        "--similarity-threshold",
+        type=float,
+        help="Reuse the suggestion of a cached check whose title and description are at least this similar (0-1).",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream tokens from Ollama and record time-to-first-token per check.",
+    )
+    parser.add_argument(
+        "--max-tokens",
+        type=int,
+        help="Cut off streamed generations after this many tokens.",
+    )
+    parser.add_argument(
+        "--max-duration",
+        type=float,
+        help="Cut off streamed generations after this many seconds.",
+    )
+    parser.add_argument(
+        "--cache-backend",
+        choices=sorted(DEFAULT_CACHE_FILES),
+        default="json",
+        help="Storage backend for the suggestion cache.",
+    )
+    parser.add_argument(
+        "--cache-file",
+        help="Path of the suggestion cache. Defaults to ollama_suggestion_cache.json or .db depending on the backend.",
+    )
+    parser.add_argument(
+        "--migrate-cache",
+        action="store_true",
+        help="Import the JSON suggestion cache into the SQLite cache and exit.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and process CSV files as they are added to or changed in the input folder, with the cache and Ollama client kept in memory.",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=5.0,
+        help="Seconds between scans of the input folder in watch mode.",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=2.0,
+        help="Seconds new or changed files must stay unchanged before watch mode processes them.",
+    )
+    parser.add_argument(
+        "--retry-interval",
+        type=float,
+        default=300.0,
+        help="Seconds between watch mode passes that retry files with failed or deferred suggestions.",
+    )
+    parser.add_argument(
+        "--no-resume",
+        action="store_true",
+        help="Reprocess every input file instead of skipping completed files and resuming interrupted ones.",
+    )
+    parser.add_argument(
+        "--prometheus-file",
+        help="Also write the run metrics to this file in the Prometheus text format.",
+    )
+    parser.add_argument(
+        "--log-prompts",
+        help="Write full prompt and response bodies to this file.",
+    )
+
+    args = parser.parse_args(argv)
+    configure_logging()
+    cache_path = args.cache_file or DEFAULT_CACHE_FILES[args.cache_backend]
+    cache_filters = [
+        args.pillar,
+        args.severity,
+        args.generated_by,
+        args.older_than,
+        args.stale,
+    ]
+    if (args.invalidate or args.regenerate) and not any(
+        cache_filter is not None and cache_filter is not False
+        for cache_filter in cache_filters
+    ):
+        parser.error(
+            "--invalidate and --regenerate need at least one of --pillar, --severity, --generated-by, --older-than or --stale"
+        )
 
-    args = parser.parse_args()
+    if args.export_summaries:
+        summary_store = open_summary_store(args.summary_folder)
+        export_summaries(summary_store, args.summary_folder)
+        summary_store.close()
+        return
+
+    if args.migrate_cache:
+        migrate_json_to_sqlite(
+            DEFAULT_CACHE_FILES["json"],
+            args.cache_file or DEFAULT_CACHE_FILES["sqlite"],
+        )
+        return
+
+    if args.log_prompts:
+        enable_prompt_log(args.log_prompts)
+
+    # Share one pooled Ollama client, or a pool of hosts, across all requests
+    global ollama_client, batch_size, batch_group_by, deadline
+    batch_size = args.batch_size
+    batch_group_by = args.batch_group_by
+    if args.time_budget is not None:
+        deadline = time.monotonic() + args.time_budget
+    client_options = {
+        "connect_timeout": args.connect_timeout,
+        "read_timeout": args.read_timeout,
+        "max_retries": args.max_retries,
+        "backoff_factor": args.retry_backoff,
+        "stream": args.stream,
+        "max_tokens": args.max_tokens,
+        "max_duration": args.max_duration,
+        "keep_alive": parse_keep_alive(args.keep_alive),
+        "options": {
+            option: value
+            for option, value in [
+                ("num_ctx", args.num_ctx),
+                ("num_predict", args.num_predict),
+                ("temperature", args.temperature),
+            ]
+            if value is not None
+        },
+    }
+    if args.ollama_host:
+        ollama_client = OllamaPool(
+            [parse_endpoint_spec(spec, args.model) for spec in args.ollama_host],
+            eject_after=args.eject_after,
+            health_check_interval=args.health_check_interval,
+            **client_options,
+        )
+    else:
+        ollama_client = OllamaClient(
+            model=args.model, pool_size=max(args.concurrency or 1, 10), **client_options
+        )
+    # Keep every host of a pool busy unless the concurrency is set by hand
+    if args.concurrency is None:
+        args.concurrency = (
+            ollama_client.max_concurrency
+            if isinstance(ollama_client, OllamaPool)
+            else 1
+        )
+
+    # Load the model in the background while the cache and input files load, so
+    # the first uncached finding does not pay for it
+    if not args.no_warm_up and not args.invalidate:
+        threading.Thread(target=ollama_client.warm_up, daemon=True).start()
 
     # Load the existing cache
-    suggestion_cache = load_cache(cache_file)
+    suggestion_cache = load_cache(cache_path, args.cache_backend)
+
+    # Index the current cached checks so near-duplicate titles reuse their suggestions
+    if args.similarity_threshold is not None:
+        global similarity_index
+        similarity_index = build_similarity_index(
+            {
+                title: entry
+                for title, entry in suggestion_cache.items()
+                if is_current_entry(entry)
+            },
+            args.similarity_threshold,
+        )
 
-    if args.update_check_ids:
+    if args.invalidate or args.regenerate:
+        # Select cache entries by the filters and invalidate or regenerate them
+        check_ids = select_cache_entries(
+            suggestion_cache,
+            pillars=args.pillar,
+            severities=args.severity,
+            models=args.generated_by,
+            older_than_days=args.older_than,
+            stale_only=args.stale,
+        )
+        logging.info("%d cache entries match the filters", len(check_ids))
+        if args.regenerate:
+            update_cache_for_check_ids(
+                check_ids, suggestion_cache, additional_info=args.additional_info
+            )
+        else:
+            invalidate_cache_entries(check_ids, suggestion_cache)
+        save_cache(suggestion_cache)
+    elif args.update_check_ids:
         # If the update-check-ids flag is used, only update the cache for the specified check IDs
         logging.info(f"Updating suggestions for Check IDs: {args.update_check_ids}")
         suggestion_cache = update_cache_for_check_ids(
@@ -380,15 +1897,67 @@ def main():
             suggestion_cache,
             additional_info=args.additional_info,
         )
-        save_cache(suggestion_cache, cache_file)
+        save_cache(suggestion_cache)
         logging.info("Cache updated with new suggestions.")
+    elif args.watch:
+        # Process input files as they arrive until SIGINT or SIGTERM
+        stop_event = threading.Event()
+        install_stop_handlers(stop_event)
+        if args.cache_backend == "json":
+            logging.warning(
+                "Watch mode merges the JSON cache with changes saved by other "
+                "commands, but a change saved while the daemon writes the file "
+                "can be lost; use --cache-backend sqlite to share the cache with "
+                "cli.py refresh, --regenerate or --invalidate"
+            )
+        watch_input_folder(
+            suggestion_cache,
+            args.input_folder,
+            args.output_folder,
+            args.summary_folder,
+            stop_event,
+            poll_interval=args.poll_interval,
+            debounce=args.debounce,
+            retry_interval=args.retry_interval,
+            time_budget=args.time_budget,
+            prometheus_file=args.prometheus_file,
+            concurrency=args.concurrency,
+            chunk_size=args.chunk_size,
+            jobs=args.jobs,
+            resume=not args.no_resume,
+            output_format=args.output_format,
+            failed_only=args.failed_only,
+        )
     else:
         # Otherwise, process input files and generate new suggestions and summaries
         process_input_files(
-            suggestion_cache, args.input_folder, args.output_folder, args.summary_folder
+            suggestion_cache,
+            args.input_folder,
+            args.output_folder,
+            args.summary_folder,
+            concurrency=args.concurrency,
+            chunk_size=args.chunk_size,
+            jobs=args.jobs,
+            resume=not args.no_resume,
+            output_format=args.output_format,
+            failed_only=args.failed_only,
         )
-        # Save the cache after processing all files
-        save_cache(suggestion_cache, cache_file)
+
+    generation_stats = ollama_client.generation_stats
+    if generation_stats:
+        logging.info(
+            "Generation stats: %s", summarize_generation_stats(generation_stats)
+        )
+    if isinstance(ollama_client, OllamaPool):
+        for host_stats in ollama_client.host_stats():
+            logging.info("Ollama host stats: %s", host_stats)
+    # Watch mode writes a run report per pass
+    if not args.watch:
+        write_run_report(args.output_folder, args.prometheus_file)
+
+    # Flush the cache and release pooled connections
+    suggestion_cache.close()
+    ollama_client.close()
 
 
 if __name__ == "__main__":
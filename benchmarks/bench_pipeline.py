@@ -0,0 +1,193 @@
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import tempfile
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+import analyzer
+from cache_store import JsonCacheStore
+from ollama_client import OllamaClient
+from benchmarks.fake_ollama import FakeOllamaServer
+from benchmarks.generate_report import write_synthetic_report
+
+
+# Return the given percentile (0-1) of a list of values, or None if it is empty
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[round(fraction * (len(ordered) - 1))]
+
+
+# Peak resident set size of this process and its children in MB
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is reported in KB on Linux and in bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return max(own, children)
+
+
+# Run the full process_input_files pipeline once against the fake server
+def run_pipeline(work_dir, cache, server, args, label):
+    input_folder = os.path.join(work_dir, "input")
+    output_folder = os.path.join(work_dir, label, "output")
+    summary_folder = os.path.join(work_dir, label, "summary")
+
+    titles = set()
+    rows = 0
+    for name in os.listdir(input_folder):
+        check_titles = pd.read_csv(
+            os.path.join(input_folder, name), header=8, usecols=["Check Title"]
+        )["Check Title"]
+        titles.update(check_titles.dropna().unique())
+        rows += len(check_titles)
+    misses = sum(1 for title in titles if title not in cache)
+
+    analyzer.ollama_client = OllamaClient(
+        host=server.url,
+        max_retries=args.max_retries,
+        backoff_factor=0.05,
+        pool_size=max(args.concurrency, 10),
+        stream=args.stream,
+    )
+    requests_before = server.requests
+    start = time.perf_counter()
+    analyzer.process_input_files(
+        cache,
+        input_folder,
+        output_folder,
+        summary_folder,
+        concurrency=args.concurrency,
+        chunk_size=args.chunk_size,
+        jobs=args.jobs,
+    )
+    elapsed = time.perf_counter() - start
+    stats = analyzer.ollama_client.generation_stats
+    analyzer.ollama_client.close()
+
+    latencies = [entry["total_duration"] for entry in stats]
+    ttfts = [
+        entry["time_to_first_token"]
+        for entry in stats
+        if entry["time_to_first_token"] is not None
+    ]
+    return {
+        "run": label,
+        "rows": rows,
+        "distinct_titles": len(titles),
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(rows / elapsed, 1) if elapsed else None,
+        "generations": len(stats),
+        "ollama_requests": server.requests - requests_before,
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p95": percentile(latencies, 0.95),
+        "time_to_first_token_p50": percentile(ttfts, 0.5),
+        "cache_hit_ratio": (round(1 - misses / len(titles), 3) if titles else None),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+# Compare results with a previous run and return the regressions found
+def find_regressions(results, baseline, max_regression):
+    baseline_by_key = {(r["run"], r["rows"]): r for r in baseline}
+    regressions = []
+    for result in results:
+        previous = baseline_by_key.get((result["run"], result["rows"]))
+        if not previous or not previous.get("rows_per_second"):
+            continue
+        floor = previous["rows_per_second"] * (1 - max_regression)
+        if result["rows_per_second"] < floor:
+            regressions.append(
+                f"{result['run']} with {result['rows']} rows: "
+                f"{result['rows_per_second']} rows/s < {floor:.1f} rows/s "
+                f"(baseline {previous['rows_per_second']})"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark process_input_files end to end against a fake Ollama server."
+    )
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10_000])
+    parser.add_argument("--distinct-titles", type=int, default=200)
+    parser.add_argument("--files", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--response-size", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int)
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument(
+        "--warm",
+        action="store_true",
+        help="Run each size a second time against the populated cache.",
+    )
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", help="Results JSON of a previous run.")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.2,
+        help="Allowed throughput drop against the baseline (0-1).",
+    )
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = []
+    with FakeOllamaServer(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        response_size=args.response_size,
+        seed=0,
+    ) as server:
+        for rows in args.rows:
+            with tempfile.TemporaryDirectory() as work_dir:
+                os.makedirs(os.path.join(work_dir, "input"))
+                for file_index in range(args.files):
+                    write_synthetic_report(
+                        os.path.join(work_dir, "input", f"report_{file_index}.csv"),
+                        rows,
+                        distinct_titles=args.distinct_titles,
+                        seed=file_index,
+                    )
+
+                cache = JsonCacheStore(os.path.join(work_dir, "cache.json"))
+                runs = ["cold", "warm"] if args.warm else ["cold"]
+                for label in runs:
+                    result = run_pipeline(work_dir, cache, server, args, label)
+                    results.append(result)
+                    print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = find_regressions(
+                results, json.load(file), args.max_regression
+            )
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+from cache_store import JsonCacheStore
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that cache-only commands must not import
+HEAVY_MODULES = ["pandas", "numpy", "pytz", "pyarrow", "requests"]
+
+
+# Write a JSON cache with the given number of entries
+def write_synthetic_cache(path, entries):
+    cache = JsonCacheStore(path)
+    for i in range(entries):
+        title = f"Synthetic check {i} should be remediated"
+        cache[title] = {
+            "check_id": str(cache.allocate_check_id()),
+            "Pillar": "security",
+            "Severity": ["Critical", "High", "Medium", "Low"][i % 4],
+            "Check Title": title,
+            "Check Description": f"Synthetic description of check {i}.",
+            "suggestion": "Use AWS Config rules and Systems Manager automation. " * 10,
+            "model": "gemma2:2b",
+            "prompt_version": 1,
+        }
+    cache.close()
+
+
+# Run a cli.py command in a fresh interpreter and return its wall time in seconds
+def time_command(command):
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, os.path.join(REPO_ROOT, "cli.py"), *command],
+        cwd=REPO_ROOT,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+# Return the heavy modules a cli.py command imports
+def imported_heavy_modules(command):
+    code = (
+        "import sys, json, cli\n"
+        f"cli.main({command!r})\n"
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]), file=sys.stderr)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=REPO_ROOT,
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    return json.loads(result.stderr.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure the startup time of the cache commands of cli.py."
+    )
+    parser.add_argument("--entries", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--target",
+        type=float,
+        default=0.5,
+        help="Maximum median seconds per command.",
+    )
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        cache_file = os.path.join(work_dir, "cache.json")
+        write_synthetic_cache(cache_file, args.entries)
+        commands = [
+            ["cache", "stats", "--cache-file", cache_file],
+            ["cache", "list", "--cache-file", cache_file],
+            ["cache", "show", "1", "--cache-file", cache_file],
+        ]
+        baseline = [
+            time_command(["cache", "show", "--help"]) for _ in range(args.repeat)
+        ]
+        for command in commands:
+            durations = [time_command(command) for _ in range(args.repeat)]
+            result = {
+                "command": " ".join(command[:2]),
+                "median_seconds": round(statistics.median(durations), 3),
+                "min_seconds": round(min(durations), 3),
+                "heavy_modules": imported_heavy_modules(command),
+            }
+            results.append(result)
+            print(json.dumps(result))
+
+    print(f"Argument parsing only: {statistics.median(baseline):.3f}s median")
+    failures = [
+        result
+        for result in results
+        if result["median_seconds"] > args.target or result["heavy_modules"]
+    ]
+    for result in failures:
+        print(
+            f"FAILED: {result['command']} took {result['median_seconds']}s "
+            f"(target {args.target}s), heavy modules {result['heavy_modules']}"
+        )
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
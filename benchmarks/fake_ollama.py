@@ -0,0 +1,189 @@
+import re
+import json
+import time
+import random
+import argparse
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Local stand-in for Ollama's /api/generate endpoint with configurable latency,
+# jitter, error rate and response size, used by the benchmarks and tests
+class FakeOllamaServer:
+    def __init__(
+        self,
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        response_size=500,
+        host="127.0.0.1",
+        port=0,
+        seed=None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.response_size = response_size
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; with Nagle's algorithm
+            # and delayed ACKs every keep-alive request would wait about 40 ms
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                if self.path.rstrip("/") == "/api/tags":
+                    self.send_json(200, {"models": [{"name": "gemma2:2b"}]})
+                else:
+                    self.send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if self.path.rstrip("/") != "/api/generate":
+                    self.send_json(404, {"error": "not found"})
+                    return
+
+                # Like Ollama, an empty prompt only loads the model
+                if not payload.get("prompt"):
+                    self.send_json(
+                        200,
+                        {"model": payload.get("model"), "response": "", "done": True},
+                    )
+                    return
+
+                delay, fail = server.next_request()
+                time.sleep(delay)
+                if fail:
+                    self.send_json(500, {"error": "simulated failure"})
+                    return
+
+                text = server.response_text(payload)
+                if payload.get("stream", True):
+                    self.send_stream(payload, text, delay)
+                else:
+                    self.send_json(200, server.final_chunk(payload, text, delay))
+
+            def send_json(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def send_stream(self, payload, text, delay):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                chunks = [
+                    {"model": payload.get("model"), "response": token, "done": False}
+                    for token in re.findall(r"\S+\s*", text)
+                ]
+                chunks.append(server.final_chunk(payload, "", delay))
+                for chunk in chunks:
+                    line = json.dumps(chunk).encode() + b"\n"
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                self.wfile.write(b"0\r\n\r\n")
+
+            def log_message(self, format, *args):
+                logging.debug("Fake Ollama: " + format, *args)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    # Draw the latency and failure outcome of the next request
+    def next_request(self):
+        with self.lock:
+            self.requests += 1
+            delay = max(0.0, self.latency + self.random.uniform(-1, 1) * self.jitter)
+            fail = self.random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        return delay, fail
+
+    # Build a response of roughly response_size characters. JSON format requests
+    # get one suggestion per "Check ID:" found in the prompt, like a batch reply.
+    def response_text(self, payload):
+        words = (
+            "Use AWS Config rules and Systems Manager automation. "
+            * (self.response_size // 50 + 1)
+        )[: self.response_size]
+        if payload.get("format") != "json":
+            return words
+        check_ids = re.findall(r"Check ID: (\S+)", payload.get("prompt", ""))
+        return json.dumps(
+            {
+                "suggestions": [
+                    {"check_id": check_id, "suggestion": words}
+                    for check_id in check_ids
+                ]
+            }
+        )
+
+    def final_chunk(self, payload, text, delay):
+        eval_count = max(1, self.response_size // 5)
+        return {
+            "model": payload.get("model"),
+            "response": text,
+            "done": True,
+            "eval_count": eval_count,
+            "eval_duration": int(delay * 1e9),
+        }
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+# Run the fake server in the foreground
+def main():
+    parser = argparse.ArgumentParser(description="Run a local fake Ollama server.")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--response-size", type=int, default=500)
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        response_size=args.response_size,
+        port=args.port,
+    )
+    print(f"Fake Ollama listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import numpy as np
+import pandas as pd
+
+PILLARS = [
+    "security",
+    "reliability",
+    "costOptimization",
+    "sustainability",
+    "operationalExcellence",
+    "performance",
+]
+SEVERITIES = ["Critical", "High", "Medium", "Low"]
+STATUSES = ["Failed", "Passed", "Error"]
+RESOURCE_TYPES = ["S3", "EC2", "IAM", "Lambda", "RDS", "CloudTrail", "EBS", "KMS"]
+REGIONS = ["us-east-1", "us-west-2", "eu-west-1", "ap-southeast-2"]
+
+# The 8-line preamble Montycloud writes above the column header
+PREAMBLE = [
+    "Montycloud DAY2 Well-Architected Assessment Report (Confidential),,,,,,,,,,,,",
+    ",,,,,,,,,,,,",
+    "Report generated by,benchmark@example.com,,,,,,,,,,,",
+    "Report generated at,08 Jul 2024 16:00:35 UTC,,,,,,,,,,,",
+    "Workload Name,Synthetic Benchmark Workload,,,,,,,,,,,",
+    "Review Owner,Benchmark,,,,,,,,,,,",
+    "Improvement Status,NOT_APPLICABLE,,,,,,,,,,,",
+    ",,,,,,,,,,,,",
+]
+
+
+# Write a synthetic Montycloud-format findings report with the given number of
+# rows drawn from distinct_titles check titles, in chunks to bound memory
+def write_synthetic_report(
+    path, rows, distinct_titles=200, accounts=5, seed=0, chunk_size=100_000
+):
+    rng = np.random.default_rng(seed)
+    title_ids = np.arange(distinct_titles)
+    titles = np.array([f"Synthetic check {i} should be remediated" for i in title_ids])
+    descriptions = np.array(
+        [f"Synthetic description of check {i} and why it matters." for i in title_ids]
+    )
+    title_pillars = rng.choice(PILLARS, distinct_titles)
+    title_severities = rng.choice(SEVERITIES, distinct_titles)
+    title_resource_types = rng.choice(RESOURCE_TYPES, distinct_titles)
+    account_ids = np.array([f"{100000000000 + i}" for i in range(accounts)])
+
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        file.write("\n".join(PREAMBLE) + "\n")
+        for start in range(0, rows, chunk_size):
+            count = min(chunk_size, rows - start)
+            title_index = rng.integers(0, distinct_titles, count)
+            account_index = rng.integers(0, accounts, count)
+            serial = np.arange(start + 1, start + count + 1)
+            pd.DataFrame(
+                {
+                    "Serial number": serial,
+                    "Pillar": title_pillars[title_index],
+                    "Severity": title_severities[title_index],
+                    "Status": rng.choice(STATUSES, count, p=[0.4, 0.55, 0.05]),
+                    "Resource ID": [f"res-{i}" for i in serial],
+                    "Resource Name": [f"resource-{i}" for i in serial],
+                    "Resource Type": title_resource_types[title_index],
+                    "Question": "How do you protect your workload?",
+                    "Check Title": titles[title_index],
+                    "Check Description": descriptions[title_index],
+                    "Account Name": [f"account-{i}" for i in account_index],
+                    "Account ID": account_ids[account_index],
+                    "Region": rng.choice(REGIONS, count),
+                }
+            ).to_csv(file, index=False, header=start == 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic Montycloud findings report."
+    )
+    parser.add_argument("path", help="CSV file to write.")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--distinct-titles", type=int, default=200)
+    parser.add_argument("--accounts", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_synthetic_report(
+        args.path, args.rows, args.distinct_titles, args.accounts, args.seed
+    )
+
+
+if __name__ == "__main__":
+    main()
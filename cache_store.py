@@ -0,0 +1,282 @@
+import os
+import json
+import sqlite3
+import logging
+import threading
+from collections.abc import MutableMapping
+
+DEFAULT_CACHE_FILES = {
+    "json": "ollama_suggestion_cache.json",
+    "sqlite": "ollama_suggestion_cache.db",
+}
+
+
+# Suggestion cache kept in memory and rewritten atomically to a JSON file on save.
+# When another process rewrote the file since it was loaded (e.g. cli.py refresh
+# next to a --watch daemon), reload() and save() merge its entries with the
+# titles changed in memory, which win.
+class JsonCacheStore(MutableMapping):
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.titles_by_check_id = {}
+        self.next_check_id = 1
+        self.dirty = False
+        self.changed_titles = set()
+        self.mtime_ns = None
+        self.lock = threading.Lock()
+
+        logging.debug("Loading cache from %s", path)
+        for title, entry in self._read().items():
+            self._index(title, entry)
+
+    # Read the entries of the cache file and remember its modification time
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        self.mtime_ns = os.stat(self.path).st_mtime_ns
+        with open(self.path, "r") as file:
+            return json.load(file)
+
+    # Take the entries of the cache file if another process changed it, keeping
+    # the titles set or deleted in memory since the last load or save
+    def _merge_file_changes(self):
+        if not os.path.exists(self.path):
+            return
+        if os.stat(self.path).st_mtime_ns == self.mtime_ns:
+            return
+        logging.info("Cache file %s changed on disk, merging it", self.path)
+        entries = self._read()
+        for title in self.changed_titles:
+            if title in self.entries:
+                entries[title] = self.entries[title]
+            else:
+                entries.pop(title, None)
+        self.entries = {}
+        self.titles_by_check_id = {}
+        for title, entry in entries.items():
+            other_title = self.titles_by_check_id.get(int(entry["check_id"]))
+            if other_title is not None:
+                logging.warning(
+                    "Check ID %s is used by both '%s' and '%s'",
+                    entry["check_id"],
+                    other_title,
+                    title,
+                )
+            self._index(title, entry)
+
+    # Pick up the changes other processes saved to the cache file
+    def reload(self):
+        with self.lock:
+            self._merge_file_changes()
+
+    # Track the check ID of an entry so lookups and allocation stay O(1)
+    def _index(self, title, entry):
+        self.entries[title] = entry
+        check_id = int(entry["check_id"])
+        self.titles_by_check_id[check_id] = title
+        self.next_check_id = max(self.next_check_id, check_id + 1)
+
+    def __getitem__(self, title):
+        return self.entries[title]
+
+    def __setitem__(self, title, entry):
+        with self.lock:
+            old_entry = self.entries.get(title)
+            if old_entry is not None:
+                self.titles_by_check_id.pop(int(old_entry["check_id"]), None)
+            self._index(title, entry)
+            self.changed_titles.add(title)
+            self.dirty = True
+
+    def __delitem__(self, title):
+        with self.lock:
+            entry = self.entries.pop(title)
+            self.titles_by_check_id.pop(int(entry["check_id"]), None)
+            self.changed_titles.add(title)
+            self.dirty = True
+
+    def __iter__(self):
+        return iter(list(self.entries))
+
+    def __len__(self):
+        return len(self.entries)
+
+    # Reserve the next unused check ID
+    def allocate_check_id(self):
+        with self.lock:
+            check_id = self.next_check_id
+            self.next_check_id += 1
+            return check_id
+
+    # Look up a cache entry by its check ID, returning None if it does not exist
+    def get_by_check_id(self, check_id):
+        title = self.titles_by_check_id.get(int(check_id))
+        return None if title is None else self.entries[title]
+
+    # Write the cache to a temporary file and atomically replace the old one
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            self._merge_file_changes()
+            logging.debug("Saving cache to %s", self.path)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as file:
+                json.dump(self.entries, file, indent=4)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.path)
+            self.mtime_ns = os.stat(self.path).st_mtime_ns
+            self.changed_titles = set()
+            self.dirty = False
+
+    def close(self):
+        self.save()
+
+
+# Suggestion cache in SQLite, indexed by check title and check ID. Every write
+# is committed on its own, so a crash never loses or truncates earlier entries.
+class SqliteCacheStore(MutableMapping):
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS suggestions (
+                    check_title TEXT PRIMARY KEY,
+                    check_id INTEGER NOT NULL UNIQUE,
+                    entry TEXT NOT NULL
+                )
+                """)
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)"
+            )
+            self.connection.execute("""
+                INSERT OR IGNORE INTO meta (key, value)
+                SELECT 'next_check_id', COALESCE(MAX(check_id), 0) + 1 FROM suggestions
+                """)
+
+    def __getitem__(self, title):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT entry FROM suggestions WHERE check_title = ?", (title,)
+            ).fetchone()
+        if row is None:
+            raise KeyError(title)
+        return json.loads(row[0])
+
+    def __contains__(self, title):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT 1 FROM suggestions WHERE check_title = ?", (title,)
+            ).fetchone()
+        return row is not None
+
+    def __setitem__(self, title, entry):
+        check_id = int(entry["check_id"])
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO suggestions (check_title, check_id, entry) VALUES (?, ?, ?)",
+                (title, check_id, json.dumps(entry)),
+            )
+            self.connection.execute(
+                "UPDATE meta SET value = MAX(value, ?) WHERE key = 'next_check_id'",
+                (check_id + 1,),
+            )
+
+    def __delitem__(self, title):
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                "DELETE FROM suggestions WHERE check_title = ?", (title,)
+            )
+        if cursor.rowcount == 0:
+            raise KeyError(title)
+
+    def __iter__(self):
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT check_title FROM suggestions ORDER BY check_id"
+            ).fetchall()
+        return iter([row[0] for row in rows])
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute(
+                "SELECT COUNT(*) FROM suggestions"
+            ).fetchone()[0]
+
+    # Reserve the next unused check ID from the persisted counter
+    def allocate_check_id(self):
+        with self.lock, self.connection:
+            check_id = self.connection.execute(
+                "SELECT value FROM meta WHERE key = 'next_check_id'"
+            ).fetchone()[0]
+            self.connection.execute(
+                "UPDATE meta SET value = ? WHERE key = 'next_check_id'",
+                (check_id + 1,),
+            )
+        return check_id
+
+    # Look up a cache entry by its check ID, returning None if it does not exist
+    def get_by_check_id(self, check_id):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT entry FROM suggestions WHERE check_id = ?", (int(check_id),)
+            ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    # Every read goes to the database, so other processes' writes are already seen
+    def reload(self):
+        pass
+
+    # Every write is already committed, so there is nothing left to flush
+    def save(self):
+        pass
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+# Open the suggestion cache using the requested backend
+def open_cache_store(path, backend="json"):
+    if backend == "json":
+        return JsonCacheStore(path)
+    if backend == "sqlite":
+        if not os.path.exists(path) and os.path.exists(DEFAULT_CACHE_FILES["json"]):
+            logging.warning(
+                "SQLite cache %s does not exist yet. Run with --migrate-cache to import %s.",
+                path,
+                DEFAULT_CACHE_FILES["json"],
+            )
+        return SqliteCacheStore(path)
+    raise ValueError(f"Unknown cache backend: {backend}")
+
+
+# Import every entry of a JSON cache file into a SQLite cache in one transaction
+def migrate_json_to_sqlite(json_path, sqlite_path):
+    source = JsonCacheStore(json_path)
+    target = SqliteCacheStore(sqlite_path)
+    try:
+        with target.lock, target.connection:
+            for title, entry in source.entries.items():
+                target.connection.execute(
+                    "INSERT OR REPLACE INTO suggestions (check_title, check_id, entry) VALUES (?, ?, ?)",
+                    (title, int(entry["check_id"]), json.dumps(entry)),
+                )
+            target.connection.execute(
+                "UPDATE meta SET value = MAX(value, ?) WHERE key = 'next_check_id'",
+                (source.next_check_id,),
+            )
+        logging.info(
+            "Migrated %d cache entries from %s to %s",
+            len(source),
+            json_path,
+            sqlite_path,
+        )
+        return len(source)
+    finally:
+        target.close()
@@ -0,0 +1,296 @@
+import os
+import json
+import sqlite3
+import hashlib
+import logging
+from collections import Counter
+from datetime import datetime
+
+CHECKPOINT_DB_FILE = "checkpoint.db"
+
+STATUS_IN_PROGRESS = "in_progress"
+STATUS_COMPLETED = "completed"
+
+# Columns added after the first version of the manifest, with their definitions
+ADDED_COLUMNS = {
+    "size": "INTEGER",
+    "mtime_ns": "INTEGER",
+    "alias_of": "TEXT",
+    "missing_suggestions": "INTEGER NOT NULL DEFAULT 0",
+}
+
+
+# Return the sha256 of a file's content, read in blocks to bound memory
+def file_hash(path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Convert summary counters to JSON and back, so a partially processed file can
+# continue counting where it stopped
+def dump_counts(counts):
+    return json.dumps(counts)
+
+
+def load_counts(data):
+    counts = json.loads(data)
+    # Counters added later are missing from older checkpoints
+    for key in ["pillar", "severity", "check_title", "account", "region"]:
+        counts[key] = Counter(counts.get(key, {}))
+    return counts
+
+
+# Checkpoint manifest of the processed input files: per input file its
+# content hash, size and mtime, output path, rows written so far, rows written
+# with a placeholder instead of a suggestion, and status.
+# Files with the same content as a completed file are recorded as aliases of
+# it. It lives in SQLite so worker processes can record their progress
+# alongside the main process.
+class CheckpointStore:
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=30)
+        with self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    filename TEXT PRIMARY KEY,
+                    input_hash TEXT NOT NULL,
+                    output_path TEXT NOT NULL,
+                    rows_processed INTEGER NOT NULL,
+                    output_bytes INTEGER NOT NULL,
+                    counts TEXT,
+                    status TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+                """)
+            columns = {
+                row[1]
+                for row in self.connection.execute("PRAGMA table_info(checkpoints)")
+            }
+            for column, definition in ADDED_COLUMNS.items():
+                if column not in columns:
+                    self.connection.execute(
+                        f"ALTER TABLE checkpoints ADD COLUMN {column} {definition}"
+                    )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS checkpoints_input_hash ON checkpoints (input_hash)"
+            )
+
+    def _checkpoint(self, row):
+        (
+            filename,
+            input_hash,
+            output_path,
+            rows_processed,
+            output_bytes,
+            counts,
+            status,
+            size,
+            mtime_ns,
+            alias_of,
+            missing_suggestions,
+        ) = row
+        return {
+            "filename": filename,
+            "input_hash": input_hash,
+            "output_path": output_path,
+            "rows_processed": rows_processed,
+            "output_bytes": output_bytes,
+            "counts": None if counts is None else load_counts(counts),
+            "status": status,
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "alias_of": alias_of,
+            "missing_suggestions": missing_suggestions,
+        }
+
+    def _select(self, where, params):
+        return self.connection.execute(
+            f"""
+            SELECT filename, input_hash, output_path, rows_processed, output_bytes,
+                counts, status, size, mtime_ns, alias_of, missing_suggestions
+            FROM checkpoints WHERE {where}
+            """,
+            params,
+        ).fetchall()
+
+    # Return the checkpoint of a file, or None if it was never started
+    def get(self, filename):
+        rows = self._select("filename = ?", (filename,))
+        return self._checkpoint(rows[0]) if rows else None
+
+    # Return the content hash of an input file. While its size and modification
+    # time match the manifest the recorded hash is reused without reading the
+    # file; otherwise the content is hashed again.
+    def fingerprint(self, filename, input_path):
+        stat = os.stat(input_path)
+        checkpoint = self.get(filename)
+        if (
+            checkpoint is not None
+            and checkpoint["size"] == stat.st_size
+            and checkpoint["mtime_ns"] == stat.st_mtime_ns
+        ):
+            return checkpoint["input_hash"]
+        return file_hash(input_path)
+
+    # Start (or restart) a file from its first row
+    def start(self, filename, input_path, input_hash, output_path):
+        stat = os.stat(input_path)
+        with self.connection:
+            self.connection.execute(
+                """
+                INSERT OR REPLACE INTO checkpoints (filename, input_hash, output_path,
+                    rows_processed, output_bytes, counts, status, updated_at, size,
+                    mtime_ns, alias_of)
+                VALUES (?, ?, ?, 0, 0, NULL, ?, ?, ?, ?, NULL)
+                """,
+                (
+                    filename,
+                    input_hash,
+                    output_path,
+                    STATUS_IN_PROGRESS,
+                    datetime.now().isoformat(),
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                ),
+            )
+
+    # Record a file as a completed alias of a completed file with the same
+    # content, sharing its output
+    def alias(self, filename, input_path, original):
+        stat = os.stat(input_path)
+        with self.connection:
+            self.connection.execute(
+                """
+                INSERT OR REPLACE INTO checkpoints (filename, input_hash, output_path,
+                    rows_processed, output_bytes, counts, status, updated_at, size,
+                    mtime_ns, alias_of)
+                VALUES (?, ?, ?, ?, ?, NULL, ?, ?, ?, ?, ?)
+                """,
+                (
+                    filename,
+                    original["input_hash"],
+                    original["output_path"],
+                    original["rows_processed"],
+                    original["output_bytes"],
+                    STATUS_COMPLETED,
+                    datetime.now().isoformat(),
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                    original["filename"],
+                ),
+            )
+
+    # Record the rows written so far, the output size, the summary counters and
+    # the rows written without a suggestion
+    def update_progress(
+        self, filename, rows_processed, output_bytes, counts, missing_suggestions=0
+    ):
+        with self.connection:
+            self.connection.execute(
+                """
+                UPDATE checkpoints SET rows_processed = ?, output_bytes = ?,
+                    counts = ?, missing_suggestions = ?, updated_at = ?
+                WHERE filename = ?
+                """,
+                (
+                    rows_processed,
+                    output_bytes,
+                    dump_counts(counts),
+                    missing_suggestions,
+                    datetime.now().isoformat(),
+                    filename,
+                ),
+            )
+
+    # Mark a file as completed once its summary is saved
+    def complete(self, filename):
+        with self.connection:
+            self.connection.execute(
+                "UPDATE checkpoints SET status = ?, updated_at = ? WHERE filename = ?",
+                (STATUS_COMPLETED, datetime.now().isoformat(), filename),
+            )
+        logging.debug("Checkpoint completed for %s", filename)
+
+    # Return True if the file was completed with the same content, its output is
+    # still there and every row of it got a suggestion
+    def is_completed(self, filename, input_hash):
+        checkpoint = self.get(filename)
+        return (
+            checkpoint is not None
+            and checkpoint["status"] == STATUS_COMPLETED
+            and checkpoint["input_hash"] == input_hash
+            and not checkpoint["missing_suggestions"]
+            and os.path.exists(checkpoint["output_path"])
+        )
+
+    # Return the checkpoint of a completed, non-alias file with this content
+    # whose output is still there and has every suggestion, or None
+    def find_completed(self, input_hash):
+        rows = self._select(
+            """
+            input_hash = ? AND status = ? AND alias_of IS NULL
+                AND missing_suggestions = 0
+            ORDER BY rowid
+            """,
+            (input_hash, STATUS_COMPLETED),
+        )
+        for row in rows:
+            checkpoint = self._checkpoint(row)
+            if os.path.exists(checkpoint["output_path"]):
+                return checkpoint
+        return None
+
+    # Return the checkpoint of a partially processed file that can be resumed:
+    # same content, rows already written and the output still on disk
+    def resumable(self, filename, input_hash):
+        checkpoint = self.get(filename)
+        if (
+            checkpoint is None
+            or checkpoint["status"] != STATUS_IN_PROGRESS
+            or checkpoint["input_hash"] != input_hash
+            or not checkpoint["rows_processed"]
+            or not os.path.exists(checkpoint["output_path"])
+            or os.path.getsize(checkpoint["output_path"]) < checkpoint["output_bytes"]
+        ):
+            return None
+        return checkpoint
+
+    # Return the output path of a file that was completed with placeholders for
+    # failed or deferred suggestions, or None. Processing the file again
+    # replaces that output instead of adding another one next to it.
+    def placeholder_output_path(self, filename):
+        checkpoint = self.get(filename)
+        if (
+            checkpoint is None
+            or checkpoint["status"] != STATUS_COMPLETED
+            or not checkpoint["missing_suggestions"]
+            or checkpoint["alias_of"] is not None
+        ):
+            return None
+        return checkpoint["output_path"]
+
+    # Return the names of the files written with placeholders for failed or
+    # deferred suggestions, which the next run processes again
+    def files_missing_suggestions(self):
+        rows = self.connection.execute(
+            "SELECT filename FROM checkpoints WHERE missing_suggestions > 0"
+        ).fetchall()
+        return [filename for (filename,) in rows]
+
+    # Forget every checkpoint, so all files are processed from scratch
+    def clear(self):
+        with self.connection:
+            self.connection.execute("DELETE FROM checkpoints")
+
+    def close(self):
+        self.connection.close()
+
+
+# Open the checkpoint manifest kept in the summary folder
+def open_checkpoint_store(summary_folder):
+    return CheckpointStore(os.path.join(summary_folder, CHECKPOINT_DB_FILE))
@@ -0,0 +1,247 @@
+import os
+import sys
+import json
+import argparse
+import importlib.util
+from collections import Counter
+from cache_store import DEFAULT_CACHE_FILES, open_cache_store
+from findings_index import FINDINGS_INDEX_FILE, QUERY_FIELDS, open_findings_index
+
+# Subcommand command line. Every command imports only what it needs: the cache
+# commands read the cache store directly, refresh loads analyzer.py without
+# pandas, and only process and trends load pandas.
+
+# Commands whose arguments are passed through to analyzer.py or analyze-summary.py
+PASSTHROUGH_COMMANDS = {"process", "refresh", "trends"}
+
+
+# Add the options that locate the suggestion cache
+def add_cache_arguments(parser):
+    parser.add_argument(
+        "--cache-backend",
+        choices=sorted(DEFAULT_CACHE_FILES),
+        default="json",
+        help="Storage backend of the suggestion cache.",
+    )
+    parser.add_argument(
+        "--cache-file",
+        help="Path of the suggestion cache. Defaults to ollama_suggestion_cache.json or .db depending on the backend.",
+    )
+
+
+# Open the suggestion cache selected by the options
+def open_cache(args):
+    path = args.cache_file or DEFAULT_CACHE_FILES[args.cache_backend]
+    return open_cache_store(path, args.cache_backend)
+
+
+# Return the cache entries ordered by check ID
+def sorted_entries(cache):
+    return sorted(cache.values(), key=lambda entry: int(entry["check_id"]))
+
+
+# Print one line per cache entry: check ID, severity, pillar, model and title
+def list_cache(args):
+    cache = open_cache(args)
+    try:
+        for entry in sorted_entries(cache):
+            if args.pillar and entry.get("Pillar") not in args.pillar:
+                continue
+            if args.severity and entry.get("Severity") not in args.severity:
+                continue
+            print(
+                "\t".join(
+                    [
+                        str(entry["check_id"]),
+                        str(entry.get("Severity", "")),
+                        str(entry.get("Pillar", "")),
+                        str(entry.get("model", "unrecorded")),
+                        str(entry.get("Check Title", "")),
+                    ]
+                )
+            )
+    finally:
+        cache.close()
+    return 0
+
+
+# Print a cache entry with its suggestion as JSON
+def show_cache_entry(args):
+    cache = open_cache(args)
+    try:
+        entry = cache.get_by_check_id(args.check_id)
+    finally:
+        cache.close()
+    if entry is None:
+        print(f"Check ID {args.check_id} not found in the cache.", file=sys.stderr)
+        return 1
+    print(json.dumps(entry, indent=4))
+    return 0
+
+
+# Print the number of cache entries per model, prompt version, pillar and
+# severity, and how many were invalidated or reused from a similar check
+def cache_stats(args):
+    cache = open_cache(args)
+    try:
+        entries = list(cache.values())
+    finally:
+        cache.close()
+    stats = {
+        "entries": len(entries),
+        "invalidated": sum(1 for entry in entries if "invalidated_at" in entry),
+        "reused": sum(1 for entry in entries if "reused_from" in entry),
+    }
+    for key, field, default in [
+        ("models", "model", "unrecorded"),
+        ("prompt_versions", "prompt_version", 1),
+        ("prompt_layouts", "prompt_layout", "user"),
+        ("pillars", "Pillar", "unknown"),
+        ("severities", "Severity", "unknown"),
+    ]:
+        counts = Counter(str(entry.get(field, default)) for entry in entries)
+        stats[key] = dict(counts.most_common())
+    print(json.dumps(stats, indent=4))
+    return 0
+
+
+# Print the failed findings matching the filters, or their counts per group,
+# from the findings index
+def query_findings(args):
+    if not os.path.exists(os.path.join(args.summary_folder, FINDINGS_INDEX_FILE)):
+        print(
+            f"No findings index in {args.summary_folder}. Process some files first.",
+            file=sys.stderr,
+        )
+        return 1
+    filters = {
+        field: getattr(args, field)
+        for field in QUERY_FIELDS
+        if getattr(args, field) is not None
+    }
+    findings_index = open_findings_index(args.summary_folder)
+    try:
+        columns, rows = findings_index.query(filters, args.group_by, args.limit)
+    finally:
+        findings_index.close()
+
+    if args.json:
+        print(json.dumps([dict(zip(columns, row)) for row in rows], indent=4))
+    else:
+        print("\t".join(columns))
+        for row in rows:
+            print("\t".join("" if value is None else str(value) for value in row))
+    return 0
+
+
+# Load analyze-summary.py, whose hyphenated name cannot be imported directly
+def load_analyze_summary():
+    spec = importlib.util.spec_from_file_location(
+        "analyze_summary",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "analyze-summary.py"),
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# Run a command that takes the flags of analyzer.py or analyze-summary.py
+def run_passthrough(command, argv):
+    if command == "trends":
+        load_analyze_summary().main(argv)
+        return 0
+
+    import analyzer
+
+    if command == "refresh":
+        argv = ["--update-check-ids", *argv]
+    analyzer.main(argv)
+    return 0
+
+
+# Main function of the subcommand command line
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Opportunity Analyzer: process findings reports, refresh and inspect cached suggestions, and analyze trends."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser(
+        "process",
+        add_help=False,
+        help="Process the input folder. Takes the flags of analyzer.py (process --help lists them).",
+    )
+    commands.add_parser(
+        "refresh",
+        add_help=False,
+        help="Regenerate the suggestions of the given check IDs: refresh CHECK_ID [CHECK_ID ...] [--additional-info TEXT].",
+    )
+    commands.add_parser(
+        "trends",
+        add_help=False,
+        help="Analyze trends across the summaries. Takes the flags of analyze-summary.py.",
+    )
+
+    cache_parser = commands.add_parser("cache", help="Inspect the suggestion cache.")
+    cache_commands = cache_parser.add_subparsers(dest="cache_command", required=True)
+    list_parser = cache_commands.add_parser("list", help="List the cache entries.")
+    add_cache_arguments(list_parser)
+    list_parser.add_argument(
+        "--pillar", nargs="+", help="Only list entries of these pillars."
+    )
+    list_parser.add_argument(
+        "--severity", nargs="+", help="Only list entries of these severities."
+    )
+    list_parser.set_defaults(handler=list_cache)
+    show_parser = cache_commands.add_parser(
+        "show", help="Show the cache entry of a check ID."
+    )
+    add_cache_arguments(show_parser)
+    show_parser.add_argument("check_id", type=int)
+    show_parser.set_defaults(handler=show_cache_entry)
+    stats_parser = cache_commands.add_parser(
+        "stats",
+        help="Count the cache entries per model, prompt version, pillar and severity.",
+    )
+    add_cache_arguments(stats_parser)
+    stats_parser.set_defaults(handler=cache_stats)
+
+    findings_parser = commands.add_parser(
+        "findings",
+        help="Query the failed findings of every processed file from the findings index.",
+    )
+    findings_parser.add_argument(
+        "--summary-folder",
+        default="summary",
+        help="Summary folder holding the findings index.",
+    )
+    for field in QUERY_FIELDS:
+        findings_parser.add_argument(
+            f"--{field.replace('_', '-')}",
+            dest=field,
+            nargs="+",
+            help=f"Only include findings with one of these {field.replace('_', ' ')} values.",
+        )
+    findings_parser.add_argument(
+        "--group-by",
+        nargs="+",
+        choices=list(QUERY_FIELDS),
+        help="Count the findings and distinct resources of each group instead of listing them.",
+    )
+    findings_parser.add_argument(
+        "--limit", type=int, help="Print at most this many rows."
+    )
+    findings_parser.add_argument(
+        "--json", action="store_true", help="Print the rows as JSON."
+    )
+    findings_parser.set_defaults(handler=query_findings)
+
+    args, extra = parser.parse_known_args(argv)
+    if args.command in PASSTHROUGH_COMMANDS:
+        return run_passthrough(args.command, extra)
+    if extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
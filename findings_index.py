@@ -0,0 +1,210 @@
+import os
+import sqlite3
+import logging
+
+FINDINGS_INDEX_FILE = "findings_index.db"
+
+# Fields findings can be filtered and grouped by, and the column holding each
+QUERY_FIELDS = {
+    "file": "fl.filename",
+    "check_id": "c.check_id",
+    "check_title": "c.check_title",
+    "pillar": "c.pillar",
+    "severity": "c.severity",
+    "account": "f.account_id",
+    "region": "f.region",
+    "resource_id": "f.resource_id",
+    "resource_type": "f.resource_type",
+}
+
+
+# Index of the failed findings of every processed file: one row per finding
+# with its check, account, region and resource, and one row per check with its
+# check ID, pillar and severity, so cross-report questions are answered without
+# reading the output files again. Files and checks are stored once and referenced
+# from each finding by an integer key, which keeps finding rows and their indexes
+# small. Findings are keyed by file and row number, so a chunk written again
+# after an interrupted run replaces its earlier rows. It lives in SQLite so
+# worker processes can add their files alongside the main process.
+class FindingsIndex:
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=30)
+        with self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            legacy = "filename" in self._columns("findings")
+            if legacy:
+                self._rename_legacy_tables()
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS files (
+                    file_id INTEGER PRIMARY KEY,
+                    filename TEXT NOT NULL UNIQUE
+                )
+                """)
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS checks (
+                    check_ref INTEGER PRIMARY KEY,
+                    check_title TEXT NOT NULL UNIQUE,
+                    check_id TEXT,
+                    pillar TEXT,
+                    severity TEXT
+                )
+                """)
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS findings (
+                    file_id INTEGER NOT NULL,
+                    row_number INTEGER NOT NULL,
+                    check_ref INTEGER,
+                    account_id TEXT,
+                    region TEXT,
+                    resource_id TEXT,
+                    resource_type TEXT,
+                    PRIMARY KEY (file_id, row_number)
+                ) WITHOUT ROWID
+                """)
+            # Region has a handful of values, so it is only indexed behind the
+            # account it is usually filtered or grouped with
+            for name, columns in [
+                ("check_ref", "check_ref"),
+                ("account_region", "account_id, region"),
+                ("resource_id", "resource_id"),
+            ]:
+                self.connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS findings_{name} ON findings ({columns})"
+                )
+            if legacy:
+                self._migrate_legacy_tables()
+
+    def _columns(self, table):
+        return [
+            row[1] for row in self.connection.execute(f"PRAGMA table_info({table})")
+        ]
+
+    # Move the tables of an index written before files and checks had integer
+    # keys out of the way, along with their indexes
+    def _rename_legacy_tables(self):
+        logging.info("Converting findings index %s to integer keys", self.path)
+        for column in ["check_title", "account_id", "region", "resource_id"]:
+            self.connection.execute(f"DROP INDEX IF EXISTS findings_{column}")
+        self.connection.execute("ALTER TABLE findings RENAME TO legacy_findings")
+        self.connection.execute("ALTER TABLE checks RENAME TO legacy_checks")
+
+    # Copy the renamed tables into the current ones and drop them
+    def _migrate_legacy_tables(self):
+        self.connection.execute("""
+            INSERT OR IGNORE INTO files (filename)
+            SELECT DISTINCT filename FROM legacy_findings ORDER BY filename
+            """)
+        self.connection.execute("""
+            INSERT OR IGNORE INTO checks (check_title, check_id, pillar, severity)
+            SELECT check_title, check_id, pillar, severity FROM legacy_checks
+            """)
+        self.connection.execute("""
+            INSERT OR REPLACE INTO findings (file_id, row_number, check_ref,
+                account_id, region, resource_id, resource_type)
+            SELECT fl.file_id, f.row_number, c.check_ref, f.account_id, f.region,
+                f.resource_id, f.resource_type
+            FROM legacy_findings f
+            JOIN files fl ON fl.filename = f.filename
+            LEFT JOIN checks c ON c.check_title = f.check_title
+            """)
+        self.connection.execute("DROP TABLE legacy_findings")
+        self.connection.execute("DROP TABLE legacy_checks")
+
+    # Return the key of a file, adding it when it is not indexed yet
+    def _file_id(self, filename):
+        self.connection.execute(
+            "INSERT OR IGNORE INTO files (filename) VALUES (?)", (filename,)
+        )
+        return self.connection.execute(
+            "SELECT file_id FROM files WHERE filename = ?", (filename,)
+        ).fetchone()[0]
+
+    # Forget the findings of a file, before it is processed from its first row
+    def clear_file(self, filename):
+        with self.connection:
+            self.connection.execute(
+                """
+                DELETE FROM findings
+                WHERE file_id = (SELECT file_id FROM files WHERE filename = ?)
+                """,
+                (filename,),
+            )
+
+    # Add the failed findings of a file as (row number, check title, account ID,
+    # region, resource ID, resource type) tuples, and their checks as (check
+    # title, check ID, pillar, severity) tuples
+    def add_findings(self, filename, findings, checks):
+        with self.connection:
+            self.connection.executemany(
+                """
+                INSERT INTO checks (check_title, check_id, pillar, severity)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(check_title) DO UPDATE SET
+                    check_id = COALESCE(excluded.check_id, checks.check_id),
+                    pillar = excluded.pillar, severity = excluded.severity
+                """,
+                checks,
+            )
+            check_refs = dict(
+                self.connection.execute("SELECT check_title, check_ref FROM checks")
+            )
+            file_id = self._file_id(filename)
+            self.connection.executemany(
+                """
+                INSERT OR REPLACE INTO findings (file_id, row_number, check_ref,
+                    account_id, region, resource_id, resource_type)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (file_id, row_number, check_refs.get(title), *rest)
+                    for row_number, title, *rest in findings
+                ],
+            )
+
+    # Return the column names and rows of the failed findings matching every
+    # filter (a dict of query field to accepted values). With group_by, return
+    # the number of findings and distinct resources of each group instead,
+    # largest first.
+    def query(self, filters=None, group_by=None, limit=None):
+        where = []
+        params = []
+        for field, values in (filters or {}).items():
+            where.append(f"{QUERY_FIELDS[field]} IN ({', '.join('?' * len(values))})")
+            params.extend(str(value) for value in values)
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+
+        if group_by:
+            columns = [*group_by, "findings", "resources"]
+            group_sql = ", ".join(QUERY_FIELDS[field] for field in group_by)
+            sql = f"""
+                SELECT {group_sql}, COUNT(*), COUNT(DISTINCT f.resource_id)
+                FROM findings f JOIN files fl ON fl.file_id = f.file_id
+                LEFT JOIN checks c ON c.check_ref = f.check_ref
+                {where_sql} GROUP BY {group_sql} ORDER BY COUNT(*) DESC, {group_sql}
+                """
+        else:
+            columns = list(QUERY_FIELDS)
+            sql = f"""
+                SELECT {', '.join(QUERY_FIELDS.values())}
+                FROM findings f JOIN files fl ON fl.file_id = f.file_id
+                LEFT JOIN checks c ON c.check_ref = f.check_ref
+                {where_sql} ORDER BY fl.filename, f.row_number
+                """
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return columns, self.connection.execute(sql, params).fetchall()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM findings").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+
+# Open the findings index kept in the summary folder
+def open_findings_index(summary_folder):
+    path = os.path.join(summary_folder, FINDINGS_INDEX_FILE)
+    logging.debug("Opening findings index %s", path)
+    return FindingsIndex(path)
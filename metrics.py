@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+# Prefix of every metric name in the Prometheus text format
+PROMETHEUS_PREFIX = "opportunity_analyzer"
+
+# Upper bounds in seconds of the Prometheus histogram buckets
+HISTOGRAM_BUCKETS = [0.001, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300]
+
+# Opt-in channel for full prompt and response bodies. It does not propagate to
+# the root logger, so the bodies never reach the regular log.
+prompt_logger = logging.getLogger("prompts")
+prompt_logger.propagate = False
+prompt_logger.addHandler(logging.NullHandler())
+
+
+# Write full prompt and response bodies to the given file
+def enable_prompt_log(path):
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
+    prompt_logger.addHandler(handler)
+    prompt_logger.setLevel(logging.DEBUG)
+
+
+# Counters and stage duration histograms of a run. Worker processes take a
+# snapshot of their own metrics, which the parent merges into its own.
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started_at = datetime.now()
+            self.counters = Counter()
+            self.histograms = defaultdict(list)
+
+    def increment(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+    def observe(self, name, value):
+        with self.lock:
+            self.histograms[name].append(value)
+
+    # Record the duration of a stage in the "<stage>_seconds" histogram
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(f"{stage}_seconds", time.perf_counter() - start)
+
+    # Return the raw counters and observations, e.g. to send them to the parent
+    def snapshot(self):
+        with self.lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {name: list(v) for name, v in self.histograms.items()},
+            }
+
+    # Add the counters and observations of a snapshot to these metrics
+    def merge(self, snapshot):
+        with self.lock:
+            self.counters.update(snapshot["counters"])
+            for name, values in snapshot["histograms"].items():
+                self.histograms[name].extend(values)
+
+    # Build the run report with counters and per-histogram statistics
+    def report(self):
+        with self.lock:
+            finished_at = datetime.now()
+            return {
+                "started_at": self.started_at.isoformat(),
+                "finished_at": finished_at.isoformat(),
+                "duration_seconds": (finished_at - self.started_at).total_seconds(),
+                "counters": dict(sorted(self.counters.items())),
+                "histograms": {
+                    name: summarize_values(values)
+                    for name, values in sorted(self.histograms.items())
+                },
+            }
+
+    # Write the run report as JSON, replacing any old file atomically
+    def write_json(self, path, extra=None):
+        report = self.report()
+        report.update(extra or {})
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(report, file, indent=4)
+        os.replace(tmp_path, path)
+        logging.info("Run report saved to %s", path)
+        return report
+
+    # Write the counters and histograms in the Prometheus text format
+    def write_prometheus(self, path):
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(
+                (name, list(values)) for name, values in self.histograms.items()
+            )
+
+        lines = []
+        for name, value in counters:
+            metric = f"{PROMETHEUS_PREFIX}_{name}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        for name, values in histograms:
+            metric = f"{PROMETHEUS_PREFIX}_{name}"
+            lines.append(f"# TYPE {metric} histogram")
+            for bound in HISTOGRAM_BUCKETS:
+                count = sum(1 for value in values if value <= bound)
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {count}')
+            lines += [
+                f'{metric}_bucket{{le="+Inf"}} {len(values)}',
+                f"{metric}_sum {sum(values)}",
+                f"{metric}_count {len(values)}",
+            ]
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as file:
+            file.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+        logging.info("Prometheus metrics saved to %s", path)
+
+
+# Count, total and percentiles of a list of observations
+def summarize_values(values):
+    ordered = sorted(values)
+
+    def percentile(fraction):
+        return ordered[round(fraction * (len(ordered) - 1))]
+
+    return {
+        "count": len(ordered),
+        "sum": sum(ordered),
+        "min": ordered[0],
+        "max": ordered[-1],
+        "p50": percentile(0.5),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+    }
+
+
+# Metrics of the current run, shared by every module
+metrics = Metrics()
@@ -0,0 +1,596 @@
+import os
+import json
+import time
+import logging
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from metrics import metrics, prompt_logger
+
+# Use the host.docker.internal address for dev containers
+DEFAULT_OLLAMA_HOST = "http://host.docker.internal:11434/api"
+DEFAULT_MODEL = "gemma2:2b"  # Adjust this to the model you're using locally
+
+
+# Raised when Ollama could not produce a suggestion
+class OllamaError(Exception):
+    pass
+
+
+# Raised for failures that are worth retrying (timeouts, resets, 5xx, garbled bodies)
+class OllamaRetryableError(OllamaError):
+    pass
+
+
+# Raised when a streamed generation was cut off by max_tokens or max_duration,
+# so the partial text is never used as a finished suggestion
+class OllamaTruncatedError(OllamaError):
+    pass
+
+
+# Reusable Ollama client with a pooled keep-alive session, timeouts and retries.
+# In streaming mode the NDJSON token stream is consumed incrementally and cut
+# off after max_tokens tokens or max_duration seconds, which raises
+# OllamaTruncatedError. keep_alive is sent with
+# every request so Ollama keeps the model loaded that long after it, and options
+# (e.g. num_ctx, num_predict, temperature) are passed to the model as is.
+class OllamaClient:
+    def __init__(
+        self,
+        host=None,
+        model=DEFAULT_MODEL,
+        connect_timeout=5.0,
+        read_timeout=300.0,
+        max_retries=3,
+        backoff_factor=1.0,
+        pool_size=10,
+        stream=False,
+        max_tokens=None,
+        max_duration=None,
+        keep_alive=None,
+        options=None,
+    ):
+        self.host = (host or os.getenv("OLLAMA_HOST", DEFAULT_OLLAMA_HOST)).rstrip("/")
+        self.model = model
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.stream = stream
+        self.max_tokens = max_tokens
+        self.max_duration = max_duration
+        self.keep_alive = keep_alive
+        self.options = options or {}
+
+        # Latency and throughput of every successful generation in this run
+        self.generation_stats = []
+        self.stats_lock = threading.Lock()
+
+        # One session shares keep-alive connections across all requests and threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    # Send the generate request and check the HTTP status
+    def _post(self, payload):
+        url = f"{self.host}/generate"
+        logging.debug("Sending POST request to %s", url)
+        prompt_logger.debug("POST %s with payload: %s", url, payload)
+        metrics.increment("ollama_requests")
+        try:
+            response = self.session.post(
+                url, json=payload, timeout=self.timeout, stream=payload["stream"]
+            )
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise OllamaRetryableError(f"Request to {url} failed: {e}") from e
+
+        if response.status_code >= 500:
+            raise OllamaRetryableError(
+                f"Ollama returned HTTP {response.status_code}: {response.text[:200]}"
+            )
+        if response.status_code >= 400:
+            raise OllamaError(
+                f"Ollama returned HTTP {response.status_code}: {response.text[:200]}"
+            )
+        return response
+
+    # Send a single non-streaming request and return the text and its stats
+    def _post_generate(self, payload):
+        start = time.monotonic()
+        response = self._post(payload)
+        if not response.headers.get("Content-Type", "").startswith("application/json"):
+            raise OllamaRetryableError("Unexpected response format.")
+
+        try:
+            response_json = response.json()
+        except json.JSONDecodeError as e:
+            raise OllamaRetryableError(
+                f"Failed to parse JSON. Response was: {response.text[:200]}"
+            ) from e
+
+        suggestion = response_json.get("response", "").strip()
+        if not suggestion:
+            raise OllamaRetryableError("No suggestion provided in response.")
+        return suggestion, build_generation_stats(
+            start, None, None, response_json, truncated=False
+        )
+
+    # Send a single streaming request, assembling the text token by token
+    def _post_generate_stream(self, payload):
+        start = time.monotonic()
+        response = self._post(payload)
+
+        parts = []
+        first_token_at = None
+        final_chunk = {}
+        truncated = False
+        try:
+            with response:
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if "error" in chunk:
+                        raise OllamaRetryableError(f"Ollama error: {chunk['error']}")
+
+                    token = chunk.get("response", "")
+                    if token:
+                        if first_token_at is None:
+                            first_token_at = time.monotonic()
+                        parts.append(token)
+
+                    if chunk.get("done"):
+                        final_chunk = chunk
+                        break
+                    if self.max_tokens and len(parts) >= self.max_tokens:
+                        truncated = True
+                        break
+                    if (
+                        self.max_duration
+                        and time.monotonic() - start >= self.max_duration
+                    ):
+                        truncated = True
+                        break
+        except json.JSONDecodeError as e:
+            raise OllamaRetryableError(f"Failed to parse stream chunk: {e}") from e
+        except requests.RequestException as e:
+            raise OllamaRetryableError(f"Stream interrupted: {e}") from e
+
+        suggestion = "".join(parts).strip()
+        if not suggestion:
+            raise OllamaRetryableError("No suggestion provided in response.")
+        return suggestion, build_generation_stats(
+            start, first_token_at, len(parts), final_chunk, truncated
+        )
+
+    # Fields sent with every request to the model
+    def _model_payload(self):
+        payload = {"model": self.model}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        if self.options:
+            payload["options"] = self.options
+        return payload
+
+    # Generate a completion for the prompt, retrying with exponential backoff.
+    # The label (usually the check ID) identifies the generation in the stats,
+    # and response_format="json" asks Ollama to constrain the output to JSON.
+    # Fixed instructions go in the system prompt, so consecutive requests share
+    # the same prompt prefix and Ollama can reuse its evaluation.
+    def generate(self, prompt, label=None, response_format=None, system=None):
+        payload = {
+            **self._model_payload(),
+            "prompt": prompt,
+            "stream": self.stream,
+        }
+        if system:
+            payload["system"] = system
+        if response_format:
+            payload["format"] = response_format
+        post_generate = (
+            self._post_generate_stream if self.stream else self._post_generate
+        )
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                suggestion, stats = post_generate(payload)
+                break
+            except OllamaRetryableError as e:
+                if attempt == self.max_retries:
+                    raise OllamaError(
+                        f"Giving up after {attempt + 1} attempts: {e}"
+                    ) from e
+                delay = self.backoff_factor * (2**attempt)
+                metrics.increment("ollama_retries")
+                logging.warning(
+                    "Ollama request failed (%s), retrying in %.1fs (attempt %d/%d)",
+                    e,
+                    delay,
+                    attempt + 1,
+                    self.max_retries,
+                )
+                time.sleep(delay)
+
+        stats["label"] = label
+        stats["host"] = self.host
+        stats["model"] = self.model
+        stats["attempts"] = attempt + 1
+        with self.stats_lock:
+            self.generation_stats.append(stats)
+        log_generation_stats(stats)
+        if stats["truncated"]:
+            raise OllamaTruncatedError(
+                f"Generation cut off after {stats['tokens']} tokens and {stats['total_duration']:.2f}s"
+            )
+        return suggestion
+
+    # Load the model ahead of the first generation. Ollama loads the model and
+    # returns without generating when the prompt is empty. Returns False if the
+    # host could not load it; the run goes on and the first request retries.
+    def warm_up(self):
+        url = f"{self.host}/generate"
+        start = time.monotonic()
+        try:
+            with metrics.timer("ollama_warmup"):
+                response = self.session.post(
+                    url,
+                    json={**self._model_payload(), "prompt": "", "stream": False},
+                    timeout=self.timeout,
+                )
+        except requests.RequestException as e:
+            logging.warning("Warming up %s on %s failed: %s", self.model, self.host, e)
+            return False
+        if response.status_code >= 400:
+            logging.warning(
+                "Warming up %s on %s failed with HTTP %d: %s",
+                self.model,
+                self.host,
+                response.status_code,
+                response.text[:200],
+            )
+            return False
+        logging.info(
+            "Model %s is loaded on %s (%.2fs)",
+            self.model,
+            self.host,
+            time.monotonic() - start,
+        )
+        return True
+
+    # Forget the stats of earlier generations, e.g. between the passes of a
+    # long-running process that reports each pass on its own
+    def reset_stats(self):
+        with self.stats_lock:
+            self.generation_stats = []
+
+    # Models this client generates with
+    @property
+    def models(self):
+        return {self.model}
+
+    # Model that answered the last generation of the calling thread
+    @property
+    def last_model(self):
+        return self.model
+
+    # Return True if Ollama answers its model list endpoint
+    def check_health(self):
+        try:
+            response = self.session.get(f"{self.host}/tags", timeout=self.timeout)
+        except requests.RequestException as e:
+            logging.debug("Health check of %s failed: %s", self.host, e)
+            return False
+        return response.status_code == 200
+
+    # Release the pooled connections
+    def close(self):
+        self.session.close()
+
+
+# Parse an endpoint given as "HOST[,model=MODEL][,concurrency=N]"
+def parse_endpoint_spec(spec, default_model=DEFAULT_MODEL):
+    host, *options = spec.split(",")
+    endpoint = {"host": host, "model": default_model, "max_concurrency": 1}
+    for option in options:
+        key, _, value = option.partition("=")
+        if key == "model":
+            endpoint["model"] = value
+        elif key == "concurrency":
+            endpoint["max_concurrency"] = int(value)
+        else:
+            raise ValueError(f"Unknown option '{key}' in Ollama endpoint '{spec}'")
+    return endpoint
+
+
+# State of one Ollama host in a pool
+class OllamaEndpoint:
+    def __init__(self, client, max_concurrency):
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.healthy = True
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+
+
+# Spreads generations over several Ollama hosts, each with its own model and
+# maximum concurrency. Every request goes to the healthy host with the fewest
+# outstanding requests relative to its capacity, and a failed request is
+# retried on another host. A host that fails eject_after times in a row is
+# ejected until a background health check sees it answering again.
+class OllamaPool:
+    def __init__(
+        self,
+        endpoints,
+        eject_after=3,
+        health_check_interval=30.0,
+        **client_options,
+    ):
+        if not endpoints:
+            raise ValueError("An Ollama pool needs at least one endpoint.")
+        self.endpoints = [
+            OllamaEndpoint(
+                OllamaClient(
+                    host=endpoint["host"],
+                    model=endpoint["model"],
+                    pool_size=endpoint["max_concurrency"],
+                    **client_options,
+                ),
+                endpoint["max_concurrency"],
+            )
+            for endpoint in endpoints
+        ]
+        self.eject_after = eject_after
+        self.condition = threading.Condition()
+        # Model of the host that answered the last generation of each thread
+        self.local = threading.local()
+        self.started_at = time.monotonic()
+
+        # Hosts that do not answer at startup begin ejected
+        for endpoint in self.endpoints:
+            if not endpoint.client.check_health():
+                self._eject(endpoint, "failed its startup health check")
+
+        self.closed = threading.Event()
+        self.health_thread = threading.Thread(
+            target=self._health_loop, args=(health_check_interval,), daemon=True
+        )
+        self.health_thread.start()
+
+    # Model of the first host
+    @property
+    def model(self):
+        return self.endpoints[0].client.model
+
+    # Models served by any host of the pool
+    @property
+    def models(self):
+        return {endpoint.client.model for endpoint in self.endpoints}
+
+    # Model of the host that answered the last generation of the calling
+    # thread, recorded with the suggestion it generated
+    @property
+    def last_model(self):
+        return getattr(self.local, "model", self.model)
+
+    # Number of requests all hosts together take at once
+    @property
+    def max_concurrency(self):
+        return sum(endpoint.max_concurrency for endpoint in self.endpoints)
+
+    @property
+    def generation_stats(self):
+        return [
+            stats
+            for endpoint in self.endpoints
+            for stats in endpoint.client.generation_stats
+        ]
+
+    # Forget the generation stats and request counters of every host
+    def reset_stats(self):
+        with self.condition:
+            for endpoint in self.endpoints:
+                endpoint.client.reset_stats()
+                endpoint.requests = 0
+                endpoint.failures = 0
+                endpoint.ejections = 0
+            self.started_at = time.monotonic()
+
+    def _eject(self, endpoint, reason):
+        endpoint.healthy = False
+        endpoint.ejections += 1
+        logging.warning("Ejecting Ollama host %s: %s", endpoint.client.host, reason)
+
+    # Wait for the least loaded healthy host that has capacity left, skipping
+    # the hosts this request already failed on
+    def _acquire(self, tried):
+        with self.condition:
+            while True:
+                remaining = [
+                    endpoint
+                    for endpoint in self.endpoints
+                    if endpoint.healthy and endpoint not in tried
+                ]
+                if not remaining:
+                    raise OllamaError("No healthy Ollama host left to try.")
+                available = [
+                    endpoint
+                    for endpoint in remaining
+                    if endpoint.outstanding < endpoint.max_concurrency
+                ]
+                if available:
+                    endpoint = min(
+                        available,
+                        key=lambda e: e.outstanding / e.max_concurrency,
+                    )
+                    endpoint.outstanding += 1
+                    endpoint.requests += 1
+                    return endpoint
+                self.condition.wait()
+
+    def _release(self, endpoint, failed):
+        with self.condition:
+            endpoint.outstanding -= 1
+            if failed:
+                endpoint.failures += 1
+                endpoint.consecutive_failures += 1
+                if (
+                    endpoint.healthy
+                    and endpoint.consecutive_failures >= self.eject_after
+                ):
+                    self._eject(
+                        endpoint,
+                        f"{endpoint.consecutive_failures} consecutive failures",
+                    )
+            else:
+                endpoint.consecutive_failures = 0
+            self.condition.notify_all()
+
+    # Load the model of every healthy host, all at once
+    def warm_up(self):
+        endpoints = [endpoint for endpoint in self.endpoints if endpoint.healthy]
+        with ThreadPoolExecutor(max_workers=len(self.endpoints)) as executor:
+            results = list(
+                executor.map(lambda endpoint: endpoint.client.warm_up(), endpoints)
+            )
+        return bool(results) and all(results)
+
+    # Generate on the least loaded healthy host, failing over to the others. A
+    # generation cut off by the limits is not the host's fault and is not retried.
+    def generate(self, prompt, label=None, response_format=None, system=None):
+        tried = set()
+        while True:
+            endpoint = self._acquire(tried)
+            try:
+                suggestion = endpoint.client.generate(
+                    prompt, label=label, response_format=response_format, system=system
+                )
+            except OllamaTruncatedError:
+                self._release(endpoint, failed=False)
+                raise
+            except OllamaError as e:
+                self._release(endpoint, failed=True)
+                tried.add(endpoint)
+                logging.warning(
+                    "Ollama host %s failed for %s: %s", endpoint.client.host, label, e
+                )
+                continue
+            self._release(endpoint, failed=False)
+            self.local.model = endpoint.client.model
+            return suggestion
+
+    # Re-admit ejected hosts that answer their health check again
+    def check_health(self):
+        for endpoint in self.endpoints:
+            if endpoint.healthy or not endpoint.client.check_health():
+                continue
+            with self.condition:
+                endpoint.healthy = True
+                endpoint.consecutive_failures = 0
+                self.condition.notify_all()
+            logging.info("Ollama host %s is healthy again", endpoint.client.host)
+
+    def _health_loop(self, interval):
+        while not self.closed.wait(interval):
+            self.check_health()
+
+    # Requests, failures, ejections and throughput of every host
+    def host_stats(self):
+        elapsed = time.monotonic() - self.started_at
+        host_stats = []
+        for endpoint in self.endpoints:
+            summary = summarize_generation_stats(endpoint.client.generation_stats)
+            host_stats.append(
+                {
+                    "host": endpoint.client.host,
+                    "model": endpoint.client.model,
+                    "max_concurrency": endpoint.max_concurrency,
+                    "healthy": endpoint.healthy,
+                    "requests": endpoint.requests,
+                    "failures": endpoint.failures,
+                    "ejections": endpoint.ejections,
+                    "generations_per_minute": (
+                        summary["generations"] / elapsed * 60 if elapsed else None
+                    ),
+                    **summary,
+                }
+            )
+        return host_stats
+
+    def close(self):
+        self.closed.set()
+        for endpoint in self.endpoints:
+            endpoint.client.close()
+
+
+# Collect latency and throughput figures for a single generation, including
+# Ollama's own eval_count/eval_duration counters when the server reports them
+def build_generation_stats(start, first_token_at, token_count, final_chunk, truncated):
+    total_duration = time.monotonic() - start
+    eval_count = final_chunk.get("eval_count")
+    eval_duration = final_chunk.get("eval_duration")  # nanoseconds
+    load_duration = final_chunk.get("load_duration")  # nanoseconds
+    if token_count is None:
+        token_count = eval_count
+
+    return {
+        "time_to_first_token": (
+            None if first_token_at is None else first_token_at - start
+        ),
+        "total_duration": total_duration,
+        "tokens": token_count,
+        "tokens_per_second": (
+            token_count / total_duration if token_count and total_duration else None
+        ),
+        "eval_count": eval_count,
+        "eval_duration": None if eval_duration is None else eval_duration / 1e9,
+        "eval_tokens_per_second": (
+            eval_count / (eval_duration / 1e9) if eval_count and eval_duration else None
+        ),
+        "load_duration": None if load_duration is None else load_duration / 1e9,
+        "truncated": truncated,
+    }
+
+
+# Log the stats of a single generation, warning when it was cut off
+def log_generation_stats(stats):
+    ttft = stats["time_to_first_token"]
+    tokens_per_second = stats["tokens_per_second"]
+    logging.info(
+        "Generation for %s: %.2fs total, time to first token %s, %s tokens, %s tokens/s",
+        stats["label"],
+        stats["total_duration"],
+        "n/a" if ttft is None else f"{ttft:.2f}s",
+        stats["tokens"] if stats["tokens"] is not None else "n/a",
+        "n/a" if tokens_per_second is None else f"{tokens_per_second:.1f}",
+    )
+    if stats["truncated"]:
+        logging.warning(
+            "Generation for %s was cut off after %s tokens and %.2fs",
+            stats["label"],
+            stats["tokens"],
+            stats["total_duration"],
+        )
+
+
+# Summarize the stats of all generations in a run
+def summarize_generation_stats(generation_stats):
+    if not generation_stats:
+        return {"generations": 0}
+
+    def mean(key):
+        values = [stats[key] for stats in generation_stats if stats[key] is not None]
+        return sum(values) / len(values) if values else None
+
+    return {
+        "generations": len(generation_stats),
+        "truncated": sum(1 for stats in generation_stats if stats["truncated"]),
+        "mean_total_duration": mean("total_duration"),
+        "mean_time_to_first_token": mean("time_to_first_token"),
+        "mean_tokens_per_second": mean("tokens_per_second"),
+        "mean_eval_tokens_per_second": mean("eval_tokens_per_second"),
+        "mean_load_duration": mean("load_duration"),
+    }
@@ -0,0 +1,137 @@
+import logging
+
+# Output formats and the extension of their files
+OUTPUT_EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+
+# Column holding the suggestion text in CSV outputs
+SUGGESTION_COLUMN = "Elastic Engineering Suggestions"
+
+# Column referencing the suggestions table in columnar outputs
+CHECK_ID_COLUMN = "Check ID"
+
+
+# Import pyarrow, which is only needed for the columnar output formats
+def import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError(
+            "The parquet and arrow output formats need pyarrow. Install it with: pip install pyarrow"
+        ) from e
+    return pyarrow
+
+
+# Writes the findings of a file to a CSV file one chunk at a time. With append,
+# chunks are added to an existing output, e.g. when a file is resumed.
+class CsvOutputWriter:
+    def __init__(self, path, append=False):
+        self.path = path
+        self.first_chunk = not append
+
+    def write(self, df):
+        df.to_csv(
+            self.path,
+            mode="w" if self.first_chunk else "a",
+            header=self.first_chunk,
+            index=False,
+            encoding="utf-8-sig" if self.first_chunk else "utf-8",
+        )
+        self.first_chunk = False
+
+    def close(self):
+        pass
+
+
+# Writes the findings of a file to Parquet or Arrow IPC one chunk at a time.
+# The schema is taken from the first chunk; columns that are not numeric or
+# have no value there are stored as strings. Parquet dictionary-encodes repeated strings, and Arrow
+# IPC files are compressed with zstd.
+class ColumnarOutputWriter:
+    def __init__(self, path, output_format):
+        self.pa = import_pyarrow()
+        self.path = path
+        self.output_format = output_format
+        self.schema = None
+        self.writer = None
+
+    def _schema(self, df):
+        import pandas as pd
+
+        fields = []
+        for column in df.columns:
+            if df[column].isna().all() or not pd.api.types.is_numeric_dtype(df[column]):
+                fields.append(self.pa.field(column, self.pa.string()))
+            else:
+                column_schema = self.pa.Schema.from_pandas(
+                    df[[column]], preserve_index=False
+                )
+                fields.append(column_schema.field(column))
+        return self.pa.schema(fields)
+
+    # Convert the values of string columns that a later chunk parsed as numbers
+    def _conform(self, df):
+        import pandas as pd
+
+        df = df.copy()
+        for field in self.schema:
+            if field.type == self.pa.string() and not pd.api.types.is_string_dtype(
+                df[field.name]
+            ):
+                values = df[field.name]
+                df[field.name] = values.astype(str).where(values.notna(), None)
+        return df
+
+    def write(self, df):
+        if self.schema is None:
+            self.schema = self._schema(df)
+            if self.output_format == "parquet":
+                self.writer = self.pa.parquet.ParquetWriter(
+                    self.path, self.schema, compression="zstd"
+                )
+            else:
+                self.writer = self.pa.ipc.new_file(
+                    self.path,
+                    self.schema,
+                    options=self.pa.ipc.IpcWriteOptions(compression="zstd"),
+                )
+        table = self.pa.Table.from_pandas(
+            self._conform(df), schema=self.schema, preserve_index=False
+        )
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+# Open the output writer of a format
+def open_output_writer(path, output_format="csv", append=False):
+    if output_format == "csv":
+        return CsvOutputWriter(path, append=append)
+    if output_format in OUTPUT_EXTENSIONS:
+        return ColumnarOutputWriter(path, output_format)
+    raise ValueError(f"Unknown output format: {output_format}")
+
+
+# Write the suggestions referenced by a columnar output once per check, as a
+# table of check ID, check title and suggestion
+def write_suggestions_table(path, suggestions, check_ids, output_format):
+    import pandas as pd
+
+    pa = import_pyarrow()
+    df = pd.DataFrame(
+        {
+            CHECK_ID_COLUMN: [check_ids.get(title) for title in suggestions],
+            "Check Title": list(suggestions),
+            SUGGESTION_COLUMN: list(suggestions.values()),
+        }
+    )
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if output_format == "parquet":
+        pa.parquet.write_table(table, path, compression="zstd")
+    else:
+        options = pa.ipc.IpcWriteOptions(compression="zstd")
+        with pa.ipc.new_file(path, table.schema, options=options) as writer:
+            writer.write_table(table)
+    logging.info("Suggestions table saved at %s", path)
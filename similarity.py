@@ -0,0 +1,107 @@
+import re
+import math
+import threading
+from collections import Counter, defaultdict
+
+# Common words that carry no meaning for matching check titles
+# fmt: off
+STOP_WORDS = {
+    "a", "an", "and", "are", "be", "for", "from", "in", "is", "it", "of", "on",
+    "or", "should", "that", "the", "to", "with",
+}
+# fmt: on
+
+
+# Split text into lowercase alphanumeric tokens
+def tokenize(text):
+    return re.findall(r"[a-z0-9]+", str(text).lower())
+
+
+# Normalize a check title so casing, punctuation and spacing differences match
+def normalize_title(title):
+    return " ".join(tokenize(title))
+
+
+# TF-IDF index over cached check titles and descriptions. It finds an existing
+# check that is near-identical to a new one, so its suggestion can be reused
+# instead of generating a new one. Title words count twice as much as words
+# from the description.
+class SimilarityIndex:
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.titles_by_normalized = {}
+        self.term_counts = {}
+        self.document_frequency = Counter()
+        self.lock = threading.Lock()
+
+        # Weighted vectors and inverted index, rebuilt lazily after additions
+        self.vectors = None
+        self.postings = None
+
+    # Count the terms of a check, weighting title terms double
+    def _terms(self, title, description):
+        tokens = [t for t in tokenize(title) if t not in STOP_WORDS] * 2
+        tokens += [t for t in tokenize(description) if t not in STOP_WORDS]
+        return Counter(tokens)
+
+    # Add a cached check to the index
+    def add(self, title, description):
+        with self.lock:
+            if title in self.term_counts:
+                return
+            self.titles_by_normalized.setdefault(normalize_title(title), title)
+            terms = self._terms(title, description)
+            self.term_counts[title] = terms
+            self.document_frequency.update(terms.keys())
+            self.vectors = None
+
+    # Weight term counts by inverse document frequency and normalize to unit length
+    def _weigh(self, terms):
+        documents = len(self.term_counts)
+        vector = {
+            term: count
+            * (math.log((1 + documents) / (1 + self.document_frequency[term])) + 1)
+            for term, count in terms.items()
+        }
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return {term: weight / norm for term, weight in vector.items()} if norm else {}
+
+    def _rebuild(self):
+        self.vectors = {}
+        self.postings = defaultdict(list)
+        for title, terms in self.term_counts.items():
+            vector = self._weigh(terms)
+            self.vectors[title] = vector
+            for term, weight in vector.items():
+                self.postings[term].append((title, weight))
+
+    # Return (cached title, similarity) of the closest cached check at or above
+    # the threshold, or None if there is no close enough match
+    def find(self, title, description):
+        with self.lock:
+            exact = self.titles_by_normalized.get(normalize_title(title))
+            if exact is not None:
+                return exact, 1.0
+
+            if self.vectors is None:
+                self._rebuild()
+
+            scores = defaultdict(float)
+            for term, weight in self._weigh(self._terms(title, description)).items():
+                for candidate, candidate_weight in self.postings.get(term, ()):
+                    scores[candidate] += weight * candidate_weight
+
+        if not scores:
+            return None
+        best_title = max(scores, key=scores.get)
+        if scores[best_title] < self.threshold:
+            return None
+        return best_title, scores[best_title]
+
+
+# Build a similarity index over every entry of the suggestion cache
+def build_similarity_index(cache, threshold):
+    index = SimilarityIndex(threshold)
+    for title in cache:
+        index.add(title, cache[title].get("Check Description", ""))
+    return index
@@ -0,0 +1,118 @@
+import os
+import json
+import sqlite3
+import logging
+from datetime import datetime
+
+SUMMARY_DB_FILE = "summary.db"
+SUMMARY_JSON_FILE = "summary.json"
+SUMMARY_CSV_FILE = "summary.csv"
+
+
+# Per-file summaries in SQLite keyed by filename, so saving one summary is a
+# single upsert and overlapping runs are serialized by SQLite's locking
+class SummaryStore:
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=30)
+        with self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS summaries (
+                    filename TEXT PRIMARY KEY,
+                    summary TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+                """)
+
+    # Insert or replace the summary of a file
+    def upsert(self, summary):
+        with self.connection:
+            self.connection.execute(
+                """
+                INSERT INTO summaries (filename, summary, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(filename) DO UPDATE SET
+                    summary = excluded.summary, updated_at = excluded.updated_at
+                """,
+                (summary["filename"], json.dumps(summary), datetime.now().isoformat()),
+            )
+        logging.info(
+            "Summary saved or updated for %s in %s", summary["filename"], self.path
+        )
+
+    # Return the summary of a file, or None if it has not been processed
+    def get(self, filename):
+        row = self.connection.execute(
+            "SELECT summary FROM summaries WHERE filename = ?", (filename,)
+        ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    # Return every summary in the order the files were first saved
+    def all(self):
+        rows = self.connection.execute(
+            "SELECT summary FROM summaries ORDER BY rowid"
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+
+    # Import the summaries of an existing summary.json list
+    def import_json(self, summary_json_path):
+        if not os.path.exists(summary_json_path):
+            return 0
+        with open(summary_json_path, "r") as file:
+            try:
+                summaries = json.load(file)
+            except json.JSONDecodeError:
+                logging.warning(
+                    "Failed to decode %s. Skipping import.", summary_json_path
+                )
+                return 0
+        if not isinstance(summaries, list):
+            logging.warning(
+                f"Warning: {summary_json_path} does not contain a list. Skipping import."
+            )
+            return 0
+
+        for summary in summaries:
+            self.upsert(summary)
+        logging.info("Imported %d summaries from %s", len(summaries), summary_json_path)
+        return len(summaries)
+
+    # Write every summary to a JSON list, replacing the old file atomically
+    def export_json(self, summary_json_path):
+        tmp_path = f"{summary_json_path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self.all(), file, indent=4)
+        os.replace(tmp_path, summary_json_path)
+        logging.info("Summaries exported to %s", summary_json_path)
+
+    # Write every summary to a CSV file, one row per input file
+    def export_csv(self, summary_csv_path):
+        import pandas as pd
+
+        tmp_path = f"{summary_csv_path}.tmp"
+        pd.DataFrame(self.all()).to_csv(tmp_path, index=False)
+        os.replace(tmp_path, summary_csv_path)
+        logging.info("Summaries exported to %s", summary_csv_path)
+
+    def close(self):
+        self.connection.close()
+
+
+# Open the summary store of a summary folder. The first time, any existing
+# summary.json is imported so earlier results are kept.
+def open_summary_store(summary_folder):
+    db_path = os.path.join(summary_folder, SUMMARY_DB_FILE)
+    is_new = not os.path.exists(db_path)
+    store = SummaryStore(db_path)
+    if is_new:
+        store.import_json(os.path.join(summary_folder, SUMMARY_JSON_FILE))
+    return store
+
+
+# Export summary.json and summary.csv from the summary store
+def export_summaries(store, summary_folder):
+    store.export_json(os.path.join(summary_folder, SUMMARY_JSON_FILE))
+    store.export_csv(os.path.join(summary_folder, SUMMARY_CSV_FILE))
@@ -0,0 +1,72 @@
+import importlib.util
+import os
+import unittest
+
+# analyze-summary.py has a hyphen in its name, so load it by path
+spec = importlib.util.spec_from_file_location(
+    "analyze_summary",
+    os.path.join(os.path.dirname(__file__), "..", "analyze-summary.py"),
+)
+analyze_summary = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(analyze_summary)
+
+
+def make_summary(filename, timestamp, title_counts):
+    return {
+        "filename": filename,
+        "total_findings": 100,
+        "failed_findings": sum(count for count, _ in title_counts.values()),
+        "failed_pillar_counts": {"security": 1},
+        "failed_severity_counts": {"High": 1},
+        "failed_check_title_counts": {
+            title: {"count": count, "severity": severity}
+            for title, (count, severity) in title_counts.items()
+        },
+        "timestamp": timestamp,
+    }
+
+
+class TestAnalyzeSummary(unittest.TestCase):
+    def setUp(self):
+        self.summaries = [
+            make_summary(
+                "june.csv",
+                "2024-06-01 09:00:00 PDT",
+                {"Enable MFA": (5, "High"), "Rotate keys": (2, "Low")},
+            ),
+            make_summary(
+                "july.csv",
+                "2024-07-15 09:00:00 PDT",
+                {"Enable MFA": (1, "High"), "Encrypt data at rest": (4, "Medium")},
+            ),
+        ]
+
+    def test_check_title_counts_are_grouped_by_severity(self):
+        _, _, _, titles = analyze_summary.build_trend_frames(self.summaries)
+
+        self.assertEqual(
+            analyze_summary.check_title_counts_by_severity(titles),
+            {
+                "High": {"Enable MFA": 6},
+                "Medium": {"Encrypt data at rest": 4},
+                "Low": {"Rotate keys": 2},
+            },
+        )
+
+    def test_time_window_compares_current_and_previous_periods(self):
+        files, _, _, titles = analyze_summary.build_trend_frames(self.summaries)
+        trends = analyze_summary.analyze_time_window(files, titles, window_days=30)
+
+        self.assertEqual(trends["current_failed_findings"], 5)
+        self.assertEqual(trends["previous_failed_findings"], 7)
+        changes = {
+            change["check_title"]: change["change"]
+            for change in trends["check_title_changes"]
+        }
+        self.assertEqual(
+            changes, {"Enable MFA": -4, "Encrypt data at rest": 4, "Rotate keys": -2}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import json
+import tempfile
+import unittest
+
+from cache_store import JsonCacheStore, SqliteCacheStore, migrate_json_to_sqlite
+
+
+def make_entry(check_id, title):
+    return {
+        "check_id": str(check_id),
+        "Pillar": "security",
+        "Severity": "High",
+        "Check Title": title,
+        "suggestion": f"Suggestion for {title}",
+    }
+
+
+class TestCacheStores(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.json_path = os.path.join(self.tmp_dir.name, "cache.json")
+        self.sqlite_path = os.path.join(self.tmp_dir.name, "cache.db")
+        with open(self.json_path, "w") as file:
+            json.dump(
+                {
+                    "Encrypt data at rest": make_entry(1, "Encrypt data at rest"),
+                    "Enable MFA": make_entry(5, "Enable MFA"),
+                },
+                file,
+            )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_json_store_allocates_after_highest_check_id(self):
+        store = JsonCacheStore(self.json_path)
+        self.assertEqual(store.allocate_check_id(), 6)
+        self.assertEqual(store.get_by_check_id("5")["Check Title"], "Enable MFA")
+
+    def test_json_store_save_is_atomic_and_round_trips(self):
+        store = JsonCacheStore(self.json_path)
+        store["Rotate keys"] = make_entry(store.allocate_check_id(), "Rotate keys")
+        store.save()
+
+        self.assertFalse(os.path.exists(f"{self.json_path}.tmp"))
+        reloaded = JsonCacheStore(self.json_path)
+        self.assertEqual(reloaded["Rotate keys"]["check_id"], "6")
+        self.assertEqual(len(reloaded), 3)
+
+    def test_json_store_save_merges_entries_saved_by_another_process(self):
+        daemon = JsonCacheStore(self.json_path)
+        other = JsonCacheStore(self.json_path)
+        refreshed = dict(make_entry(5, "Enable MFA"), suggestion="Refreshed")
+        other["Enable MFA"] = refreshed
+        del other["Encrypt data at rest"]
+        other.save()
+        os.utime(self.json_path, ns=(0, 0))
+
+        daemon["Rotate keys"] = make_entry(daemon.allocate_check_id(), "Rotate keys")
+        daemon.save()
+
+        reloaded = JsonCacheStore(self.json_path)
+        self.assertEqual(list(reloaded), ["Enable MFA", "Rotate keys"])
+        self.assertEqual(reloaded["Enable MFA"]["suggestion"], "Refreshed")
+        self.assertEqual(reloaded["Rotate keys"]["check_id"], "6")
+
+    def test_json_store_reload_keeps_entries_changed_in_memory(self):
+        daemon = JsonCacheStore(self.json_path)
+        daemon["Enable MFA"] = dict(make_entry(5, "Enable MFA"), suggestion="Mine")
+        other = JsonCacheStore(self.json_path)
+        other["Enable MFA"] = dict(make_entry(5, "Enable MFA"), suggestion="Theirs")
+        other["Encrypt data at rest"] = dict(
+            make_entry(1, "Encrypt data at rest"), suggestion="Refreshed"
+        )
+        other.save()
+        os.utime(self.json_path, ns=(0, 0))
+
+        daemon.reload()
+
+        self.assertEqual(daemon["Enable MFA"]["suggestion"], "Mine")
+        self.assertEqual(daemon["Encrypt data at rest"]["suggestion"], "Refreshed")
+        self.assertEqual(daemon.get_by_check_id(1)["suggestion"], "Refreshed")
+
+    def test_sqlite_store_persists_each_write(self):
+        store = SqliteCacheStore(self.sqlite_path)
+        store["Rotate keys"] = make_entry(store.allocate_check_id(), "Rotate keys")
+        store.close()
+
+        reopened = SqliteCacheStore(self.sqlite_path)
+        self.assertIn("Rotate keys", reopened)
+        self.assertEqual(reopened.get_by_check_id(1)["Check Title"], "Rotate keys")
+        self.assertEqual(reopened.allocate_check_id(), 2)
+        reopened.close()
+
+    def test_migrate_json_to_sqlite(self):
+        self.assertEqual(migrate_json_to_sqlite(self.json_path, self.sqlite_path), 2)
+
+        store = SqliteCacheStore(self.sqlite_path)
+        self.assertEqual(list(store), ["Encrypt data at rest", "Enable MFA"])
+        self.assertEqual(store["Enable MFA"], make_entry(5, "Enable MFA"))
+        self.assertEqual(store.allocate_check_id(), 6)
+        store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
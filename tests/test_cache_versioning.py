@@ -0,0 +1,139 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import pandas as pd
+
+import analyzer
+from cache_store import JsonCacheStore
+from ollama_client import DEFAULT_MODEL, OllamaClient
+from tests.test_process_file import make_rows, fake_suggestion
+
+
+@patch("analyzer.analyze_finding_with_ollama", side_effect=fake_suggestion)
+class TestCacheVersioning(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = JsonCacheStore(os.path.join(self.tmp_dir.name, "cache.json"))
+        self.df = pd.DataFrame(make_rows(3), columns=analyzer.REQUIRED_COLUMNS)
+        self.original_client = analyzer.ollama_client
+        analyzer.ollama_client = OllamaClient()
+
+    def tearDown(self):
+        analyzer.ollama_client = self.original_client
+        self.tmp_dir.cleanup()
+
+    def use_model(self, model):
+        analyzer.ollama_client = OllamaClient(model=model)
+
+    def test_entries_record_how_they_were_generated(self, mock_analyze):
+        analyzer.generate_missing_suggestions(self.cache, self.df)
+
+        entry = self.cache["Enable MFA"]
+        self.assertEqual(entry["model"], DEFAULT_MODEL)
+        self.assertEqual(entry["prompt_version"], analyzer.PROMPT_VERSION)
+        self.assertEqual(entry["prompt_layout"], analyzer.PROMPT_LAYOUT)
+        self.assertEqual(
+            entry["input_hash"], analyzer.prompt_input_hash(self.df.iloc[1])
+        )
+        self.assertIn("created_at", entry)
+
+    def test_legacy_entries_count_as_default_model(self, mock_analyze):
+        row = self.df.iloc[0]
+        entry = analyzer.build_cache_entry(row, 1, "Old suggestion", DEFAULT_MODEL)
+        for key in [
+            "model",
+            "prompt_version",
+            "prompt_layout",
+            "input_hash",
+            "created_at",
+        ]:
+            entry.pop(key)
+
+        self.assertTrue(analyzer.is_current_entry(entry, row))
+        self.use_model("llama3:8b")
+        self.assertFalse(analyzer.is_current_entry(entry, row))
+
+    def test_entries_of_an_older_prompt_layout_are_served_until_regenerated(
+        self, mock_analyze
+    ):
+        analyzer.generate_missing_suggestions(self.cache, self.df)
+        self.assertEqual(analyzer.select_cache_entries(self.cache, stale_only=True), [])
+        entry = self.cache["Enable MFA"]
+        del entry["prompt_layout"]
+        self.cache["Enable MFA"] = entry
+
+        analyzer.generate_missing_suggestions(self.cache, self.df)
+        self.assertEqual(mock_analyze.call_count, 3)
+        stale = analyzer.select_cache_entries(self.cache, stale_only=True)
+        self.assertEqual(stale, [entry["check_id"]])
+        analyzer.update_cache_for_check_ids(stale, self.cache)
+
+        self.assertEqual(mock_analyze.call_count, 4)
+        self.assertEqual(
+            self.cache["Enable MFA"]["prompt_layout"], analyzer.PROMPT_LAYOUT
+        )
+        self.assertEqual(analyzer.select_cache_entries(self.cache, stale_only=True), [])
+
+    def test_other_model_entries_are_regenerated_with_same_check_id(self, mock_analyze):
+        analyzer.generate_missing_suggestions(self.cache, self.df)
+        check_id = self.cache["Enable MFA"]["check_id"]
+
+        self.use_model("llama3:8b")
+        suggestions = analyzer.resolve_suggestions(
+            analyzer.current_cache_snapshot(self.cache), self.df["Check Title"]
+        )
+        self.assertEqual(suggestions["Enable MFA"], analyzer.SUGGESTION_UNAVAILABLE)
+        analyzer.generate_missing_suggestions(self.cache, self.df)
+
+        self.assertEqual(mock_analyze.call_count, 6)
+        self.assertEqual(self.cache["Enable MFA"]["model"], "llama3:8b")
+        self.assertEqual(self.cache["Enable MFA"]["check_id"], check_id)
+        self.assertEqual(len(self.cache), 3)
+
+    def test_changed_prompt_inputs_are_regenerated(self, mock_analyze):
+        analyzer.generate_missing_suggestions(self.cache, self.df)
+
+        self.df.loc[0, "Check Description"] = "A rewritten description"
+        analyzer.generate_missing_suggestions(self.cache, self.df)
+
+        self.assertEqual(mock_analyze.call_count, 4)
+
+    def test_select_and_invalidate_entries(self, mock_analyze):
+        analyzer.generate_missing_suggestions(self.cache, self.df)
+        high_check_id = self.cache["Encrypt data at rest"]["check_id"]
+
+        selected = analyzer.select_cache_entries(self.cache, severities=["high"])
+        self.assertEqual(selected, [high_check_id])
+        self.assertEqual(
+            analyzer.select_cache_entries(self.cache, models=["llama3:8b"]), []
+        )
+        self.assertEqual(
+            analyzer.select_cache_entries(self.cache, older_than_days=1), []
+        )
+        self.assertEqual(analyzer.select_cache_entries(self.cache, stale_only=True), [])
+
+        analyzer.invalidate_cache_entries(selected, self.cache)
+
+        self.assertEqual(
+            analyzer.select_cache_entries(self.cache, stale_only=True), selected
+        )
+        analyzer.generate_missing_suggestions(self.cache, self.df)
+        self.assertEqual(mock_analyze.call_count, 4)
+        self.assertNotIn("invalidated_at", self.cache["Encrypt data at rest"])
+
+    def test_regenerate_updates_metadata(self, mock_analyze):
+        analyzer.generate_missing_suggestions(self.cache, self.df)
+        self.use_model("llama3:8b")
+
+        stale = analyzer.select_cache_entries(self.cache, stale_only=True)
+        analyzer.update_cache_for_check_ids(stale, self.cache)
+
+        self.assertEqual(len(stale), 3)
+        self.assertEqual(
+            analyzer.select_cache_entries(self.cache, models=["llama3:8b"]), stale
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
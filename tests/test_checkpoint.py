@@ -0,0 +1,158 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+import pandas as pd
+
+import analyzer
+from cache_store import JsonCacheStore
+from checkpoint import STATUS_COMPLETED, STATUS_IN_PROGRESS, open_checkpoint_store
+from metrics import metrics
+from tests.test_process_file import write_report, make_rows, fake_suggestion
+
+
+@patch("analyzer.analyze_finding_with_ollama", side_effect=fake_suggestion)
+class TestCheckpointing(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_folder = os.path.join(self.tmp_dir.name, "input")
+        self.output_folder = os.path.join(self.tmp_dir.name, "output")
+        self.summary_folder = os.path.join(self.tmp_dir.name, "summary")
+        os.makedirs(self.input_folder)
+        self.input_path = os.path.join(self.input_folder, "report.csv")
+        write_report(self.input_path, make_rows(30))
+        self.cache = JsonCacheStore(os.path.join(self.tmp_dir.name, "cache.json"))
+        metrics.reset()
+
+    def tearDown(self):
+        metrics.reset()
+        self.tmp_dir.cleanup()
+
+    def run_pipeline(self, **kwargs):
+        analyzer.process_input_files(
+            self.cache,
+            self.input_folder,
+            self.output_folder,
+            self.summary_folder,
+            **kwargs,
+        )
+
+    def checkpoint(self):
+        store = open_checkpoint_store(self.summary_folder)
+        try:
+            return store.get("report.csv")
+        finally:
+            store.close()
+
+    def test_completed_unchanged_file_is_skipped(self, mock_analyze):
+        self.run_pipeline()
+        self.assertEqual(self.checkpoint()["status"], STATUS_COMPLETED)
+
+        self.run_pipeline()
+
+        self.assertEqual(len(os.listdir(self.output_folder)), 1)
+        self.assertEqual(metrics.snapshot()["counters"]["files_unchanged"], 1)
+
+    def test_changed_file_is_processed_again(self, mock_analyze):
+        self.run_pipeline()
+        write_report(self.input_path, make_rows(40))
+
+        with patch("analyzer.datetime") as mock_datetime:
+            mock_datetime.now.return_value.strftime.return_value = "later"
+            self.run_pipeline()
+
+        self.assertEqual(len(os.listdir(self.output_folder)), 2)
+        self.assertEqual(self.checkpoint()["rows_processed"], 40)
+
+    def test_no_resume_reprocesses_completed_files(self, mock_analyze):
+        self.run_pipeline()
+
+        with patch("analyzer.datetime") as mock_datetime:
+            mock_datetime.now.return_value.strftime.return_value = "later"
+            self.run_pipeline(resume=False)
+
+        self.assertEqual(len(os.listdir(self.output_folder)), 2)
+
+    def test_unchanged_file_is_not_read_again(self, mock_analyze):
+        self.run_pipeline()
+
+        with patch("checkpoint.file_hash") as mock_hash:
+            self.run_pipeline()
+            mock_hash.assert_not_called()
+
+            os.utime(self.input_path, ns=(0, 0))
+            mock_hash.return_value = self.checkpoint()["input_hash"]
+            self.run_pipeline()
+            mock_hash.assert_called_once_with(self.input_path)
+
+        self.assertEqual(metrics.snapshot()["counters"]["files_unchanged"], 2)
+
+    def test_duplicate_in_same_run_is_aliased(self, mock_analyze):
+        copy_path = os.path.join(self.input_folder, "report - Copy.csv")
+        shutil.copyfile(self.input_path, copy_path)
+
+        self.run_pipeline()
+
+        self.assertEqual(len(os.listdir(self.output_folder)), 1)
+        summaries = pd.read_csv(os.path.join(self.summary_folder, "summary.csv"))
+        self.assertEqual(len(summaries), 1)
+        store = open_checkpoint_store(self.summary_folder)
+        original = store.get(summaries["filename"][0])
+        duplicate = store.get(
+            "report.csv"
+            if original["filename"] != "report.csv"
+            else "report - Copy.csv"
+        )
+        store.close()
+        self.assertEqual(duplicate["alias_of"], original["filename"])
+        self.assertEqual(duplicate["output_path"], original["output_path"])
+        self.assertEqual(duplicate["status"], STATUS_COMPLETED)
+
+    def test_duplicate_of_earlier_run_is_aliased(self, mock_analyze):
+        self.run_pipeline()
+        shutil.copyfile(
+            self.input_path, os.path.join(self.input_folder, "report - Copy.csv")
+        )
+
+        self.run_pipeline()
+
+        self.assertEqual(len(os.listdir(self.output_folder)), 1)
+        counters = metrics.snapshot()["counters"]
+        self.assertEqual(counters["files_aliased"], 1)
+        self.assertEqual(counters["files_unchanged"], 1)
+
+    def test_interrupted_file_resumes_after_last_checkpoint(self, mock_analyze):
+        update_summary_counts = analyzer.update_summary_counts
+        calls = []
+
+        # Fail after the second chunk is written but before it is checkpointed
+        def crash_on_second_chunk(counts, df):
+            calls.append(len(df))
+            if len(calls) == 2:
+                raise RuntimeError("killed")
+            update_summary_counts(counts, df)
+
+        with patch("analyzer.update_summary_counts", crash_on_second_chunk):
+            self.run_pipeline(chunk_size=10)
+        checkpoint = self.checkpoint()
+        self.assertEqual(checkpoint["status"], STATUS_IN_PROGRESS)
+        self.assertEqual(checkpoint["rows_processed"], 10)
+
+        self.run_pipeline(chunk_size=10)
+
+        (output_file,) = os.listdir(self.output_folder)
+        output = pd.read_csv(os.path.join(self.output_folder, output_file))
+        self.assertEqual(list(output["Serial number"]), list(range(1, 31)))
+        self.assertEqual(metrics.snapshot()["counters"]["files_resumed"], 1)
+
+        df = pd.read_csv(self.input_path, header=8)
+        expected = analyzer.generate_summary(df, "report.csv")
+        summaries = pd.read_csv(os.path.join(self.summary_folder, "summary.csv"))
+        self.assertEqual(summaries["total_findings"][0], 30)
+        self.assertEqual(summaries["failed_findings"][0], expected["failed_findings"])
+        self.assertEqual(self.checkpoint()["status"], STATUS_COMPLETED)
+
+
+if __name__ == "__main__":
+    unittest.main()
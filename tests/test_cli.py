@@ -0,0 +1,99 @@
+import io
+import os
+import sys
+import json
+import tempfile
+import unittest
+import subprocess
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+import cli
+from cache_store import JsonCacheStore
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_file = os.path.join(self.tmp_dir.name, "cache.json")
+        cache = JsonCacheStore(self.cache_file)
+        for title, severity, model in [
+            ("Enable MFA", "High", "gemma2:2b"),
+            ("Rotate keys", "Low", "llama3"),
+        ]:
+            cache[title] = {
+                "check_id": str(cache.allocate_check_id()),
+                "Pillar": "security",
+                "Severity": severity,
+                "Check Title": title,
+                "suggestion": f"Suggestion for {title}",
+                "model": model,
+                "prompt_version": 1,
+            }
+        cache.close()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def run_cli(self, *argv):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            exit_code = cli.main([*argv, "--cache-file", self.cache_file])
+        return exit_code, output.getvalue()
+
+    def test_cache_list_filters_entries(self):
+        _, output = self.run_cli("cache", "list", "--severity", "Low")
+
+        self.assertEqual(output.splitlines(), ["2\tLow\tsecurity\tllama3\tRotate keys"])
+
+    def test_cache_show_prints_the_entry(self):
+        exit_code, output = self.run_cli("cache", "show", "1")
+
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(json.loads(output)["suggestion"], "Suggestion for Enable MFA")
+        with patch("sys.stderr", new_callable=io.StringIO):
+            self.assertEqual(self.run_cli("cache", "show", "9")[0], 1)
+
+    def test_cache_stats_counts_entries(self):
+        _, output = self.run_cli("cache", "stats")
+
+        stats = json.loads(output)
+        self.assertEqual(stats["entries"], 2)
+        self.assertEqual(stats["models"], {"gemma2:2b": 1, "llama3": 1})
+        self.assertEqual(stats["severities"], {"High": 1, "Low": 1})
+
+    def test_process_and_refresh_pass_their_flags_to_the_analyzer(self):
+        with patch("analyzer.main") as mock_main:
+            cli.main(["process", "--jobs", "4"])
+            cli.main(["refresh", "3", "4", "--additional-info", "Use SSO"])
+
+        self.assertEqual(
+            [call.args[0] for call in mock_main.call_args_list],
+            [
+                ["--jobs", "4"],
+                ["--update-check-ids", "3", "4", "--additional-info", "Use SSO"],
+            ],
+        )
+
+    def test_cache_commands_do_not_import_pandas(self):
+        code = (
+            "import sys, cli\n"
+            f"cli.main(['cache', 'stats', '--cache-file', {self.cache_file!r}])\n"
+            "import analyzer\n"
+            "print('pandas' in sys.modules, file=sys.stderr)"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=REPO_ROOT,
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+
+        self.assertEqual(result.stderr.strip().splitlines()[-1], "False")
+
+
+if __name__ == "__main__":
+    unittest.main()
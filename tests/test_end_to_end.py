@@ -0,0 +1,86 @@
+import os
+import json
+import time
+import tempfile
+import unittest
+
+import analyzer
+from cache_store import JsonCacheStore
+from ollama_client import OllamaClient
+from benchmarks.fake_ollama import FakeOllamaServer
+from benchmarks.generate_report import write_synthetic_report
+
+
+class TestEndToEnd(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_folder = os.path.join(self.tmp_dir.name, "input")
+        self.output_folder = os.path.join(self.tmp_dir.name, "output")
+        self.summary_folder = os.path.join(self.tmp_dir.name, "summary")
+        os.makedirs(self.input_folder)
+        write_synthetic_report(
+            os.path.join(self.input_folder, "report.csv"), 300, distinct_titles=10
+        )
+        self.server = FakeOllamaServer(error_rate=0.2, seed=1).start()
+        self.original_client = analyzer.ollama_client
+        analyzer.ollama_client = OllamaClient(
+            host=self.server.url, max_retries=5, backoff_factor=0.0
+        )
+        self.cache = JsonCacheStore(os.path.join(self.tmp_dir.name, "cache.json"))
+
+    def tearDown(self):
+        analyzer.ollama_client.close()
+        analyzer.ollama_client = self.original_client
+        self.server.stop()
+        self.tmp_dir.cleanup()
+
+    def run_pipeline(self, resume=True):
+        analyzer.process_input_files(
+            self.cache,
+            self.input_folder,
+            self.output_folder,
+            self.summary_folder,
+            concurrency=4,
+            resume=resume,
+        )
+
+    def test_pipeline_against_fake_server(self):
+        self.run_pipeline()
+
+        self.assertEqual(len(self.cache), 10)
+        self.assertGreater(self.server.errors, 0)
+        with open(os.path.join(self.summary_folder, "summary.json")) as file:
+            summaries = json.load(file)
+        self.assertEqual(summaries[0]["filename"], "report.csv")
+        (output_file,) = os.listdir(self.output_folder)
+        self.assertTrue(output_file.endswith("_output.csv"))
+
+    def test_second_run_is_served_from_cache(self):
+        self.run_pipeline()
+        requests = self.server.requests
+
+        self.run_pipeline(resume=False)
+
+        self.assertEqual(self.server.requests, requests)
+
+
+class TestFakeServerLatency(unittest.TestCase):
+    def test_keep_alive_requests_add_no_latency(self):
+        server = FakeOllamaServer().start()
+        client = OllamaClient(host=server.url)
+        try:
+            client.generate("prompt")
+            start = time.perf_counter()
+            for _ in range(10):
+                client.generate("prompt")
+            elapsed = time.perf_counter() - start
+        finally:
+            client.close()
+            server.stop()
+
+        # About 0.4s when every request waits for a delayed ACK
+        self.assertLess(elapsed, 0.2)
+
+
+if __name__ == "__main__":
+    unittest.main()
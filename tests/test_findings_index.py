@@ -0,0 +1,211 @@
+import io
+import os
+import json
+import sqlite3
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+import analyzer
+import cli
+from cache_store import JsonCacheStore
+from findings_index import FindingsIndex, open_findings_index
+from tests.test_process_file import write_report, make_rows, fake_suggestion
+
+
+def make_account_rows(count, region="us-east-1"):
+    rows = make_rows(count)
+    for i, row in enumerate(rows):
+        row["Account ID"] = ["000000000001", "000000000002"][i % 4 // 2]
+        row["Region"] = region
+    return rows
+
+
+@patch("analyzer.analyze_finding_with_ollama", side_effect=fake_suggestion)
+class TestFindingsIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_folder = os.path.join(self.tmp_dir.name, "input")
+        self.output_folder = os.path.join(self.tmp_dir.name, "output")
+        self.summary_folder = os.path.join(self.tmp_dir.name, "summary")
+        os.makedirs(self.input_folder)
+        write_report(
+            os.path.join(self.input_folder, "first.csv"), make_account_rows(12)
+        )
+        write_report(
+            os.path.join(self.input_folder, "second.csv"),
+            make_account_rows(6, region="eu-west-1"),
+        )
+        self.cache = JsonCacheStore(os.path.join(self.tmp_dir.name, "cache.json"))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def process(self, **kwargs):
+        analyzer.process_input_files(
+            self.cache,
+            self.input_folder,
+            self.output_folder,
+            self.summary_folder,
+            chunk_size=5,
+            **kwargs,
+        )
+
+    def query(self, filters=None, group_by=None):
+        findings_index = open_findings_index(self.summary_folder)
+        try:
+            return findings_index.query(filters, group_by)
+        finally:
+            findings_index.close()
+
+    def test_failed_findings_of_every_file_are_indexed(self, mock_analyze):
+        self.process()
+
+        columns, rows = self.query()
+        self.assertEqual(len(rows), 9)
+        findings = [dict(zip(columns, row)) for row in rows]
+        self.assertEqual(findings[0]["file"], "first.csv")
+        self.assertEqual(findings[0]["resource_id"], "res-0")
+        self.assertEqual(findings[0]["account"], "000000000001")
+        self.assertEqual(
+            findings[0]["check_id"],
+            self.cache["Encrypt data at rest"]["check_id"],
+        )
+
+    def test_filters_and_group_by(self, mock_analyze):
+        self.process(jobs=2)
+        check_id = self.cache["Enable MFA"]["check_id"]
+
+        _, rows = self.query(
+            filters={"check_id": [check_id]}, group_by=["account", "region"]
+        )
+
+        # Failed "Enable MFA" rows are 4 and 10 of first.csv and 4 of second.csv
+        self.assertEqual(
+            rows,
+            [
+                ("000000000001", "eu-west-1", 1, 1),
+                ("000000000001", "us-east-1", 1, 1),
+                ("000000000002", "us-east-1", 1, 1),
+            ],
+        )
+
+    def test_reprocessing_a_file_replaces_its_findings(self, mock_analyze):
+        self.process()
+        write_report(os.path.join(self.input_folder, "first.csv"), make_rows(2))
+        self.process()
+
+        _, rows = self.query(group_by=["file"])
+        self.assertEqual(rows, [("second.csv", 3, 3), ("first.csv", 1, 1)])
+
+    def test_query_command_prints_groups(self, mock_analyze):
+        self.process()
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            cli.main(
+                [
+                    "findings",
+                    "--summary-folder",
+                    self.summary_folder,
+                    "--region",
+                    "us-east-1",
+                    "--group-by",
+                    "severity",
+                    "--json",
+                ]
+            )
+
+        self.assertEqual(
+            json.loads(output.getvalue()),
+            [
+                {"severity": "High", "findings": 2, "resources": 2},
+                {"severity": "Low", "findings": 2, "resources": 2},
+                {"severity": "Medium", "findings": 2, "resources": 2},
+            ],
+        )
+
+
+class TestFindingsIndexStore(unittest.TestCase):
+    def test_adding_a_chunk_again_replaces_its_rows(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            findings_index = FindingsIndex(os.path.join(tmp_dir, "index.db"))
+            findings = [(0, "Enable MFA", "1", "us-east-1", "res-0", "IAM")]
+            checks = [("Enable MFA", "7", "security", "High")]
+            findings_index.add_findings("report.csv", findings, checks)
+            findings_index.add_findings(
+                "report.csv", findings, [("Enable MFA", None, "security", "High")]
+            )
+
+            self.assertEqual(len(findings_index), 1)
+            _, rows = findings_index.query({"check_id": ["7"]})
+            self.assertEqual(len(rows), 1)
+            findings_index.close()
+
+    def test_findings_reference_files_and_checks_by_integer_key(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            findings_index = FindingsIndex(os.path.join(tmp_dir, "index.db"))
+            findings_index.add_findings(
+                "report.csv",
+                [(0, "Enable MFA", "1", "us-east-1", "res-0", "IAM")],
+                [("Enable MFA", "7", "security", "High")],
+            )
+
+            row = findings_index.connection.execute(
+                "SELECT file_id, check_ref FROM findings"
+            ).fetchone()
+            self.assertEqual(row, (1, 1))
+            indexes = [
+                name
+                for (name,) in findings_index.connection.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'index'"
+                    " AND tbl_name = 'findings' AND sql IS NOT NULL"
+                )
+            ]
+            self.assertNotIn("findings_region", indexes)
+            findings_index.close()
+
+    def test_index_with_text_keys_is_converted(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "index.db")
+            connection = sqlite3.connect(path)
+            connection.executescript("""
+                CREATE TABLE checks (check_title TEXT PRIMARY KEY, check_id TEXT,
+                    pillar TEXT, severity TEXT);
+                CREATE TABLE findings (filename TEXT NOT NULL,
+                    row_number INTEGER NOT NULL, check_title TEXT,
+                    account_id TEXT, region TEXT, resource_id TEXT,
+                    resource_type TEXT, PRIMARY KEY (filename, row_number))
+                    WITHOUT ROWID;
+                CREATE INDEX findings_region ON findings (region);
+                CREATE INDEX findings_resource_id ON findings (resource_id);
+                INSERT INTO checks VALUES ('Enable MFA', '7', 'security', 'High');
+                INSERT INTO findings VALUES
+                    ('report.csv', 3, 'Enable MFA', '1', 'us-east-1', 'res-3', 'IAM');
+                """)
+            connection.close()
+
+            findings_index = FindingsIndex(path)
+            columns, rows = findings_index.query({"check_id": ["7"]})
+            self.assertEqual(
+                dict(zip(columns, rows[0])),
+                {
+                    "file": "report.csv",
+                    "check_id": "7",
+                    "check_title": "Enable MFA",
+                    "pillar": "security",
+                    "severity": "High",
+                    "account": "1",
+                    "region": "us-east-1",
+                    "resource_id": "res-3",
+                    "resource_type": "IAM",
+                },
+            )
+            self.assertIn("file_id", findings_index._columns("findings"))
+            self.assertEqual(findings_index._columns("legacy_findings"), [])
+            findings_index.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
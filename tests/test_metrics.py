@@ -0,0 +1,126 @@
+import os
+import json
+import logging
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import analyzer
+from cache_store import JsonCacheStore
+from metrics import Metrics, metrics, prompt_logger
+from tests.test_process_file import (
+    write_report,
+    make_rows,
+    fake_suggestion,
+    process_report,
+)
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.metrics = Metrics()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_report_counts_and_summarizes_observations(self):
+        self.metrics.increment("rows_processed", 10)
+        self.metrics.increment("rows_processed", 5)
+        for value in [0.1, 0.2, 0.3, 0.4]:
+            self.metrics.observe("csv_load_seconds", value)
+        with self.metrics.timer("output_write"):
+            pass
+
+        report = self.metrics.report()
+
+        self.assertEqual(report["counters"], {"rows_processed": 15})
+        self.assertEqual(report["histograms"]["csv_load_seconds"]["count"], 4)
+        self.assertAlmostEqual(report["histograms"]["csv_load_seconds"]["sum"], 1.0)
+        self.assertEqual(report["histograms"]["csv_load_seconds"]["max"], 0.4)
+        self.assertEqual(report["histograms"]["output_write_seconds"]["count"], 1)
+
+    def test_merge_adds_worker_snapshot(self):
+        worker = Metrics()
+        worker.increment("files_processed")
+        worker.observe("csv_load_seconds", 0.5)
+        self.metrics.increment("files_processed")
+
+        self.metrics.merge(worker.snapshot())
+
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot["counters"]["files_processed"], 2)
+        self.assertEqual(snapshot["histograms"]["csv_load_seconds"], [0.5])
+
+    def test_prometheus_text_format(self):
+        self.metrics.increment("cache_hits", 3)
+        self.metrics.observe("ollama_call_seconds", 0.2)
+        self.metrics.observe("ollama_call_seconds", 20)
+        path = os.path.join(self.tmp_dir.name, "metrics.prom")
+
+        self.metrics.write_prometheus(path)
+
+        with open(path) as file:
+            lines = file.read().splitlines()
+        self.assertIn("opportunity_analyzer_cache_hits_total 3", lines)
+        self.assertIn(
+            'opportunity_analyzer_ollama_call_seconds_bucket{le="0.5"} 1', lines
+        )
+        self.assertIn(
+            'opportunity_analyzer_ollama_call_seconds_bucket{le="+Inf"} 2', lines
+        )
+        self.assertIn("opportunity_analyzer_ollama_call_seconds_count 2", lines)
+
+
+@patch("analyzer.analyze_finding_with_ollama", side_effect=fake_suggestion)
+class TestStageInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.tmp_dir.name, "report.csv")
+        write_report(self.input_path, make_rows(20))
+        self.cache = JsonCacheStore(os.path.join(self.tmp_dir.name, "cache.json"))
+        metrics.reset()
+
+    def tearDown(self):
+        metrics.reset()
+        self.tmp_dir.cleanup()
+
+    def test_process_file_records_every_stage(self, mock_analyze):
+        process_report(self.cache, self.input_path, self.tmp_dir.name, chunk_size=8)
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["counters"]["rows_processed"], 20)
+        self.assertEqual(snapshot["counters"]["cache_misses"], 3)
+        self.assertEqual(snapshot["counters"]["suggestions_generated"], 3)
+        self.assertEqual(snapshot["counters"]["files_processed"], 1)
+        for stage in [
+            "csv_load",
+            "column_validation",
+            "cache_lookup",
+            "output_write",
+            "summary_generation",
+        ]:
+            self.assertIn(f"{stage}_seconds", snapshot["histograms"])
+        # Three chunks plus the final read that finds no more rows
+        self.assertEqual(len(snapshot["histograms"]["csv_load_seconds"]), 4)
+
+    def test_run_report_is_written_to_output_folder(self, mock_analyze):
+        process_report(self.cache, self.input_path, self.tmp_dir.name)
+        output_folder = os.path.join(self.tmp_dir.name, "output")
+
+        analyzer.write_run_report(output_folder)
+
+        (report_file,) = os.listdir(output_folder)
+        with open(os.path.join(output_folder, report_file)) as file:
+            report = json.load(file)
+        self.assertTrue(report_file.startswith("run_report_"))
+        self.assertEqual(report["counters"]["files_processed"], 1)
+        self.assertIn("generation", report)
+
+    def test_prompts_stay_out_of_the_regular_log(self, mock_analyze):
+        self.assertFalse(prompt_logger.propagate)
+        self.assertFalse(prompt_logger.isEnabledFor(logging.DEBUG))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,248 @@
+import os
+import json
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+import pandas as pd
+import requests
+
+import analyzer
+from cache_store import JsonCacheStore
+from ollama_client import OllamaClient, OllamaError, OllamaTruncatedError
+
+
+def make_response(status_code=200, body=None, content_type="application/json"):
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = {"Content-Type": content_type}
+    response.json.return_value = body or {}
+    response.text = str(body)
+    return response
+
+
+class TestOllamaClient(unittest.TestCase):
+    def setUp(self):
+        self.client = OllamaClient(host="http://ollama.test/api", backoff_factor=0)
+
+    def test_generate_retries_server_errors_then_succeeds(self):
+        responses = [
+            make_response(status_code=503),
+            requests.ConnectionError("connection reset"),
+            make_response(body={"response": "  Use AWS Backup.  "}),
+        ]
+        with patch.object(self.client.session, "post", side_effect=responses) as post:
+            self.assertEqual(self.client.generate("prompt"), "Use AWS Backup.")
+        self.assertEqual(post.call_count, 3)
+        self.assertEqual(post.call_args.kwargs["timeout"], (5.0, 300.0))
+
+    def test_generate_raises_after_max_retries(self):
+        client = OllamaClient(
+            host="http://ollama.test/api", max_retries=2, backoff_factor=0
+        )
+        with patch.object(
+            client.session, "post", side_effect=requests.Timeout("read timed out")
+        ) as post:
+            with self.assertRaises(OllamaError):
+                client.generate("prompt")
+        self.assertEqual(post.call_count, 3)
+
+    def test_generate_does_not_retry_client_errors(self):
+        with patch.object(
+            self.client.session, "post", return_value=make_response(status_code=404)
+        ) as post:
+            with self.assertRaises(OllamaError):
+                self.client.generate("prompt")
+        self.assertEqual(post.call_count, 1)
+
+    def test_generate_sends_system_prompt_keep_alive_and_options(self):
+        client = OllamaClient(
+            host="http://ollama.test/api",
+            keep_alive="30m",
+            options={"num_ctx": 4096, "temperature": 0.2},
+        )
+        with patch.object(
+            client.session,
+            "post",
+            return_value=make_response(body={"response": "Use AWS Backup."}),
+        ) as post:
+            client.generate("Check Title: Back up data", system="Suggest AWS services.")
+
+        payload = post.call_args.kwargs["json"]
+        self.assertEqual(payload["system"], "Suggest AWS services.")
+        self.assertEqual(payload["prompt"], "Check Title: Back up data")
+        self.assertEqual(payload["keep_alive"], "30m")
+        self.assertEqual(payload["options"], {"num_ctx": 4096, "temperature": 0.2})
+
+    def test_warm_up_loads_the_model_with_an_empty_prompt(self):
+        client = OllamaClient(host="http://ollama.test/api", keep_alive=-1)
+        with patch.object(
+            client.session, "post", return_value=make_response(body={"done": True})
+        ) as post:
+            self.assertTrue(client.warm_up())
+
+        payload = post.call_args.kwargs["json"]
+        self.assertEqual(payload["prompt"], "")
+        self.assertEqual(payload["keep_alive"], -1)
+        self.assertEqual(client.generation_stats, [])
+
+    def test_warm_up_failure_is_not_fatal(self):
+        with patch.object(
+            self.client.session,
+            "post",
+            side_effect=requests.ConnectionError("connection refused"),
+        ):
+            self.assertFalse(self.client.warm_up())
+
+
+def make_stream_response(chunks):
+    response = make_response(content_type="application/x-ndjson")
+    response.iter_lines.return_value = [json.dumps(chunk).encode() for chunk in chunks]
+    return response
+
+
+class TestOllamaStreaming(unittest.TestCase):
+    def test_stream_assembles_tokens_and_records_stats(self):
+        client = OllamaClient(host="http://ollama.test/api", stream=True)
+        chunks = [
+            {"response": "Use ", "done": False},
+            {"response": "AWS Backup.", "done": False},
+            {
+                "response": "",
+                "done": True,
+                "eval_count": 2,
+                "eval_duration": 500_000_000,
+            },
+        ]
+        with patch.object(
+            client.session, "post", return_value=make_stream_response(chunks)
+        ):
+            self.assertEqual(client.generate("prompt", label="7"), "Use AWS Backup.")
+
+        (stats,) = client.generation_stats
+        self.assertEqual(stats["label"], "7")
+        self.assertEqual(stats["tokens"], 2)
+        self.assertEqual(stats["eval_tokens_per_second"], 4.0)
+        self.assertIsNotNone(stats["time_to_first_token"])
+        self.assertFalse(stats["truncated"])
+
+    def test_stream_is_cut_off_after_max_tokens(self):
+        client = OllamaClient(host="http://ollama.test/api", stream=True, max_tokens=3)
+        chunks = [{"response": "word ", "done": False} for _ in range(100)]
+        with patch.object(
+            client.session, "post", return_value=make_stream_response(chunks)
+        ):
+            with self.assertRaises(OllamaTruncatedError):
+                client.generate("prompt")
+        self.assertTrue(client.generation_stats[0]["truncated"])
+
+    @patch("analyzer.save_cache")
+    def test_cut_off_suggestion_is_not_cached(self, _):
+        client = OllamaClient(host="http://ollama.test/api", stream=True, max_tokens=3)
+        chunks = [{"response": "word ", "done": False} for _ in range(100)]
+        row = {
+            "Pillar": "security",
+            "Question": "How do you protect your data?",
+            "Severity": "High",
+            "Status": "Failed",
+            "Resource Type": "S3",
+            "Check Title": "Encrypt data at rest",
+            "Check Description": "All data must be encrypted.",
+        }
+        with tempfile.TemporaryDirectory() as tmp_dir, patch.object(
+            client.session, "post", return_value=make_stream_response(chunks)
+        ), patch("analyzer.ollama_client", client):
+            cache = JsonCacheStore(os.path.join(tmp_dir, "cache.json"))
+            analyzer.generate_missing_suggestions(cache, pd.DataFrame([row]))
+
+        self.assertEqual(len(cache), 0)
+
+
+class TestFailedSuggestionsAreNotCached(unittest.TestCase):
+    @patch("analyzer.save_cache")
+    @patch("analyzer.analyze_finding_with_ollama", return_value=None)
+    def test_failed_generation_leaves_cache_untouched(self, mock_analyze, _):
+        df = pd.DataFrame(
+            [
+                {
+                    "Pillar": "security",
+                    "Question": "How do you protect your data?",
+                    "Severity": "High",
+                    "Status": "Failed",
+                    "Resource Type": "S3",
+                    "Check Title": "Encrypt data at rest",
+                    "Check Description": "All data must be encrypted.",
+                }
+            ]
+        )
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = JsonCacheStore(os.path.join(tmp_dir, "cache.json"))
+            analyzer.generate_missing_suggestions(cache, df)
+
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(
+            analyzer.resolve_suggestions(cache, df["Check Title"]),
+            {"Encrypt data at rest": analyzer.SUGGESTION_UNAVAILABLE},
+        )
+
+
+class TestBatchPrompts(unittest.TestCase):
+    def setUp(self):
+        self.rows = [
+            (
+                {
+                    "Pillar": "security",
+                    "Question": "How do you protect your data?",
+                    "Severity": "High",
+                    "Status": "Failed",
+                    "Resource Type": "S3",
+                    "Check Title": title,
+                    "Check Description": f"Description of {title}",
+                },
+                check_id,
+            )
+            for check_id, title in enumerate(["Encrypt data", "Enable MFA"], start=1)
+        ]
+
+    def test_parse_batch_response_keeps_only_valid_requested_entries(self):
+        response = json.dumps(
+            {
+                "suggestions": [
+                    {"check_id": 1, "suggestion": " Use AWS KMS. "},
+                    {"check_id": "2", "suggestion": ""},
+                    {"check_id": "9", "suggestion": "Unrequested"},
+                ]
+            }
+        )
+        self.assertEqual(
+            analyzer.parse_batch_response(response, ["1", "2"]), {"1": "Use AWS KMS."}
+        )
+        self.assertEqual(analyzer.parse_batch_response("not json", ["1"]), {})
+
+    @patch("analyzer.analyze_finding_with_ollama", return_value="Enforce MFA.")
+    @patch(
+        "analyzer.analyze_findings_batch_with_ollama",
+        return_value={"1": "Use AWS KMS."},
+    )
+    def test_missing_batch_entries_fall_back_to_single_prompts(
+        self, mock_batch, mock_single
+    ):
+        results = analyzer.generate_batch_suggestions(self.rows)
+
+        self.assertEqual(
+            [(check_id, suggestion) for _, check_id, suggestion, _ in results],
+            [(1, "Use AWS KMS."), (2, "Enforce MFA.")],
+        )
+        mock_single.assert_called_once_with(self.rows[1][0], 2)
+
+    @patch("analyzer.batch_size", 2)
+    def test_batches_only_group_findings_with_same_pillar(self):
+        other_pillar = (dict(self.rows[0][0], Pillar="reliability"), 3)
+        batches = analyzer.make_batches(self.rows + [other_pillar])
+
+        self.assertEqual(
+            [[check_id for _, check_id in batch] for batch in batches], [[1, 2], [3]]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
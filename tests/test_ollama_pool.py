@@ -0,0 +1,233 @@
+import os
+import tempfile
+import unittest
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+import pandas as pd
+
+import analyzer
+from cache_store import JsonCacheStore
+
+from ollama_client import (
+    OllamaError,
+    OllamaPool,
+    OllamaTruncatedError,
+    parse_endpoint_spec,
+)
+from benchmarks.fake_ollama import FakeOllamaServer
+
+
+class TestOllamaPool(unittest.TestCase):
+    def setUp(self):
+        self.servers = []
+        self.pools = []
+
+    def tearDown(self):
+        for pool in self.pools:
+            pool.close()
+        for server in self.servers:
+            server.stop()
+
+    def start_server(self, **kwargs):
+        server = FakeOllamaServer(**kwargs).start()
+        self.servers.append(server)
+        return server
+
+    def make_pool(self, endpoints, **kwargs):
+        pool = OllamaPool(endpoints, max_retries=0, backoff_factor=0.0, **kwargs)
+        self.pools.append(pool)
+        return pool
+
+    def test_parse_endpoint_spec(self):
+        self.assertEqual(
+            parse_endpoint_spec("http://gpu1:11434/api,model=llama3:8b,concurrency=4"),
+            {
+                "host": "http://gpu1:11434/api",
+                "model": "llama3:8b",
+                "max_concurrency": 4,
+            },
+        )
+        self.assertEqual(
+            parse_endpoint_spec("http://gpu2:11434/api", "gemma2:2b"),
+            {
+                "host": "http://gpu2:11434/api",
+                "model": "gemma2:2b",
+                "max_concurrency": 1,
+            },
+        )
+        with self.assertRaises(ValueError):
+            parse_endpoint_spec("http://gpu1:11434/api,gpus=2")
+
+    def test_warm_up_loads_the_model_on_every_healthy_host(self):
+        first = self.start_server()
+        second = self.start_server()
+        pool = self.make_pool(
+            [
+                {"host": first.url, "model": "gemma2:2b", "max_concurrency": 1},
+                {"host": second.url, "model": "llama3:8b", "max_concurrency": 1},
+                {"host": "http://127.0.0.1:9/api", "model": "x", "max_concurrency": 1},
+            ],
+            connect_timeout=0.5,
+        )
+
+        self.assertTrue(pool.warm_up())
+        self.assertEqual(pool.generation_stats, [])
+
+    def test_requests_are_spread_by_outstanding_requests(self):
+        first = self.start_server(latency=0.2)
+        second = self.start_server(latency=0.2)
+        pool = self.make_pool(
+            [
+                {"host": first.url, "model": "gemma2:2b", "max_concurrency": 2},
+                {"host": second.url, "model": "gemma2:2b", "max_concurrency": 2},
+            ]
+        )
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(pool.generate, ["prompt"] * 4))
+
+        self.assertEqual(len(results), 4)
+        self.assertEqual(first.requests, 2)
+        self.assertEqual(second.requests, 2)
+        self.assertEqual([host["generations"] for host in pool.host_stats()], [2, 2])
+
+        pool.reset_stats()
+        self.assertEqual(pool.generation_stats, [])
+        self.assertEqual([host["requests"] for host in pool.host_stats()], [0, 0])
+
+    def test_failing_host_is_ejected_and_requests_fail_over(self):
+        failing = self.start_server(error_rate=1.0)
+        healthy = self.start_server()
+        pool = self.make_pool(
+            [
+                {"host": failing.url, "model": "gemma2:2b", "max_concurrency": 1},
+                {"host": healthy.url, "model": "gemma2:2b", "max_concurrency": 1},
+            ],
+            eject_after=2,
+        )
+
+        for _ in range(5):
+            pool.generate("prompt")
+
+        failing_stats, healthy_stats = pool.host_stats()
+        self.assertFalse(failing_stats["healthy"])
+        self.assertEqual(failing_stats["failures"], 2)
+        self.assertEqual(failing_stats["ejections"], 1)
+        self.assertEqual(healthy_stats["generations"], 5)
+
+        # The host still answers its health check, so it is re-admitted
+        pool.check_health()
+        self.assertTrue(pool.host_stats()[0]["healthy"])
+
+    def test_unreachable_host_starts_ejected(self):
+        down = self.start_server()
+        down_url = down.url
+        down.stop()
+        self.servers.remove(down)
+        healthy = self.start_server()
+        pool = self.make_pool(
+            [
+                {"host": down_url, "model": "gemma2:2b", "max_concurrency": 1},
+                {"host": healthy.url, "model": "llama3:8b", "max_concurrency": 1},
+            ]
+        )
+
+        pool.generate("prompt")
+
+        self.assertFalse(pool.host_stats()[0]["healthy"])
+        self.assertEqual(healthy.requests, 1)
+        self.assertEqual(pool.models, {"gemma2:2b", "llama3:8b"})
+
+    def test_cut_off_generation_is_not_a_host_failure(self):
+        first = self.start_server()
+        second = self.start_server()
+        pool = self.make_pool(
+            [
+                {"host": first.url, "model": "gemma2:2b", "max_concurrency": 1},
+                {"host": second.url, "model": "gemma2:2b", "max_concurrency": 1},
+            ],
+            stream=True,
+            max_tokens=1,
+            eject_after=1,
+        )
+
+        with self.assertRaises(OllamaTruncatedError):
+            pool.generate("prompt")
+
+        self.assertEqual(first.requests + second.requests, 1)
+        self.assertTrue(all(host["healthy"] for host in pool.host_stats()))
+
+    def test_entries_record_the_model_of_the_host_that_generated_them(self):
+        first = self.start_server(latency=0.1)
+        second = self.start_server(latency=0.1)
+        pool = self.make_pool(
+            [
+                {"host": first.url, "model": "gemma2:2b", "max_concurrency": 2},
+                {"host": second.url, "model": "llama3:8b", "max_concurrency": 2},
+            ]
+        )
+        df = pd.DataFrame(
+            [
+                {
+                    "Pillar": "security",
+                    "Question": "How do you protect your data?",
+                    "Severity": "High",
+                    "Status": "Failed",
+                    "Resource Type": "S3",
+                    "Check Title": f"Check {i}",
+                    "Check Description": f"Description of check {i}",
+                }
+                for i in range(8)
+            ]
+        )
+
+        with tempfile.TemporaryDirectory() as tmp_dir, patch(
+            "analyzer.ollama_client", pool
+        ):
+            cache = JsonCacheStore(os.path.join(tmp_dir, "cache.json"))
+            analyzer.generate_missing_suggestions(
+                cache, df, concurrency=pool.max_concurrency
+            )
+
+        models = Counter(entry["model"] for entry in cache.values())
+        self.assertEqual(
+            models,
+            {host["model"]: host["generations"] for host in pool.host_stats()},
+        )
+        self.assertEqual(set(models), {"gemma2:2b", "llama3:8b"})
+
+    def test_concurrency_defaults_to_the_capacity_of_the_pool(self):
+        first = self.start_server()
+        second = self.start_server()
+        with tempfile.TemporaryDirectory() as tmp_dir, patch(
+            "analyzer.ollama_client", None
+        ), patch("analyzer.process_input_files") as mock_process:
+            analyzer.main(
+                [
+                    "--ollama-host",
+                    f"{first.url},concurrency=3",
+                    "--ollama-host",
+                    f"{second.url},concurrency=2",
+                    "--no-warm-up",
+                    "--cache-file",
+                    os.path.join(tmp_dir, "cache.json"),
+                    "--output-folder",
+                    os.path.join(tmp_dir, "output"),
+                ]
+            )
+
+        self.assertEqual(mock_process.call_args.kwargs["concurrency"], 5)
+
+    def test_no_healthy_host_raises(self):
+        failing = self.start_server(error_rate=1.0)
+        pool = self.make_pool(
+            [{"host": failing.url, "model": "gemma2:2b", "max_concurrency": 1}]
+        )
+
+        with self.assertRaises(OllamaError):
+            pool.generate("prompt")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import pandas as pd
+
+import analyzer
+from cache_store import JsonCacheStore
+from tests.test_process_file import write_report, make_rows, fake_suggestion
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+@patch("analyzer.analyze_finding_with_ollama", side_effect=fake_suggestion)
+class TestOutputFormats(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_folder = os.path.join(self.tmp_dir.name, "input")
+        self.output_folder = os.path.join(self.tmp_dir.name, "output")
+        self.summary_folder = os.path.join(self.tmp_dir.name, "summary")
+        os.makedirs(self.input_folder)
+        write_report(os.path.join(self.input_folder, "report.csv"), make_rows(50))
+        self.cache = JsonCacheStore(os.path.join(self.tmp_dir.name, "cache.json"))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def run_files(self, **kwargs):
+        analyzer.process_input_files(
+            self.cache,
+            self.input_folder,
+            self.output_folder,
+            self.summary_folder,
+            **kwargs,
+        )
+        return sorted(
+            name for name in os.listdir(self.output_folder) if "_output" in name
+        ) + sorted(
+            name for name in os.listdir(self.output_folder) if "_suggestions" in name
+        )
+
+    def test_failed_only_writes_failed_findings(self, mock_analyze):
+        (output_name,) = self.run_files(failed_only=True, chunk_size=7)
+
+        output = pd.read_csv(os.path.join(self.output_folder, output_name))
+        self.assertEqual(len(output), 25)
+        self.assertTrue((output["Status"] == "Failed").all())
+        self.assertTrue(
+            output["Elastic Engineering Suggestions"].str.startswith("Suggestion").all()
+        )
+        summary_store = analyzer.open_summary_store(self.summary_folder)
+        self.assertEqual(summary_store.all()[0]["total_findings"], 50)
+        summary_store.close()
+
+    @unittest.skipUnless(pyarrow, "pyarrow is not installed")
+    def test_parquet_output_references_suggestions_by_check_id(self, mock_analyze):
+        output_name, suggestions_name = self.run_files(
+            output_format="parquet", chunk_size=7
+        )
+
+        self.assertTrue(output_name.endswith("_output.parquet"))
+        self.assertTrue(suggestions_name.endswith("_suggestions.parquet"))
+        output = pd.read_parquet(os.path.join(self.output_folder, output_name))
+        suggestions = pd.read_parquet(
+            os.path.join(self.output_folder, suggestions_name)
+        )
+        self.assertEqual(len(output), 50)
+        self.assertNotIn("Elastic Engineering Suggestions", output.columns)
+        self.assertEqual(len(suggestions), 3)
+
+        joined = output.merge(suggestions, on=["Check ID", "Check Title"])
+        self.assertEqual(len(joined), 50)
+        for _, row in joined.iterrows():
+            self.assertEqual(
+                row["Elastic Engineering Suggestions"],
+                f"Suggestion for {row['Check Title']}",
+            )
+            self.assertEqual(
+                row["Check ID"], self.cache[row["Check Title"]]["check_id"]
+            )
+
+    def test_failed_only_does_not_generate_passed_checks(self, mock_analyze):
+        passed = dict(
+            make_rows(2)[1],
+            **{"Check Title": "Passing check", "Check Description": "Always passes"},
+        )
+        write_report(
+            os.path.join(self.input_folder, "other.csv"), make_rows(6) + [passed]
+        )
+
+        self.run_files(failed_only=True, jobs=2)
+
+        generated = {
+            call.args[0]["Check Title"] for call in mock_analyze.call_args_list
+        }
+        self.assertEqual(
+            generated, {"Encrypt data at rest", "Enable MFA", "Rotate keys"}
+        )
+        self.assertNotIn("Passing check", self.cache)
+
+    @unittest.skipUnless(pyarrow, "pyarrow is not installed")
+    def test_arrow_output_in_worker_processes(self, mock_analyze):
+        write_report(os.path.join(self.input_folder, "other.csv"), make_rows(31))
+
+        names = self.run_files(output_format="arrow", failed_only=True, jobs=2)
+
+        self.assertEqual(len(names), 4)
+        outputs = [name for name in names if name.endswith("_output.arrow")]
+        lengths = sorted(
+            pyarrow.ipc.open_file(os.path.join(self.output_folder, name))
+            .read_all()
+            .num_rows
+            for name in outputs
+        )
+        self.assertEqual(lengths, [16, 25])
+        self.assertEqual(mock_analyze.call_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,181 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import pandas as pd
+
+import analyzer
+from cache_store import JsonCacheStore
+
+PREAMBLE = [
+    "Montycloud DAY2 Well-Architected Assessment Report (Confidential)",
+    ",",
+    "Report generated by,test@example.com",
+    "Report generated at,08 Jul 2024 16:00:35 UTC",
+    "Workload Name,Test Workload",
+    "Review Owner,Test Owner",
+    "Improvement Status,NOT_APPLICABLE",
+    ",",
+]
+
+
+# Write a small Montycloud-style report with the 8-line preamble
+def write_report(path, rows):
+    with open(path, "w", newline="") as file:
+        file.write("\n".join(PREAMBLE) + "\n")
+        pd.DataFrame(rows, columns=analyzer.REQUIRED_COLUMNS).to_csv(file, index=False)
+
+
+def make_rows(count):
+    titles = ["Encrypt data at rest", "Enable MFA", "Rotate keys"]
+    return [
+        {
+            "Serial number": i + 1,
+            "Pillar": "security",
+            "Severity": ["High", "Medium", "Low"][i % 3],
+            "Status": "Failed" if i % 2 == 0 else "Passed",
+            "Resource ID": f"res-{i}",
+            "Resource Name": f"resource {i}",
+            "Resource Type": "S3",
+            "Question": "How do you protect your data?",
+            "Check Title": titles[i % 3],
+            "Check Description": f"Description of {titles[i % 3]}",
+            "Account Name": "test",
+            "Account ID": "123456789012",
+            "Region": "us-east-1",
+        }
+        for i in range(count)
+    ]
+
+
+def fake_suggestion(row, check_id, **kwargs):
+    return f"Suggestion for {row['Check Title']}"
+
+
+# Generate the suggestions of a report, then write it from the snapshot of the
+# current cache entries, as process_files_serially does
+def process_report(cache, input_path, output_folder, chunk_size=None):
+    collected = analyzer.collect_check_titles(input_path, chunk_size)
+    analyzer.generate_collected_suggestions(cache, [collected], 1, 10)
+    return analyzer.process_file(
+        analyzer.current_cache_snapshot(cache),
+        input_path,
+        os.path.basename(input_path),
+        output_folder,
+        chunk_size=chunk_size,
+    )
+
+
+@patch("analyzer.analyze_finding_with_ollama", side_effect=fake_suggestion)
+class TestProcessFile(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.tmp_dir.name, "report.csv")
+        write_report(self.input_path, make_rows(50))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def run_file(self, name, chunk_size=None):
+        output_folder = os.path.join(self.tmp_dir.name, name, "output")
+        os.makedirs(output_folder)
+        cache = JsonCacheStore(os.path.join(self.tmp_dir.name, name, "cache.json"))
+        process_report(cache, self.input_path, output_folder, chunk_size=chunk_size)
+        (output_name,) = os.listdir(output_folder)
+        return cache, pd.read_csv(os.path.join(output_folder, output_name))
+
+    def test_each_distinct_title_is_generated_once(self, mock_analyze):
+        cache, output = self.run_file("whole")
+
+        self.assertEqual(mock_analyze.call_count, 3)
+        self.assertEqual(sorted(cache[t]["check_id"] for t in cache), ["1", "2", "3"])
+        self.assertEqual(
+            output.loc[0, "Elastic Engineering Suggestions"],
+            "Suggestion for Encrypt data at rest",
+        )
+
+    def test_chunked_output_matches_whole_file(self, mock_analyze):
+        _, whole = self.run_file("whole")
+        _, chunked = self.run_file("chunked", chunk_size=7)
+
+        pd.testing.assert_frame_equal(whole, chunked)
+
+    def test_chunked_summary_matches_whole_file(self, mock_analyze):
+        df = pd.read_csv(self.input_path, header=8)
+        counts = analyzer.new_summary_counts()
+        for chunk in pd.read_csv(self.input_path, header=8, chunksize=7):
+            analyzer.update_summary_counts(counts, chunk)
+
+        whole = analyzer.generate_summary(df, "report.csv")
+        chunked = analyzer.build_summary(counts, "report.csv")
+        whole.pop("timestamp")
+        chunked.pop("timestamp")
+        self.assertEqual(whole, chunked)
+        self.assertEqual(chunked["failed_findings"], 25)
+
+    def test_low_cardinality_columns_are_loaded_as_categoricals(self, mock_analyze):
+        (df,) = analyzer.read_findings(self.input_path)
+
+        for column in analyzer.CATEGORICAL_COLUMNS:
+            self.assertIsInstance(df[column].dtype, pd.CategoricalDtype)
+        self.assertEqual(df["Account ID"].iloc[0], "123456789012")
+
+
+class TestSummaryCounts(unittest.TestCase):
+    def test_summary_counts_failed_findings_per_column(self):
+        rows = make_rows(6)
+        rows[2]["Account ID"] = "000000000042"
+        rows[2]["Region"] = "eu-west-1"
+        rows[4]["Severity"] = None
+        df = pd.DataFrame(rows).astype(analyzer.FINDINGS_DTYPES)
+
+        summary = analyzer.generate_summary(df, "report.csv")
+
+        self.assertEqual(summary["failed_findings"], 3)
+        self.assertEqual(summary["failed_pillar_counts"], {"security": 3})
+        self.assertEqual(summary["failed_severity_counts"], {"High": 1, "Low": 1})
+        self.assertEqual(
+            summary["failed_account_counts"],
+            {"123456789012": 2, "000000000042": 1},
+        )
+        self.assertEqual(
+            summary["failed_region_counts"], {"us-east-1": 2, "eu-west-1": 1}
+        )
+        self.assertEqual(
+            summary["failed_check_title_counts"],
+            {
+                "Encrypt data at rest": {"count": 1, "severity": "High"},
+                "Rotate keys": {"count": 1, "severity": "Low"},
+                "Enable MFA": {"count": 1, "severity": "Unknown"},
+            },
+        )
+
+
+@patch("analyzer.analyze_finding_with_ollama", side_effect=fake_suggestion)
+class TestParallelProcessing(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_folder = os.path.join(self.tmp_dir.name, "input")
+        self.output_folder = os.path.join(self.tmp_dir.name, "output")
+        self.summary_folder = os.path.join(self.tmp_dir.name, "summary")
+        os.makedirs(self.input_folder)
+        for count, name in enumerate(("a.csv", "b.csv", "c.csv"), start=30):
+            write_report(os.path.join(self.input_folder, name), make_rows(count))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_jobs_generate_each_title_once_and_save_every_summary(self, mock_analyze):
+        cache = JsonCacheStore(os.path.join(self.tmp_dir.name, "cache.json"))
+        analyzer.process_input_files(
+            cache, self.input_folder, self.output_folder, self.summary_folder, jobs=2
+        )
+
+        self.assertEqual(mock_analyze.call_count, 3)
+        self.assertEqual(len(os.listdir(self.output_folder)), 3)
+        summaries = pd.read_csv(os.path.join(self.summary_folder, "summary.csv"))
+        self.assertEqual(sorted(summaries["filename"]), ["a.csv", "b.csv", "c.csv"])
+
+
+if __name__ == "__main__":
+    unittest.main()
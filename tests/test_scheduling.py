@@ -0,0 +1,147 @@
+import os
+import time
+import tempfile
+import unittest
+from unittest.mock import patch
+import pandas as pd
+
+import analyzer
+from cache_store import JsonCacheStore
+from metrics import metrics
+from tests.test_process_file import write_report, fake_suggestion
+
+
+# Findings whose order of appearance is the reverse of their priority
+def make_prioritized_rows():
+    findings = [
+        ("Low check", "Low", 1),
+        ("Medium check", "Medium", 1),
+        ("Rarely failing high check", "High", 1),
+        ("Often failing high check", "High", 3),
+        ("Critical check", "Critical", 1),
+    ]
+    rows = []
+    for title, severity, failed in findings:
+        for i in range(failed):
+            rows.append(
+                {
+                    "Serial number": len(rows) + 1,
+                    "Pillar": "security",
+                    "Severity": severity,
+                    "Status": "Failed",
+                    "Resource ID": f"res-{len(rows)}",
+                    "Resource Name": f"resource {len(rows)}",
+                    "Resource Type": "S3",
+                    "Question": "How do you protect your data?",
+                    "Check Title": title,
+                    "Check Description": f"Description of {title}",
+                    "Account Name": "test",
+                    "Account ID": "123456789012",
+                    "Region": "us-east-1",
+                }
+            )
+    return rows
+
+
+PRIORITY_ORDER = [
+    "Critical check",
+    "Often failing high check",
+    "Rarely failing high check",
+    "Medium check",
+    "Low check",
+]
+
+
+@patch("analyzer.analyze_finding_with_ollama", side_effect=fake_suggestion)
+class TestScheduling(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = JsonCacheStore(os.path.join(self.tmp_dir.name, "cache.json"))
+        self.df = pd.DataFrame(
+            make_prioritized_rows(), columns=analyzer.REQUIRED_COLUMNS
+        )
+        metrics.reset()
+
+    def tearDown(self):
+        analyzer.deadline = None
+        analyzer.deferred_titles.clear()
+        analyzer.batch_size = 1
+        metrics.reset()
+        self.tmp_dir.cleanup()
+
+    def test_generates_most_severe_and_most_failed_first(self, mock_analyze):
+        analyzer.generate_missing_suggestions(self.cache, self.df)
+
+        order = [call.args[0]["Check Title"] for call in mock_analyze.call_args_list]
+        self.assertEqual(order, PRIORITY_ORDER)
+        # Check IDs still follow the order of first appearance
+        self.assertEqual(self.cache["Low check"]["check_id"], "1")
+        self.assertEqual(self.cache["Critical check"]["check_id"], "5")
+
+    def test_batches_keep_priority_order(self, mock_analyze):
+        analyzer.batch_size = 2
+        pending_df = analyzer.prioritize_pending(
+            self.df.drop_duplicates(subset="Check Title"),
+            analyzer.failed_counts_by_title(self.df),
+        )
+        pending = [(row, i) for i, (_, row) in enumerate(pending_df.iterrows())]
+
+        batches = analyzer.make_batches(pending)
+
+        self.assertEqual(
+            [row["Check Title"] for batch in batches for row, _ in batch],
+            PRIORITY_ORDER,
+        )
+
+    def test_exhausted_budget_defers_and_writes_placeholders(self, mock_analyze):
+        input_folder = os.path.join(self.tmp_dir.name, "input")
+        output_folder = os.path.join(self.tmp_dir.name, "output")
+        summary_folder = os.path.join(self.tmp_dir.name, "summary")
+        os.makedirs(input_folder)
+        write_report(os.path.join(input_folder, "report.csv"), make_prioritized_rows())
+
+        analyzer.deadline = time.monotonic()
+        analyzer.process_input_files(
+            self.cache, input_folder, output_folder, summary_folder
+        )
+
+        mock_analyze.assert_not_called()
+        self.assertEqual(metrics.snapshot()["counters"]["suggestions_deferred"], 5)
+        (output_file,) = os.listdir(output_folder)
+        output = pd.read_csv(os.path.join(output_folder, output_file))
+        self.assertEqual(
+            set(output["Elastic Engineering Suggestions"]),
+            {analyzer.SUGGESTION_DEFERRED},
+        )
+
+        # The next run generates the deferred suggestions instead of skipping the file
+        analyzer.deadline = None
+        analyzer.deferred_titles.clear()
+        analyzer.process_input_files(
+            self.cache, input_folder, output_folder, summary_folder
+        )
+
+        self.assertEqual(mock_analyze.call_count, 5)
+        self.assertEqual(len(self.cache), 5)
+
+    def test_priority_spans_every_file_and_chunk(self, mock_analyze):
+        input_folder = os.path.join(self.tmp_dir.name, "input")
+        os.makedirs(input_folder)
+        rows = make_prioritized_rows()
+        write_report(os.path.join(input_folder, "a_first.csv"), rows[:3])
+        write_report(os.path.join(input_folder, "b_second.csv"), rows[3:])
+
+        analyzer.process_input_files(
+            self.cache,
+            input_folder,
+            os.path.join(self.tmp_dir.name, "output"),
+            os.path.join(self.tmp_dir.name, "summary"),
+            chunk_size=2,
+        )
+
+        order = [call.args[0]["Check Title"] for call in mock_analyze.call_args_list]
+        self.assertEqual(order, PRIORITY_ORDER)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import pandas as pd
+
+import analyzer
+from cache_store import JsonCacheStore
+from ollama_client import DEFAULT_MODEL
+from similarity import SimilarityIndex, normalize_title
+
+
+class TestSimilarityIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = SimilarityIndex(threshold=0.6)
+        self.index.add(
+            "S3 bucket should have server access logging enabled.",
+            "Server access logging records requests made to an S3 bucket.",
+        )
+        self.index.add(
+            "Ensure Lambda functions are not publicly exposed",
+            "Lambda function policies must not allow public invocation.",
+        )
+
+    def test_normalized_titles_match_exactly(self):
+        self.assertEqual(
+            normalize_title("  S3 Bucket should have server-access logging ENABLED "),
+            "s3 bucket should have server access logging enabled",
+        )
+        self.assertEqual(
+            self.index.find("s3 bucket should have server access logging enabled", ""),
+            ("S3 bucket should have server access logging enabled.", 1.0),
+        )
+
+    def test_reworded_title_matches_above_threshold(self):
+        title, score = self.index.find(
+            "S3 buckets must have server access logging turned on",
+            "Server access logging records requests made to an S3 bucket.",
+        )
+        self.assertEqual(title, "S3 bucket should have server access logging enabled.")
+        self.assertGreaterEqual(score, 0.6)
+
+    def test_unrelated_title_does_not_match(self):
+        self.assertIsNone(
+            self.index.find(
+                "RDS instances should use Multi-AZ deployments",
+                "Multi-AZ improves database availability.",
+            )
+        )
+
+
+class TestReuseSimilarSuggestions(unittest.TestCase):
+    @patch("analyzer.analyze_finding_with_ollama")
+    def test_near_duplicate_reuses_cached_suggestion(self, mock_analyze):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = JsonCacheStore(os.path.join(tmp_dir, "cache.json"))
+            cache["Encrypt data at rest"] = {
+                "check_id": "1",
+                "Check Title": "Encrypt data at rest",
+                "Check Description": "All data must be encrypted when stored.",
+                "suggestion": "Use AWS KMS.",
+            }
+            df = pd.DataFrame(
+                [
+                    {
+                        "Pillar": "security",
+                        "Question": "How do you protect your data?",
+                        "Severity": "High",
+                        "Status": "Failed",
+                        "Resource Type": "S3",
+                        "Check Title": "Encrypt Data At Rest.",
+                        "Check Description": "All data must be encrypted when stored.",
+                    }
+                ]
+            )
+            with patch(
+                "analyzer.similarity_index", analyzer.build_similarity_index(cache, 0.8)
+            ):
+                analyzer.generate_missing_suggestions(cache, df)
+
+        mock_analyze.assert_not_called()
+        entry = cache["Encrypt Data At Rest."]
+        self.assertEqual(entry["suggestion"], "Use AWS KMS.")
+        self.assertEqual(entry["reused_from"], "1")
+        self.assertEqual(entry["check_id"], "2")
+
+    @patch("analyzer.analyze_finding_with_ollama", return_value="NEW suggestion")
+    def test_changed_description_is_regenerated_not_reused(self, mock_analyze):
+        row = {
+            "Pillar": "security",
+            "Question": "How do you protect your data?",
+            "Severity": "High",
+            "Status": "Failed",
+            "Resource Type": "S3",
+            "Check Title": "Encrypt data at rest",
+            "Check Description": "All data must be encrypted when stored.",
+        }
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = JsonCacheStore(os.path.join(tmp_dir, "cache.json"))
+            cache["Encrypt data at rest"] = analyzer.build_cache_entry(
+                row, 1, "OLD suggestion", DEFAULT_MODEL
+            )
+            changed = dict(row, **{"Check Description": "Use customer managed keys."})
+            with patch(
+                "analyzer.similarity_index", analyzer.build_similarity_index(cache, 0.8)
+            ):
+                analyzer.generate_missing_suggestions(cache, pd.DataFrame([changed]))
+
+        mock_analyze.assert_called_once()
+        entry = cache["Encrypt data at rest"]
+        self.assertEqual(entry["suggestion"], "NEW suggestion")
+        self.assertEqual(entry["check_id"], "1")
+        self.assertNotIn("reused_from", entry)
+        self.assertTrue(analyzer.is_current_entry(entry, changed))
+
+
+if __name__ == "__main__":
+    unittest.main()
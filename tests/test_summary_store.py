@@ -0,0 +1,61 @@
+import os
+import json
+import tempfile
+import unittest
+import pandas as pd
+
+from summary_store import SummaryStore, open_summary_store, export_summaries
+
+
+def make_summary(filename, failed_findings):
+    return {
+        "filename": filename,
+        "total_findings": 10,
+        "failed_findings": failed_findings,
+        "failed_pillar_counts": {"security": failed_findings},
+        "timestamp": "2024-07-08 09:00:00 PDT",
+    }
+
+
+class TestSummaryStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.summary_folder = self.tmp_dir.name
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_upsert_replaces_summary_for_same_filename(self):
+        store = SummaryStore(os.path.join(self.summary_folder, "summary.db"))
+        store.upsert(make_summary("a.csv", 1))
+        store.upsert(make_summary("b.csv", 2))
+        store.upsert(make_summary("a.csv", 3))
+
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.get("a.csv")["failed_findings"], 3)
+        self.assertEqual([s["filename"] for s in store.all()], ["a.csv", "b.csv"])
+        store.close()
+
+    def test_existing_summary_json_is_imported_once_and_exported(self):
+        with open(os.path.join(self.summary_folder, "summary.json"), "w") as file:
+            json.dump([make_summary("old.csv", 4)], file)
+
+        store = open_summary_store(self.summary_folder)
+        store.upsert(make_summary("new.csv", 5))
+        export_summaries(store, self.summary_folder)
+        store.close()
+
+        with open(os.path.join(self.summary_folder, "summary.json")) as file:
+            exported = json.load(file)
+        self.assertEqual([s["filename"] for s in exported], ["old.csv", "new.csv"])
+        summary_csv = pd.read_csv(os.path.join(self.summary_folder, "summary.csv"))
+        self.assertEqual(list(summary_csv["failed_findings"]), [4, 5])
+
+        # Reopening must not re-import the exported file over newer results
+        store = open_summary_store(self.summary_folder)
+        self.assertEqual(len(store), 2)
+        store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
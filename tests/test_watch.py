@@ -0,0 +1,153 @@
+import os
+import time
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import analyzer
+from cache_store import JsonCacheStore
+from checkpoint import open_checkpoint_store
+from ollama_client import OllamaClient
+from tests.test_process_file import write_report, make_rows, fake_suggestion
+
+
+@patch("analyzer.analyze_finding_with_ollama", side_effect=fake_suggestion)
+class TestWatchMode(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_folder = os.path.join(self.tmp_dir.name, "input")
+        self.output_folder = os.path.join(self.tmp_dir.name, "output")
+        self.summary_folder = os.path.join(self.tmp_dir.name, "summary")
+        os.makedirs(self.input_folder)
+        self.cache_path = os.path.join(self.tmp_dir.name, "cache.json")
+        self.cache = JsonCacheStore(self.cache_path)
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(
+            target=analyzer.watch_input_folder,
+            args=(
+                self.cache,
+                self.input_folder,
+                self.output_folder,
+                self.summary_folder,
+                self.stop_event,
+            ),
+            kwargs={"poll_interval": 0.02, "debounce": 0.1, "retry_interval": 0.2},
+        )
+
+    def tearDown(self):
+        self.stop_event.set()
+        self.thread.join()
+        self.tmp_dir.cleanup()
+
+    def output_files(self):
+        if not os.path.exists(self.output_folder):
+            return []
+        return sorted(
+            name for name in os.listdir(self.output_folder) if "_output" in name
+        )
+
+    def wait_for_outputs(self, count, timeout=10):
+        end = time.monotonic() + timeout
+        while len(self.output_files()) < count:
+            self.assertLess(time.monotonic(), end, "Timed out waiting for outputs")
+            time.sleep(0.02)
+
+    def test_new_and_changed_files_are_processed_as_they_arrive(self, mock_analyze):
+        self.thread.start()
+        write_report(os.path.join(self.input_folder, "first.csv"), make_rows(6))
+        self.wait_for_outputs(1)
+
+        write_report(os.path.join(self.input_folder, "second.csv"), make_rows(7))
+        self.wait_for_outputs(2)
+
+        # The output name has a timestamp with second resolution
+        time.sleep(1)
+        write_report(os.path.join(self.input_folder, "first.csv"), make_rows(8))
+        self.wait_for_outputs(3)
+
+        self.stop_event.set()
+        self.thread.join()
+        self.assertEqual(mock_analyze.call_count, 3)
+        self.assertEqual(len(JsonCacheStore(self.cache_path)), 3)
+        summary_store = analyzer.open_summary_store(self.summary_folder)
+        self.assertEqual(summary_store.get("first.csv")["total_findings"], 8)
+        self.assertEqual(summary_store.get("second.csv")["total_findings"], 7)
+        summary_store.close()
+
+    def test_unchanged_files_do_not_start_a_pass(self, mock_analyze):
+        write_report(os.path.join(self.input_folder, "report.csv"), make_rows(6))
+        with patch(
+            "analyzer.process_input_files", wraps=analyzer.process_input_files
+        ) as mock_process:
+            self.thread.start()
+            self.wait_for_outputs(1)
+            time.sleep(0.3)
+
+        self.assertEqual(mock_process.call_count, 1)
+
+    def test_missing_suggestions_are_retried_without_a_new_file(self, mock_analyze):
+        failures = iter([None] * 3)
+        mock_analyze.side_effect = lambda row, check_id, **kwargs: next(
+            failures, fake_suggestion(row, check_id)
+        )
+        write_report(os.path.join(self.input_folder, "report.csv"), make_rows(6))
+        self.thread.start()
+
+        end = time.monotonic() + 10
+        while len(JsonCacheStore(self.cache_path)) < 3:
+            self.assertLess(time.monotonic(), end, "Timed out waiting for a retry")
+            time.sleep(0.05)
+        self.stop_event.set()
+        self.thread.join()
+
+        checkpoint = open_checkpoint_store(self.summary_folder)
+        self.assertEqual(checkpoint.files_missing_suggestions(), [])
+        checkpoint.close()
+
+    def test_failing_retries_replace_the_output_and_back_off(self, mock_analyze):
+        mock_analyze.side_effect = None
+        mock_analyze.return_value = None
+        write_report(os.path.join(self.input_folder, "report.csv"), make_rows(6))
+        with patch(
+            "analyzer.process_input_files", wraps=analyzer.process_input_files
+        ) as mock_process:
+            self.thread.start()
+            time.sleep(2)
+            self.stop_event.set()
+            self.thread.join()
+
+        # Without backoff a retry would start every 0.2 seconds
+        self.assertGreaterEqual(mock_process.call_count, 2)
+        self.assertLessEqual(mock_process.call_count, 5)
+        self.assertEqual(len(self.output_files()), 1)
+
+    def test_stop_event_ends_the_watch(self, mock_analyze):
+        self.thread.start()
+        self.stop_event.set()
+        self.thread.join(timeout=5)
+
+        self.assertFalse(self.thread.is_alive())
+
+
+class TestWatchPass(unittest.TestCase):
+    def test_each_pass_reports_only_its_own_generations(self):
+        client = OllamaClient(host="http://ollama.test/api")
+        client.generation_stats.append({"truncated": False})
+        with tempfile.TemporaryDirectory() as tmp_dir, patch(
+            "analyzer.ollama_client", client
+        ):
+            input_folder = os.path.join(tmp_dir, "input")
+            os.makedirs(input_folder)
+            analyzer.run_watch_pass(
+                JsonCacheStore(os.path.join(tmp_dir, "cache.json")),
+                input_folder,
+                os.path.join(tmp_dir, "output"),
+                os.path.join(tmp_dir, "summary"),
+            )
+
+        self.assertEqual(client.generation_stats, [])
+
+
+if __name__ == "__main__":
+    unittest.main()